@@ -2,24 +2,50 @@
 Strands Agent sample with AgentCore
 """
 import os
+import re
 import json
-import tempfile
+import logging
 import subprocess
-import boto3
 import sentry_sdk
-from strands import Agent
-from bedrock_agentcore.runtime import BedrockAgentCoreApp
-
-from strands_tools.browser import AgentCoreBrowser
+from sentry_sdk.integrations.logging import LoggingIntegration
+
+import startup
+from assets import (SLIDE_ACCENT_COLOR, SLIDE_TEXT_COLOR, SLIDE_URL_Y, get_font, load_assets,
+                    pick_background_music, slide_background)
+from aws_clients import client_stats, get_client
+from browser_pool import get_browser_pool, run_script
+from composition import compose_final_video, remove_intervals
+from encoding import encoding_stats, get_profile
+from exploration_cache import exploration_cache_key, get_exploration_cache
+from llm import complete, configure_cache, llm_stats
+from log import bind_job, get_logger, unbind_job
+import media_info
+from manifest import close_manifest, get_manifest, open_manifest
+from pipeline import PipelineRunner, Step, add_step_hook
+from recording import (ensure_display, record_attempt, record_headed_success, record_headless_failure,
+                       recording_stats, starts_headless)
+from speech import synthesize_ssml
+from tracing import annotate, finish_job, span, start_job, step_span, traced, tracing_stats
+from uploads import upload_bytes, upload_file
+from waiters import Waiter, waiter_stats
+from workspace import JobWorkspace
+
+startup.mark('module_imports')
 
 # Initialize Sentry
-sentry_sdk.init(
-    dsn="https://8478f940604801d031d8ae2952f13de2@o630775.ingest.us.sentry.io/4510198164094976",
-    traces_sample_rate=1.0,
-    profiles_sample_rate=1.0,
-)
-
-app = BedrockAgentCoreApp()
+with startup.phase('sentry'):
+    sentry_sdk.init(
+        # An empty SENTRY_DSN disables reporting (e.g. in the offline benchmarks)
+        dsn=os.getenv("SENTRY_DSN", "https://8478f940604801d031d8ae2952f13de2@o630775.ingest.us.sentry.io/4510198164094976"),
+        # Per-stage timings come from the OpenTelemetry spans (tracing.py); full sampling here
+        # only adds overhead to every job
+        traces_sample_rate=float(os.getenv("KIRBUK_SENTRY_TRACES_SAMPLE_RATE", "0.1")),
+        profiles_sample_rate=float(os.getenv("KIRBUK_SENTRY_PROFILES_SAMPLE_RATE", "0")),
+        # Log records become breadcrumbs only; errors are reported with capture_exception as before
+        integrations=[LoggingIntegration(level=logging.INFO, event_level=None)],
+    )
+
+log = get_logger(__name__)
 
 MEMORY_ID = os.getenv("BEDROCK_AGENTCORE_MEMORY_ID")
 REGION = os.getenv("AWS_REGION")
@@ -29,6 +55,29 @@ KIRBUK_BROWSER_IDENTIFIER = "kirbuk_browser_tool-l2a6PWdtMy"
 S3_BUCKET = "sveder-kirbuk"
 S3_STAGING_PREFIX = "staging_area"
 SOURCE_EMAIL = os.getenv("SOURCE_EMAIL", "Kirbuk <m@sveder.com>")  # Verified SES sender email with display name
+PLAYWRIGHT_SCRIPT_TIMEOUT = 1000  # Seconds per attempt
+PLAYWRIGHT_ATTEMPTS = 3
+
+configure_cache(S3_BUCKET, REGION)
+# Every pipeline step runs in a tracing span
+add_step_hook(step_span)
+
+
+def import_agent_sdks():
+    """Import the agent SDKs ahead of the first exploration (they are imported where used)"""
+    import strands  # noqa: F401
+    import strands_tools.browser  # noqa: F401
+
+
+# Launch the warm browsers, build the AWS clients and load the video assets and SDKs in the
+# background while the runtime starts up
+startup.prewarm({
+    'clients': lambda: [get_client(service, REGION) for service in ('s3', 'polly', 'ses')],
+    'browser': lambda: get_browser_pool().wait_ready(),
+    'assets': load_assets,
+    'imports': import_agent_sdks,
+})
+
 
 def get_exploration_system_prompt(roast_mode=False):
     """Generate system prompt for website exploration based on mode
@@ -109,11 +158,22 @@ ci_sessions = {}
 current_session = None
 
 
+def record_artifact(submission_id, name, s3_key, size, etag, content_type, **extra):
+    """Record an uploaded artifact in the submission manifest (if one is open)"""
+    manifest = get_manifest(submission_id)
+    if manifest:
+        manifest.record_artifact(name, s3_key, size=size, etag=etag, content_type=content_type, **extra)
+
+
+def record_upload(submission_id, name, upload, content_type, **extra):
+    """Record the result of upload_file/upload_bytes in the submission manifest"""
+    record_artifact(submission_id, name, upload['key'], upload['size'], upload['etag'], content_type,
+                    sha256=upload['sha256'], **extra)
+
+
 def save_payload_to_s3(payload, submission_id):
     """Save the payload to S3 in the staging area"""
     try:
-        s3_client = boto3.client('s3', region_name=REGION)
-
         # Create the S3 key: staging_area/<uuid>/<uuid>.json
         s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/{submission_id}.json"
 
@@ -121,314 +181,93 @@ def save_payload_to_s3(payload, submission_id):
         json_data = json.dumps(payload, indent=2)
 
         # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=s3_key,
-            Body=json_data,
-            ContentType='application/json'
-        )
+        upload = upload_bytes(json_data, S3_BUCKET, s3_key, 'application/json', REGION)
+        record_upload(submission_id, 'payload', upload, 'application/json')
 
-        print(f"Successfully saved payload to s3://{S3_BUCKET}/{s3_key}")
+        log.info(f"Successfully saved payload to s3://{S3_BUCKET}/{s3_key}")
         return s3_key
 
     except Exception as e:
-        print(f"Error saving to S3: {e}")
+        log.error(f"Error saving to S3: {e}")
         raise
 
 
 def save_script_to_s3(script, submission_id):
     """Save the script to S3 in the staging area"""
     try:
-        s3_client = boto3.client('s3', region_name=REGION)
-
         # Create the S3 key: staging_area/<uuid>/script.txt
         s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/script.txt"
 
         # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=s3_key,
-            Body=script,
-            ContentType='text/plain'
-        )
+        upload = upload_bytes(script, S3_BUCKET, s3_key, 'text/plain', REGION)
+        record_upload(submission_id, 'script', upload, 'text/plain')
 
-        print(f"Successfully saved script to s3://{S3_BUCKET}/{s3_key}")
+        log.info(f"Successfully saved script to s3://{S3_BUCKET}/{s3_key}")
         return s3_key
 
     except Exception as e:
-        print(f"Error saving script to S3: {e}")
+        log.error(f"Error saving script to S3: {e}")
         raise
 
 
 def save_playwright_to_s3(playwright_code, submission_id):
     """Save the Playwright script to S3 in the staging area"""
     try:
-        s3_client = boto3.client('s3', region_name=REGION)
-
         # Create the S3 key: staging_area/<uuid>/playwright.py
         s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/playwright.py"
 
         # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=s3_key,
-            Body=playwright_code,
-            ContentType='text/x-python'
-        )
-
-        print(f"Successfully saved Playwright script to s3://{S3_BUCKET}/{s3_key}")
-        return s3_key
-
-    except Exception as e:
-        print(f"Error saving Playwright script to S3: {e}")
-        raise
-
-
-def save_video_to_s3(video_path, submission_id):
-    """Save the video to S3 in the staging area"""
-    try:
-        s3_client = boto3.client('s3', region_name=REGION)
-
-        # Create the S3 key: staging_area/<uuid>/video.webm
-        s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/video.webm"
-
-        # Read video file
-        with open(video_path, 'rb') as video_file:
-            video_data = video_file.read()
-
-        # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=s3_key,
-            Body=video_data,
-            ContentType='video/webm'
-        )
+        upload = upload_bytes(playwright_code, S3_BUCKET, s3_key, 'text/x-python', REGION)
+        record_upload(submission_id, 'playwright', upload, 'text/x-python')
 
-        print(f"Successfully saved video to s3://{S3_BUCKET}/{s3_key}")
+        log.info(f"Successfully saved Playwright script to s3://{S3_BUCKET}/{s3_key}")
         return s3_key
 
     except Exception as e:
-        print(f"Error saving video to S3: {e}")
+        log.error(f"Error saving Playwright script to S3: {e}")
         raise
 
 
-def merge_audio_video_with_music(video_path, audio_path, music_path, output_path,
-                                  voice_volume=1.0, music_volume=0.15):
-    """Merge video, voice audio, and background music with volume control
+def save_video_to_s3(video_path, submission_id, final=False, **extra):
+    """Save the video to S3 in the staging area
 
     Args:
-        video_path: Path to the input video file (webm)
-        audio_path: Path to the voice audio file (mp3)
-        music_path: Path to the background music file (mp3)
-        output_path: Path for the output video file (webm with audio)
-        voice_volume: Volume level for voice (default 1.0 = 100%)
-        music_volume: Volume level for background music (default 0.15 = 15%)
-
-    Returns:
-        Path to the output file
+        video_path: Local path of the video
+        submission_id: Submission the video belongs to
+        final: True for the composed video with narration, False for the silent recording
+        **extra: Additional fields recorded with the artifact (e.g. encode statistics)
     """
-    import subprocess
-
     try:
-        print(f"Merging video, voice, and background music with FFmpeg...")
-        print(f"Video: {video_path}")
-        print(f"Voice: {audio_path} (volume: {voice_volume})")
-        print(f"Music: {music_path} (volume: {music_volume})")
-        print(f"Output: {output_path}")
-
-        # FFmpeg command to merge video with mixed audio (voice + background music)
-        # Filter complex:
-        # 1. Apply volume to voice track
-        # 2. Apply volume to music track and loop it
-        # 3. Mix both audio tracks together
-        cmd = [
-            'ffmpeg',
-            '-i', video_path,                    # Input 0: video
-            '-i', audio_path,                    # Input 1: voice
-            '-stream_loop', '-1',                # Loop music indefinitely
-            '-i', music_path,                    # Input 2: background music
-            '-filter_complex',
-            f'[1:a]volume={voice_volume}[voice];'  # Voice at specified volume
-            f'[2:a]volume={music_volume}[music];'  # Music at specified volume
-            '[voice][music]amix=inputs=2:duration=first[audio]',  # Mix both, use voice duration
-            '-map', '0:v',                       # Use original video
-            '-map', '[audio]',                   # Use mixed audio
-            '-c:v', 'copy',                      # Copy video stream without re-encoding
-            '-c:a', 'libopus',                   # Encode audio to Opus for WebM
-            '-shortest',                         # Match shortest stream duration (audio ends when voice ends)
-            '-y',                                # Overwrite output file if exists
-            output_path
-        ]
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-             timeout=600
-        )
-
-        if result.returncode != 0:
-            print(f"FFmpeg stderr: {result.stderr}")
-            raise Exception(f"FFmpeg failed with return code {result.returncode}: {result.stderr}")
-
-        print(f"✓ Successfully merged video with voice and background music: {output_path}")
-        return output_path
-
-    except subprocess.TimeoutExpired:
-        print("FFmpeg audio mixing timed out after 2 minutes")
-        raise Exception("Audio mixing timed out")
-    except Exception as e:
-        print(f"Error merging audio and video with music: {e}")
-        raise
-
-
-def merge_audio_video_with_ffmpeg(video_path, audio_path, output_path):
-    """Merge audio and video files using FFmpeg (without background music)
-
-    Args:
-        video_path: Path to the input video file (webm)
-        audio_path: Path to the input audio file (mp3)
-        output_path: Path for the output video file (webm with audio)
-
-    Returns:
-        Path to the output file
-    """
-    import subprocess
-
-    try:
-        print(f"Merging audio and video with FFmpeg...")
-        print(f"Video: {video_path}")
-        print(f"Audio: {audio_path}")
-        print(f"Output: {output_path}")
-
-        # FFmpeg command to merge audio and video
-        # -i: input files
-        # -c:v copy: copy video stream without re-encoding (fast)
-        # -c:a libopus: convert audio to Opus codec (WebM compatible)
-        # -shortest: finish encoding when shortest input stream ends
-        cmd = [
-            'ffmpeg',
-            '-i', video_path,        # Input video
-            '-i', audio_path,        # Input audio
-            '-c:v', 'copy',          # Copy video stream without re-encoding
-            '-c:a', 'libopus',       # Convert audio to Opus for WebM
-            '-shortest',             # Match shortest duration
-            '-y',                    # Overwrite output file if exists
-            output_path
-        ]
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=600
-        )
+        # Create the S3 key: staging_area/<uuid>/video.webm
+        s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/video.webm"
 
-        if result.returncode != 0:
-            print(f"FFmpeg stderr: {result.stderr}")
-            raise Exception(f"FFmpeg failed with return code {result.returncode}: {result.stderr}")
+        # Stream the file in parts - long recordings never sit in memory as a whole
+        upload = upload_file(video_path, S3_BUCKET, s3_key, 'video/webm', REGION)
+        record_upload(submission_id, 'video', upload, 'video/webm', final=final,
+                      throughput_mbps=upload['throughput_mbps'], **extra)
 
-        print(f"Successfully merged audio and video: {output_path}")
-        return output_path
+        log.info(f"Successfully saved video to s3://{S3_BUCKET}/{s3_key}")
+        return s3_key
 
-    except subprocess.TimeoutExpired:
-        print("FFmpeg merge timed out after 2 minutes")
-        raise Exception("FFmpeg merge timed out")
     except Exception as e:
-        print(f"Error merging audio and video: {e}")
+        log.error(f"Error saving video to S3: {e}")
         raise
 
 
-def get_video_duration(video_path):
-    """Get the duration of a video file in seconds using ffprobe
-
-    Args:
-        video_path: Path to the video file
-
-    Returns:
-        Duration in seconds (float)
-    """
-    import subprocess
-    import json
-
+def save_timings_to_s3(timings, submission_id):
+    """Save the per-stage timing breakdown of a job to S3 next to its artifacts"""
     try:
-        # Use ffprobe to get video duration
-        cmd = [
-            'ffprobe',
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_format',
-            video_path
-        ]
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-
-        if result.returncode != 0:
-            raise Exception(f"ffprobe failed: {result.stderr}")
-
-        data = json.loads(result.stdout)
-        duration = float(data['format']['duration'])
-
-        print(f"✓ Video duration: {duration:.2f} seconds ({duration/60:.2f} minutes)")
-        return duration
-
-    except Exception as e:
-        print(f"Error getting video duration: {e}")
-        # Return default 2 minutes if we can't measure
-        print("⚠️  Defaulting to 120 seconds (2 minutes)")
-        return 120.0
-
-
-def get_audio_duration(audio_path):
-    """Get the duration of an audio file in seconds using ffprobe
-
-    Args:
-        audio_path: Path to the audio file
-
-    Returns:
-        Duration in seconds (float)
-    """
-    import subprocess
-    import json
-
-    try:
-        # Use ffprobe to get audio duration
-        cmd = [
-            'ffprobe',
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_format',
-            audio_path
-        ]
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-
-        if result.returncode != 0:
-            raise Exception(f"ffprobe failed: {result.stderr}")
-
-        data = json.loads(result.stdout)
-        duration = float(data['format']['duration'])
-
-        print(f"✓ Audio duration: {duration:.2f} seconds ({duration/60:.2f} minutes)")
-        return duration
-
+        s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/timings.json"
+        upload = upload_bytes(json.dumps(timings, indent=2), S3_BUCKET, s3_key, 'application/json', REGION)
+        record_upload(submission_id, 'timings', upload, 'application/json')
+        log.info(f"Successfully saved timings to s3://{S3_BUCKET}/{s3_key}")
+        return s3_key
     except Exception as e:
-        print(f"Error getting audio duration: {e}")
-        # Return default 0 if we can't measure
-        print("⚠️  Defaulting to 0 seconds")
-        return 0.0
+        log.error(f"Error saving timings to S3: {e}")
+        return None
 
 
+@traced('end_slide.render')
 def generate_end_slide(title, description, url, output_path, width=1280, height=720):
     """Generate an end slide image with website details in brown theme
 
@@ -443,35 +282,23 @@ def generate_end_slide(title, description, url, output_path, width=1280, height=
     Returns:
         Path to the generated image
     """
-    from PIL import Image, ImageDraw, ImageFont
+    from PIL import ImageDraw
     import textwrap
 
     try:
-        print(f"Generating end slide...")
-        print(f"Title: {title}")
-        print(f"Description: {description}")
-        print(f"URL: {url}")
-
-        # Kirbuk brown theme colors (matching website)
-        bg_color = "#8B4513"      # Brown background
-        text_color = "#FFF8DC"    # Cornsilk text
-        accent_color = "#D2691E"  # Chocolate accent
-
-        # Create image
-        img = Image.new('RGB', (width, height), color=bg_color)
+        log.info("Generating end slide", title=title, description=description, url=url)
+
+        text_color = SLIDE_TEXT_COLOR
+        accent_color = SLIDE_ACCENT_COLOR
+
+        # Start from the pre-rendered background (brown frame and accent lines)
+        img = slide_background(width, height)
         draw = ImageDraw.Draw(img)
 
-        # Load fonts - try DejaVu fonts installed in Docker
-        try:
-            title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 60)
-            desc_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 28)
-            url_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 40)
-            print("✓ Loaded DejaVu fonts")
-        except Exception as e:
-            print(f"⚠️  Could not load DejaVu fonts: {e}")
-            # Fallback to default font
-            title_font = desc_font = url_font = ImageFont.load_default()
-            print("⚠️  Using default font as fallback")
+        # DejaVu fonts installed in Docker, loaded once per process
+        title_font = get_font('bold', 60)
+        desc_font = get_font('regular', 28)
+        url_font = get_font('bold', 40)
 
         # Wrap text into multiple lines if needed
         max_title_chars = 40
@@ -529,90 +356,21 @@ def generate_end_slide(title, description, url, output_path, width=1280, height=
         url_bbox = draw.textbbox((0, 0), url, font=url_font)
         url_width = url_bbox[2] - url_bbox[0]
         url_x = (width - url_width) // 2
-        url_y = int(height * 0.70)
+        url_y = int(height * SLIDE_URL_Y)
 
         # URL (with accent color and shadow)
         draw.text((url_x + shadow_offset, url_y + shadow_offset), url, font=url_font, fill="#000000")
         draw.text((url_x, url_y), url, font=url_font, fill=accent_color)
 
-        # Draw horizontal lines above and below URL
-        line_y_top = url_y - 20
-        line_y_bottom = url_y + 60
-        draw.rectangle([(int(width*0.2), line_y_top), (int(width*0.8), line_y_top + 2)], fill=accent_color)
-        draw.rectangle([(int(width*0.2), line_y_bottom), (int(width*0.8), line_y_bottom + 2)], fill=accent_color)
-
         # Save image
         img.save(output_path, 'PNG')
-        print(f"✓ End slide generated: {output_path} ({os.path.getsize(output_path):,} bytes)")
+        log.info(f"End slide generated: {output_path} ({os.path.getsize(output_path):,} bytes)")
+        annotate(bytes=os.path.getsize(output_path), width=width, height=height)
 
         return output_path
 
     except Exception as e:
-        print(f"Error generating end slide: {e}")
-        raise
-
-
-def append_end_slide_to_video(video_path, slide_path, output_path, slide_duration=5, fade_duration=1.0):
-    """Append end slide to silent video with fade transition
-
-    Note: This should be called BEFORE adding audio to the video
-
-    Args:
-        video_path: Path to input video file (silent/no audio)
-        slide_path: Path to end slide PNG image
-        output_path: Path for output video
-        slide_duration: How long to show the slide in seconds (default: 5)
-        fade_duration: Fade-in duration in seconds (default: 1.0)
-
-    Returns:
-        Path to the output video
-    """
-    import subprocess
-
-    try:
-        print(f"Appending end slide to video...")
-        print(f"Video: {video_path}")
-        print(f"Slide: {slide_path}")
-        print(f"Output: {output_path}")
-        print(f"Slide duration: {slide_duration}s, Fade: {fade_duration}s")
-
-        # FFmpeg command to append slide with fade (no audio handling needed)
-        cmd = [
-            'ffmpeg',
-            '-i', video_path,                               # Input: original video (silent)
-            '-loop', '1',                                   # Loop the image
-            '-t', str(slide_duration),                      # Duration of slide
-            '-i', slide_path,                               # Input: end slide image
-            '-filter_complex',
-            # Scale slide to match resolution, add fade-in, then concatenate
-            f'[1:v]scale=1280:720,format=yuv420p,'
-            f'fade=t=in:st=0:d={fade_duration}[slide];'
-            f'[0:v][slide]concat=n=2:v=1:a=0[outv]',
-            '-map', '[outv]',                               # Map concatenated video
-            '-c:v', 'libvpx-vp9',                          # Video codec
-            '-y',                                           # Overwrite output
-            output_path
-        ]
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=600
-        )
-
-        if result.returncode != 0:
-            print(f"FFmpeg stderr: {result.stderr}")
-            raise Exception(f"FFmpeg failed with return code {result.returncode}")
-
-        print(f"✓ End slide appended to video: {output_path} ({os.path.getsize(output_path):,} bytes)")
-        return output_path
-
-    except subprocess.TimeoutExpired:
-        print("FFmpeg timeout after 120 seconds")
-        raise Exception("Video concatenation timed out")
-    except Exception as e:
-        print(f"Error appending end slide: {e}")
+        log.error(f"Error generating end slide: {e}")
         raise
 
 
@@ -627,9 +385,7 @@ def extract_product_info(narrative_script, product_url):
         Dictionary with 'title' and 'description' keys
     """
     try:
-        print("Extracting product title and description from narrative...")
-
-        agent = Agent(model=MODEL_ID)
+        log.info("Extracting product title and description from narrative...")
 
         prompt = f"""Extract the website/product title and a one-sentence description from this narrative:
 
@@ -645,8 +401,7 @@ Guidelines:
 - Keep the description under 80 characters
 - Do not include quotes or extra formatting in the values"""
 
-        result = agent(prompt)
-        response_text = result.message.get('content', [{}])[0].get('text', str(result))
+        response_text = complete(prompt, MODEL_ID, label='product_info')
 
         # Try to parse JSON from response
         import json
@@ -663,8 +418,7 @@ Guidelines:
             title = product_url.split('/')[2]
             description = 'Check out this product'
 
-        print(f"✓ Extracted - Title: {title}")
-        print(f"✓ Extracted - Description: {description}")
+        log.info(f"Extracted product info: {title}", title=title, description=description)
 
         return {
             'title': title,
@@ -672,11 +426,11 @@ Guidelines:
         }
 
     except Exception as e:
-        print(f"⚠️  Error extracting product info: {e}")
+        log.error(f"Error extracting product info: {e}")
         # Fallback to URL-based info
         title = product_url.split('/')[2] if '/' in product_url else product_url
         description = 'Check out this product'
-        print(f"⚠️  Using fallback - Title: {title}, Description: {description}")
+        log.warning(f"Using fallback product info: {title}", title=title, description=description)
         return {
             'title': title,
             'description': description
@@ -686,27 +440,22 @@ Guidelines:
 def save_voice_script_to_s3(voice_script, submission_id):
     """Save the SSML voice script to S3 in the staging area"""
     try:
-        s3_client = boto3.client('s3', region_name=REGION)
-
         # Create the S3 key: staging_area/<uuid>/voice_script.ssml
         s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/voice_script.ssml"
 
         # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=s3_key,
-            Body=voice_script,
-            ContentType='application/ssml+xml'
-        )
+        upload = upload_bytes(voice_script, S3_BUCKET, s3_key, 'application/ssml+xml', REGION)
+        record_upload(submission_id, 'voice_script', upload, 'application/ssml+xml')
 
-        print(f"Successfully saved voice script to s3://{S3_BUCKET}/{s3_key}")
+        log.info(f"Successfully saved voice script to s3://{S3_BUCKET}/{s3_key}")
         return s3_key
 
     except Exception as e:
-        print(f"Error saving voice script to S3: {e}")
+        log.error(f"Error saving voice script to S3: {e}")
         raise
 
 
+@traced('email')
 def send_email_notification(subject, body, recipient_email, submission_id=None, use_video_link=False):
     """Send email notification using AWS SES
 
@@ -718,7 +467,7 @@ def send_email_notification(subject, body, recipient_email, submission_id=None,
         use_video_link: If True, link to /video/ page; if False, link to /submission/ status page
     """
     try:
-        ses_client = boto3.client('ses', region_name=REGION)
+        ses_client = get_client('ses', REGION)
 
         # Build the styled HTML email body matching web app colors
         html_body = f"""<!DOCTYPE html>
@@ -836,26 +585,57 @@ def send_email_notification(subject, body, recipient_email, submission_id=None,
             }
         )
 
-        print(f"✓ Email sent successfully: {subject}")
-        print(f"  Message ID: {response['MessageId']}")
+        log.info(f"Email sent successfully: {subject}", message_id=response['MessageId'])
+        annotate(subject=subject, message_id=response['MessageId'])
         return response
 
     except Exception as e:
-        print(f"✗ Error sending email: {e}")
         # Don't fail the workflow if email fails
-        import traceback
-        print(f"Email error traceback: {traceback.format_exc()}")
+        log.error(f"Error sending email: {e}", exc_info=True)
+        annotate(subject=subject, error=str(e)[:500])
+
+
+def synthesize_voice(voice_script, submission_id, workspace):
+    """Synthesize the narration into the workspace as 'voice.mp3' and checkpoint it to S3
+
+    Chunks are synthesized in parallel (see speech.py). If that is not possible the whole
+    script goes through the asynchronous Polly task instead.
+
+    Returns:
+        S3 key of the narration
+    """
+    voice_path = workspace.path('voice.mp3')
+    try:
+        timeline = synthesize_ssml(voice_script, voice_path, region=REGION, cache_bucket=S3_BUCKET)
+    except Exception as e:
+        log.warning(f"Parallel synthesis failed ({e}), falling back to a single Polly task")
+        # A partial file would make workspace.fetch skip downloading the Polly output
+        if os.path.exists(voice_path):
+            os.remove(voice_path)
+        s3_key = synthesize_voice_with_polly(voice_script, submission_id)
+        workspace.fetch('voice.mp3', s3_key)
+        return s3_key
 
+    s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/voice.mp3"
+    upload = upload_file(voice_path, S3_BUCKET, s3_key, 'audio/mpeg', REGION)
+    record_upload(submission_id, 'voice_audio', upload, 'audio/mpeg')
 
+    # Chunk offsets let later stages line narration up with the recording
+    timeline_key = f"{S3_STAGING_PREFIX}/{submission_id}/voice_timeline.json"
+    timeline_upload = upload_bytes(json.dumps({'chunks': timeline}, indent=2), S3_BUCKET, timeline_key,
+                                   'application/json', REGION)
+    record_upload(submission_id, 'voice_timeline', timeline_upload, 'application/json')
+    return s3_key
+
+
+@traced('polly.task')
 def synthesize_voice_with_polly(voice_script, submission_id):
     """Synthesize voice from SSML script using AWS Polly async API with Matthew voice and generative engine"""
-    import time
-
     try:
-        polly_client = boto3.client('polly', region_name=REGION)
+        polly_client = get_client('polly', REGION)
 
-        print("Starting async voice synthesis with AWS Polly (Matthew voice, generative engine)...")
-        print(f"Voice script length: {len(voice_script)} characters")
+        log.info("Starting async voice synthesis with AWS Polly (Matthew voice, generative engine)",
+                 characters=len(voice_script))
 
         # Start asynchronous synthesis task
         # Polly will write the MP3 directly to S3
@@ -870,76 +650,73 @@ def synthesize_voice_with_polly(voice_script, submission_id):
         )
 
         task_id = response['SynthesisTask']['TaskId']
-        print(f"Synthesis task started with ID: {task_id}")
+        log.info(f"Synthesis task started with ID: {task_id}")
 
-        # Poll for task completion
-        max_wait_time = 300  # 5 minutes max
-        poll_interval = 2    # Poll every 2 seconds
-        elapsed_time = 0
-
-        while elapsed_time < max_wait_time:
-            task_status = polly_client.get_speech_synthesis_task(TaskId=task_id)
-            task = task_status['SynthesisTask']
+        def check_task():
+            task = polly_client.get_speech_synthesis_task(TaskId=task_id)['SynthesisTask']
             status = task['TaskStatus']
-
-            print(f"Synthesis status: {status} (elapsed: {elapsed_time}s)")
-
             if status == 'completed':
-                output_uri = task['OutputUri']
-                print(f"✓ Voice synthesis completed successfully")
-                print(f"Output URI: {output_uri}")
-
-                # Parse the S3 key from the OutputUri
-                # Format: https://s3.region.amazonaws.com/bucket/key or
-                #         https://bucket.s3.region.amazonaws.com/key
-                import urllib.parse
-                parsed = urllib.parse.urlparse(output_uri)
-                # Extract key from path (remove leading /)
-                polly_s3_key = parsed.path.lstrip('/')
-                # If bucket is in hostname, we need to handle that
-                if S3_BUCKET in parsed.netloc:
-                    # Format is bucket.s3.region.amazonaws.com/key
-                    polly_s3_key = parsed.path.lstrip('/')
-                else:
-                    # Format is s3.region.amazonaws.com/bucket/key
-                    # Remove bucket name from path
-                    path_parts = parsed.path.lstrip('/').split('/', 1)
-                    if len(path_parts) > 1:
-                        polly_s3_key = path_parts[1]
-
-                print(f"Polly created file at S3 key: {polly_s3_key}")
-
-                # Our expected key
-                s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/voice.mp3"
-
-                # Copy to our expected filename
-                s3_client = boto3.client('s3', region_name=REGION)
-                s3_client.copy_object(
-                    Bucket=S3_BUCKET,
-                    CopySource={'Bucket': S3_BUCKET, 'Key': polly_s3_key},
-                    Key=s3_key
-                )
-                print(f"✓ Renamed synthesis output from {polly_s3_key} to {s3_key}")
+                return task
+            if status == 'failed':
+                reason = task.get('TaskStatusReason', 'Unknown reason')
+                raise Exception(f"Polly synthesis task failed: {reason}")
+            return None
+
+        def log_poll(waiter, task):
+            state = 'completed' if task else 'in progress'
+            log.info(f"Synthesis status: {state} (poll {waiter.polls}, elapsed: {waiter.elapsed:.0f}s)")
+
+        # Short tasks finish within seconds; long ones are polled less and less often
+        waiter = Waiter('polly_synthesis_task', timeout=300, initial_delay=2.0, max_delay=15.0,
+                        multiplier=1.5, on_poll=log_poll)
+        task = waiter.wait(check_task)
+        annotate(characters=len(voice_script), polls=waiter.polls)
+
+        output_uri = task['OutputUri']
+        log.info("Voice synthesis completed successfully", output_uri=output_uri)
+
+        # Parse the S3 key from the OutputUri
+        # Format: https://s3.region.amazonaws.com/bucket/key or
+        #         https://bucket.s3.region.amazonaws.com/key
+        import urllib.parse
+        parsed = urllib.parse.urlparse(output_uri)
+        # Extract key from path (remove leading /)
+        polly_s3_key = parsed.path.lstrip('/')
+        # If bucket is in hostname, we need to handle that
+        if S3_BUCKET in parsed.netloc:
+            # Format is bucket.s3.region.amazonaws.com/key
+            polly_s3_key = parsed.path.lstrip('/')
+        else:
+            # Format is s3.region.amazonaws.com/bucket/key
+            # Remove bucket name from path
+            path_parts = parsed.path.lstrip('/').split('/', 1)
+            if len(path_parts) > 1:
+                polly_s3_key = path_parts[1]
 
-                # Delete the original Polly file
-                s3_client.delete_object(Bucket=S3_BUCKET, Key=polly_s3_key)
-                print(f"✓ Deleted temporary file: {polly_s3_key}")
+        log.info(f"Polly created file at S3 key: {polly_s3_key}")
 
-                return s3_key
+        # Our expected key
+        s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/voice.mp3"
 
-            elif status == 'failed':
-                reason = task.get('TaskStatusReason', 'Unknown reason')
-                raise Exception(f"Polly synthesis task failed: {reason}")
+        # Copy to our expected filename
+        s3_client = get_client('s3', REGION)
+        copy_response = s3_client.copy_object(
+            Bucket=S3_BUCKET,
+            CopySource={'Bucket': S3_BUCKET, 'Key': polly_s3_key},
+            Key=s3_key
+        )
+        log.info(f"Renamed synthesis output from {polly_s3_key} to {s3_key}")
+        record_artifact(submission_id, 'voice_audio', s3_key, None,
+                        copy_response.get('CopyObjectResult', {}).get('ETag'), 'audio/mpeg')
 
-            # Wait before next poll
-            time.sleep(poll_interval)
-            elapsed_time += poll_interval
+        # Delete the original Polly file
+        s3_client.delete_object(Bucket=S3_BUCKET, Key=polly_s3_key)
+        log.info(f"Deleted temporary file: {polly_s3_key}")
 
-        # Timeout
-        raise Exception(f"Polly synthesis task timed out after {max_wait_time} seconds")
+        return s3_key
 
     except Exception as e:
-        print(f"Error synthesizing voice with Polly: {e}")
+        log.error(f"Error synthesizing voice with Polly: {e}")
         raise
 
 
@@ -984,10 +761,7 @@ TONE - PROFESSIONAL MODE:
 - Maintain an informative, friendly delivery
 """
 
-        # Create a simple agent without tools to generate the SSML voice script
-        agent = Agent(
-            model=MODEL_ID,
-            system_prompt=f"""You are an expert at creating SSML (Speech Synthesis Markup Language) voice scripts for demo videos using AWS Polly Generative engine.
+        system_prompt = f"""You are an expert at creating SSML (Speech Synthesis Markup Language) voice scripts for demo videos using AWS Polly Generative engine.
 
 CRITICAL TIMING REQUIREMENT: The video is EXACTLY {video_duration_seconds:.1f} seconds ({minutes:.2f} minutes) long.
 Your narration MUST match this exact duration:
@@ -1033,7 +807,6 @@ Requirements:
 10. Time the narration to match the ~2 minute video duration
 
 The voice-over should guide the viewer through the demo, explaining features and benefits naturally."""
-        )
 
         # Build prompt with narrative and optionally Playwright script
         prompt = f"""Create an SSML voice-over script for a demo video of this website: {product_url}
@@ -1078,7 +851,8 @@ IMPORTANT SYNCHRONIZATION RULES:
 - Use <break> tags to create pauses that align your speech with the timestamp intervals
 - Example: If you see "00:05 - Navigating to homepage" and "00:08 - Clicking Features",
   you should narrate about navigation, then add a ~3 second pause before talking about clicking Features
-- The timestamps are the ground truth - follow them precisely for perfect video/audio sync"""
+- The timestamps are the ground truth - follow them precisely for perfect video/audio sync
+- Lines like "[skipped segment '...']" mark script sections that failed and are NOT in the video - do not narrate them"""
 
         prompt += """
 
@@ -1090,8 +864,7 @@ Create an engaging voice-over that:
 
 Return only the SSML code, nothing else."""
 
-        result = agent(prompt)
-        voice_script = result.message.get('content', [{}])[0].get('text', str(result))
+        voice_script = complete(prompt, MODEL_ID, system_prompt=system_prompt, label='voice_script')
 
         # Clean up the code if it has markdown code blocks
         if '```xml' in voice_script:
@@ -1130,24 +903,48 @@ Return only the SSML code, nothing else."""
             # Remove closing tags
             voice_script = re.sub(rf'</{tag}>', '', voice_script, flags=re.IGNORECASE)
 
-        print(f"✓ SSML sanitized - removed unsupported tags")
+        log.info("SSML sanitized - removed unsupported tags")
 
         return voice_script
 
     except Exception as e:
-        print(f"Error generating voice script: {e}")
+        log.error(f"Error generating voice script: {e}")
         raise
 
 
 def generate_playwright_script(script_text, product_url, additional_directions=None):
     """Generate a Playwright Python script from the narrative script"""
     try:
-        # Create a simple agent without tools to generate the Playwright script
-        agent = Agent(
-            model=PLAYWRIGHT_MODEL_ID,
-            system_prompt="""You are an expert at creating Playwright Python scripts for web automation and demo video creation.
-Given a narrative script of what to do on a website, create a complete, runnable Playwright Python script.
-Make sure the script is configured to save videos using context.record_video_dir="videos/" and context.record_video_size={"width": 1280, "height":720}.
+        system_prompt = """You are an expert at creating Playwright Python scripts for web automation and demo video creation.
+Given a narrative script of what to do on a website, create a Playwright Python script.
+
+CRITICAL - SCRIPT STRUCTURE:
+The browser is already running and recording. The script MUST be split into segments - one
+async function per beat of the narrative - listed in order in SEGMENTS:
+
+```python
+async def open_homepage(page, log):
+    # page: an open Page (1280x720 viewport, English locale, video recording on)
+    # log: call log("action description") before every action
+    log("Navigating to homepage")
+    await page.goto("https://example.com")
+    await page.wait_for_timeout(3000)
+
+async def show_features(page, log):
+    log("Clicking on 'Features' link")
+    ...
+
+SEGMENTS = [open_homepage, show_features]
+```
+
+- DO NOT launch a browser, create a browser context, call async_playwright() or asyncio.run()
+- DO NOT configure video recording or save the video - the recording is saved automatically
+- Put imports at the top of the file and all actions inside the segment functions
+- The first segment must start with page.goto(...)
+- Each segment covers 3-6 actions (about 10-25 seconds of video); use 6-12 segments
+- If a segment raises, it is retried from the URL it started on, or skipped and cut from the
+  video. A segment must therefore work starting from the page the previous segment ended on
+  and must not rely on menus, hovers or popups opened by an earlier segment
 
 CRITICAL - DO NOT CREATE LOGIN/REGISTRATION FLOWS:
 - DO NOT attempt to sign up, register, or create accounts
@@ -1192,34 +989,28 @@ except:
 
 Requirements:
 1. Use async Playwright with Python
-2. Include proper imports and setup (including 'import time' for timestamp tracking)
+2. Include proper imports (e.g. 're' for regex selectors)
 3. Add appropriate waits and error handling - use page.wait_for_timeout() liberally
 4. Include comments explaining each step
-5. Make the script record video to 'output.webm' file
+5. Use the provided page; do not create a new context (the recording only covers this context)
 6. Return ONLY the Python code, no explanations
 7. Use multiple selector strategies with fallbacks (text > role > class > generic)
 8. Handle common issues like popups, cookies, etc.
-9. The script MUST save video as 'output.webm' in current directory
+9. Never call time.sleep() - always await page.wait_for_timeout()
 10. Pace the actions to create a ~2 minute video that matches the voice narration timing
-11. Set browser locale to English and include Accept-Language header to ensure website displays in English:
-    - Use locale='en-US' in browser.new_context()
-    - Set extra_http_headers={'Accept-Language': 'en-US,en;q=0.9'} in browser.new_context()
+11. The context already uses an English locale and Accept-Language header
 12. Always use .first when selecting elements to avoid ambiguous locator errors
 13. Add generous timeouts (5-10 seconds) for element visibility checks
-14. If script gets stuck, it should gracefully continue instead of failing completely
+14. If every fallback for an action fails, let the exception propagate - the segment is then retried or skipped instead of recording a stuck page
 
 CRITICAL - TIMESTAMP LOGGING REQUIREMENT:
-15. At the START of the script (right after browser launch), record the start time: start_time = time.time()
-16. Before EVERY action (navigate, click, type, scroll, etc.), print a timestamp log message showing elapsed time and the action:
-    - Calculate elapsed time: elapsed = time.time() - start_time
-    - Format as MM:SS (e.g., "01:23" for 1 minute 23 seconds)
-    - Print format: print(f"{minutes:02d}:{seconds:02d} - [action description]")
-    - Example: print(f"{int(elapsed)//60:02d}:{int(elapsed)%60:02d} - Navigating to homepage")
-    - Example: print(f"{int(elapsed)//60:02d}:{int(elapsed)%60:02d} - Clicking on 'Features' button")
-    - Example: print(f"{int(elapsed)//60:02d}:{int(elapsed)%60:02d} - Scrolling to pricing section")
+15. Before EVERY action (navigate, click, type, scroll, etc.), call log() with a short description of the action:
+    - Example: log("Navigating to homepage")
+    - Example: log("Clicking on 'Features' button")
+    - Example: log("Scrolling to pricing section")
+16. log() prefixes the elapsed video time (MM:SS) itself - do not print timestamps or track a start time
 17. These timestamp logs help synchronize the video with the voice narration and debug timing issues
 """
-        )
 
         prompt = f"""Create a Playwright Python script for the following website: {product_url}
 
@@ -1232,10 +1023,9 @@ The script should follow this narrative:
 Additional user directions to incorporate:
 {additional_directions}"""
 
-        prompt += "\n\nIMPORTANT: The script MUST record video and save it as 'output.webm'. Return only the Python code, nothing else.\n\nREMINDER: DO NOT include any login, signup, or registration actions in the script. Stay on public pages only."
+        prompt += "\n\nIMPORTANT: The script MUST define SEGMENTS, a list of `async def segment(page, log)` functions, and must not launch a browser. Return only the Python code, nothing else.\n\nREMINDER: DO NOT include any login, signup, or registration actions in the script. Stay on public pages only."
 
-        result = agent(prompt)
-        playwright_code = result.message.get('content', [{}])[0].get('text', str(result))
+        playwright_code = complete(prompt, PLAYWRIGHT_MODEL_ID, system_prompt=system_prompt, label='playwright_script')
 
         # Clean up the code if it has markdown code blocks
         if '```python' in playwright_code:
@@ -1246,215 +1036,501 @@ Additional user directions to incorporate:
         return playwright_code
 
     except Exception as e:
-        print(f"Error generating Playwright script: {e}")
+        log.error(f"Error generating Playwright script: {e}")
         raise
 
 
-def execute_playwright_script(playwright_code, submission_id):
-    """Execute the Playwright script, merge audio with video, and upload the resulting video to S3
+def defines_runner_entrypoint(playwright_code):
+    """Return True if a generated script uses the SEGMENTS or run(context, page) contract"""
+    pattern = r'^(SEGMENTS\s*=|async\s+def\s+run\s*\()'
+    return re.search(pattern, playwright_code, flags=re.MULTILINE) is not None
+
+
+def cut_failed_segments(video_path, temp_dir, encoding_profile=None):
+    """Remove the intervals of failed segment attempts listed in segments.json
 
     Returns:
-        tuple: (s3_key, stdout_output) - S3 key of uploaded video and the stdout output from script execution
+        Path of the recording to use (the input if nothing had to be cut)
+    """
+    report_path = os.path.join(temp_dir, 'segments.json')
+    if not os.path.exists(report_path):
+        return video_path
+    with open(report_path) as f:
+        report = json.load(f)
+
+    skipped = [entry['name'] for entry in report['segments'] if entry['status'] != 'ok']
+    retried = sum(1 for entry in report['segments'] if entry['status'] == 'ok' and entry['attempts'] > 1)
+    log.info(f"Segments: {len(report['segments'])} total, {retried} retried, {len(skipped)} skipped"
+             + (f" ({', '.join(skipped)})" if skipped else ""))
+    annotate(segments=len(report['segments']), retried_segments=retried, skipped_segments=len(skipped))
+    if not report['cuts']:
+        return video_path
+    return remove_intervals(video_path, report['cuts'], os.path.join(temp_dir, 'output_cut.webm'),
+                            profile=get_profile(encoding_profile))
+
+
+def save_playwright_output_to_s3(attempts, submission_id):
+    """Save the stderr of every attempt and the stdout of failed attempts to S3 in one artifact
+
+    The stdout of the successful attempt is saved separately as the execution log.
     """
+    sections = []
+    for attempt in attempts:
+        mode = 'headless' if attempt.get('headless') else 'xvfb'
+        header = f"attempt {attempt['attempt']} ({mode}, return code {attempt['returncode']})"
+        if attempt['returncode'] != 0 and attempt['stdout']:
+            sections.append(f"=== {header} stdout ===\n{attempt['stdout']}")
+        if attempt['stderr']:
+            sections.append(f"=== {header} stderr ===\n{attempt['stderr']}")
+    if not sections:
+        return None
     try:
-        # Create a temporary directory for execution
-        with tempfile.TemporaryDirectory() as temp_dir:
-            print(f"Executing Playwright script in {temp_dir}")
+        s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/playwright_output.log"
+        upload = upload_bytes('\n\n'.join(sections), S3_BUCKET, s3_key, 'text/plain', REGION)
+        record_upload(submission_id, 'playwright_output', upload, 'text/plain')
+        log.info(f"Playwright output saved to S3: {s3_key}")
+        return s3_key
+    except Exception as e:
+        log.error(f"Failed to save Playwright output: {e}")
+        return None
 
-            # Write the script to a file
-            script_path = os.path.join(temp_dir, 'playwright_script.py')
-            with open(script_path, 'w') as f:
-                f.write(playwright_code)
 
-            print(f"✓ Script written to {script_path}")
-            print(f"Script length: {len(playwright_code)} characters, {len(playwright_code.splitlines())} lines")
-
-            # Log first 50 lines of script for debugging
-            script_lines = playwright_code.splitlines()
-            print("\n" + "=" * 80)
-            print("PLAYWRIGHT SCRIPT (first 50 lines):")
-            print("=" * 80)
-            for i, line in enumerate(script_lines[:50], 1):
-                print(f"{i:3d}: {line}")
-            if len(script_lines) > 50:
-                print(f"... ({len(script_lines) - 50} more lines)")
-            print("=" * 80 + "\n")
-
-            # Retry 3 times if the script fails
-            for i in range(3):
-                # Execute the script
-                print("Running Playwright script...")
-                print(f"Command: python {script_path}")
-                print(f"Working directory: {temp_dir}")
-
-                result = subprocess.run(
-                    ['python', script_path],
-                    cwd=temp_dir,
-                    capture_output=True,
-                    text=True,
-                    timeout=1000
-                )
+def execute_playwright_script(playwright_code, submission_id, workspace, encoding_profile=None,
+                              product_url=None, recording_mode=None):
+    """Execute the Playwright script and checkpoint the silent recording to S3
 
-                print(f"\n{'=' * 80}")
-                print(f"SCRIPT EXECUTION COMPLETED")
-                print(f"{'=' * 80}")
-                print(f"Return code: {result.returncode}")
-                print(f"Stdout length: {len(result.stdout)} characters")
-                print(f"Stderr length: {len(result.stderr)} characters")
-
-                if result.stdout:
-                    print(f"\n{'=' * 80}")
-                    print(f"STDOUT:")
-                    print(f"{'=' * 80}")
-                    print(result.stdout)
-                    print(f"{'=' * 80}\n")
-                else:
-                    print("⚠️  No stdout output")
-
-                if result.stderr:
-                    print(f"\n{'=' * 80}")
-                    print(f"STDERR:")
-                    print(f"{'=' * 80}")
-                    print(result.stderr)
-                    print(f"{'=' * 80}\n")
+    Args:
+        playwright_code: The generated Playwright script
+        submission_id: Submission ID used for the S3 checkpoint
+        workspace: JobWorkspace that receives the recording as 'silent_video.webm'
+        encoding_profile: Name of the encoding profile for re-encoding a cut recording
+        product_url: Recorded site; sites that only recorded fine on Xvfb before start there
+        recording_mode: 'headless' (with a fallback to Xvfb) or 'xvfb' (default: KIRBUK_RECORDING_MODE)
+
+    Returns:
+        tuple: (video_path, stdout_output) - local path of the silent video and the stdout output from script execution
+    """
+    try:
+        # Execute inside the job workspace so the recording stays local for later stages
+        temp_dir = workspace.directory('playwright')
+        log.info(f"Executing Playwright script in {temp_dir}")
+
+        # Write the script to a file
+        script_path = os.path.join(temp_dir, 'playwright_script.py')
+        with open(script_path, 'w') as f:
+            f.write(playwright_code)
+
+        script_lines = playwright_code.splitlines()
+        log.info(f"Script written to {script_path}", characters=len(playwright_code), lines=len(script_lines))
+
+        # The full script is saved to S3; the listing is only logged for sampled jobs
+        log.verbose("Playwright script (first 50 lines)",
+                    script='\n'.join(f"{i:3d}: {line}" for i, line in enumerate(script_lines[:50], 1)))
+
+        # Scripts with SEGMENTS or a run(context, page) entrypoint use a warm browser; older
+        # scripts launch their own browser in a subprocess
+        warm = defines_runner_entrypoint(playwright_code)
+        # Only the warm runner controls the browser launch, so only those scripts run headless
+        headless = warm and starts_headless(product_url, recording_mode)
+        headless_failed = False
+
+        # Segmented scripts retry failing segments inside one run; the whole script is
+        # only rerun (up to 3 times) if it fails as a whole
+        attempts = []
+        for i in range(PLAYWRIGHT_ATTEMPTS):
+            # Execute the script
+            log.info(f"Running Playwright script (attempt {i + 1}/{PLAYWRIGHT_ATTEMPTS})", cwd=temp_dir)
+
+            with span('playwright.attempt', attempt=i + 1, warm=warm,
+                      recording_mode='headless' if headless else 'xvfb') as attempt_span:
+                if warm:
+                    result = run_script(script_path, temp_dir, PLAYWRIGHT_SCRIPT_TIMEOUT, attempt=i,
+                                        headless=headless, display=None if headless else ensure_display())
                 else:
-                    print("✓ No stderr output")
+                    ensure_display()
+                    log.info(f"Command: python {script_path}")
+                    result = subprocess.run(
+                        ['python', script_path],
+                        cwd=temp_dir,
+                        capture_output=True,
+                        text=True,
+                        timeout=PLAYWRIGHT_SCRIPT_TIMEOUT
+                    )
+                attempt_span.set(returncode=result.returncode, stdout_bytes=len(result.stdout))
+            record_attempt(headless)
+
+            # Full stdout and stderr go to S3 once (below), not into the log stream
+            attempts.append({'attempt': i + 1, 'headless': headless, 'returncode': result.returncode,
+                             'stdout': result.stdout, 'stderr': result.stderr})
+            log.info("Playwright script finished", attempt=i + 1, returncode=result.returncode,
+                     stdout_chars=len(result.stdout), stderr_chars=len(result.stderr))
+
+            if result.returncode == 0:
+                if headless_failed:
+                    # Only a site that needs the display is recorded headed from the start next time
+                    record_headed_success(product_url)
+                break
+
+            log.warning(f"Playwright script failed with return code {result.returncode}, retrying",
+                        stderr_tail=result.stderr[-2000:])
+            if headless:
+                # The site may misbehave without a display - the remaining attempts run on Xvfb
+                log.warning("Playwright script failed headless - retrying headed on Xvfb")
+                record_headless_failure(product_url)
+                headless = False
+                headless_failed = True
+
+        annotate(attempts=i + 1, retries=i, script_lines=len(script_lines))
+        save_playwright_output_to_s3(attempts, submission_id)
+        if result.returncode != 0:
+            raise Exception(f"Playwright script failed with return code {result.returncode}: {result.stderr[-2000:]}")
+
+        # The directory listing is only logged for sampled jobs
+        log.verbose("Files in the Playwright directory", files={
+            os.path.relpath(os.path.join(root, file), temp_dir): os.path.getsize(os.path.join(root, file))
+            for root, dirs, files in os.walk(temp_dir) for file in files
+        })
 
-                if result.returncode == 0:
+        # Check if video was created
+        video_path = os.path.join(temp_dir, 'output.webm')
+        if not os.path.exists(video_path):
+            # Check for alternative video file names
+            possible_names = ['output.webm', 'video.webm', 'recording.webm', 'demo.webm']
+            found_video = None
+            for name in possible_names:
+                alt_path = os.path.join(temp_dir, name)
+                if os.path.exists(alt_path):
+                    found_video = alt_path
+                    log.warning(f"Found video with alternative name: {name}")
+                    video_path = alt_path
                     break
 
-                print(f"Playwright script failed with return code {result.returncode}: {result.stderr}. Retrying...")
-
-            if result.returncode != 0:
-                raise Exception(f"Playwright script failed with return code {result.returncode}: {result.stderr}")
-
-            # List all files in temp directory
-            print(f"\n{'=' * 80}")
-            print(f"FILES IN TEMP DIRECTORY:")
-            print(f"{'=' * 80}")
-            for root, dirs, files in os.walk(temp_dir):
-                level = root.replace(temp_dir, '').count(os.sep)
-                indent = ' ' * 2 * level
-                print(f"{indent}{os.path.basename(root)}/")
-                subindent = ' ' * 2 * (level + 1)
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    file_size = os.path.getsize(file_path)
-                    print(f"{subindent}{file} ({file_size:,} bytes)")
-            print(f"{'=' * 80}\n")
-
-            # Check if video was created
-            video_path = os.path.join(temp_dir, 'output.webm')
-            if not os.path.exists(video_path):
-                # Check for alternative video file names
-                possible_names = ['output.webm', 'video.webm', 'recording.webm', 'demo.webm']
-                found_video = None
-                for name in possible_names:
-                    alt_path = os.path.join(temp_dir, name)
-                    if os.path.exists(alt_path):
-                        found_video = alt_path
-                        print(f"⚠️  Found video with alternative name: {name}")
-                        video_path = alt_path
-                        break
-
-                if not found_video:
-                    # Final fallback: Find ANY .webm file and use the latest one
-                    print("⚠️  No video found with expected names, searching for any .webm files...")
-                    webm_files = []
-                    for root, dirs, files in os.walk(temp_dir):
-                        for file in files:
-                            if file.endswith('.webm'):
-                                full_path = os.path.join(root, file)
-                                webm_files.append((full_path, os.path.getmtime(full_path)))
-
-                    if webm_files:
-                        # Sort by modification time (newest first) and take the latest
-                        webm_files.sort(key=lambda x: x[1], reverse=True)
-                        found_video = webm_files[0][0]
-                        print(f"✓ Found .webm file: {found_video}")
-                        # Rename/copy to output.webm
-                        video_path = os.path.join(temp_dir, 'output.webm')
-                        import shutil
-                        shutil.copy2(found_video, video_path)
-                        print(f"✓ Copied to: {video_path}")
-                    else:
-                        error_msg = "Video file 'output.webm' was not created by the script.\n"
-                        error_msg += f"Temp directory contents: {os.listdir(temp_dir)}\n"
-                        error_msg += f"Expected path: {video_path}\n"
-                        error_msg += "Script may have failed silently or saved video with different name."
-                        raise Exception(error_msg)
-
-            if os.path.exists(video_path):
-                video_size = os.path.getsize(video_path)
-                print(f"✓ Video file found: {video_path} ({video_size:,} bytes)")
-
-            # Note: Audio merging now happens in STEP 7 after voice synthesis
-            # This step only uploads the silent video
-            print("\n" + "-" * 80)
-            print("Note: Audio will be added later in STEP 7")
-            print("-" * 80)
-
-            # Upload video to S3 (without audio for now)
-            print("\n" + "-" * 80)
-            print("STEP 6.2: Uploading final video to S3")
-            print("-" * 80)
-            s3_key = save_video_to_s3(video_path, submission_id)
-            print(f"✓ Video uploaded to S3: {s3_key}")
-
-            # Save the stdout output (contains timestamp logs)
-            print("\n" + "-" * 80)
-            print("STEP 6.3: Saving script execution logs to S3")
-            print("-" * 80)
-            if result.stdout:
-                try:
-                    s3_client = boto3.client('s3', region_name=REGION)
-                    log_s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/playwright_execution.log"
-                    s3_client.put_object(
-                        Bucket=S3_BUCKET,
-                        Key=log_s3_key,
-                        Body=result.stdout,
-                        ContentType='text/plain'
-                    )
-                    print(f"✓ Execution logs saved to S3: {log_s3_key}")
-                except Exception as log_error:
-                    print(f"⚠️  Failed to save execution logs: {log_error}")
-            else:
-                print("⚠️  No stdout output to save")
+            if not found_video:
+                # Final fallback: Find ANY .webm file and use the latest one
+                log.warning("No video found with expected names, searching for any .webm files...")
+                webm_files = []
+                for root, dirs, files in os.walk(temp_dir):
+                    for file in files:
+                        if file.endswith('.webm'):
+                            full_path = os.path.join(root, file)
+                            webm_files.append((full_path, os.path.getmtime(full_path)))
+
+                if webm_files:
+                    # Sort by modification time (newest first) and take the latest
+                    webm_files.sort(key=lambda x: x[1], reverse=True)
+                    found_video = webm_files[0][0]
+                    log.info(f"Found .webm file: {found_video}")
+                    # Rename/copy to output.webm
+                    video_path = os.path.join(temp_dir, 'output.webm')
+                    import shutil
+                    shutil.copy2(found_video, video_path)
+                    log.info(f"Copied to: {video_path}")
+                else:
+                    error_msg = "Video file 'output.webm' was not created by the script.\n"
+                    error_msg += f"Temp directory contents: {os.listdir(temp_dir)}\n"
+                    error_msg += f"Expected path: {video_path}\n"
+                    error_msg += "Script may have failed silently or saved video with different name."
+                    raise Exception(error_msg)
+
+        if os.path.exists(video_path):
+            video_size = os.path.getsize(video_path)
+            log.info(f"Video file found: {video_path} ({video_size:,} bytes)")
+
+        # Drop the failed segment attempts from the recording
+        video_path = cut_failed_segments(video_path, temp_dir, encoding_profile)
+
+        # Keep the silent recording in the workspace for the later stages
+        video_path = workspace.adopt(video_path, 'silent_video.webm')
+
+        # Note: Audio merging now happens in STEP 7 after voice synthesis
+        # The silent video is only uploaded as a checkpoint for the status page
+        log.info("STEP 6.2: Checkpointing silent video to S3")
+        s3_key = save_video_to_s3(video_path, submission_id)
+        log.info(f"Video uploaded to S3: {s3_key}")
+
+        # Save the stdout output (contains timestamp logs)
+        log.info("STEP 6.3: Saving script execution logs to S3")
+        if result.stdout:
+            try:
+                log_s3_key = f"{S3_STAGING_PREFIX}/{submission_id}/playwright_execution.log"
+                log_upload = upload_bytes(result.stdout, S3_BUCKET, log_s3_key, 'text/plain', REGION)
+                record_upload(submission_id, 'execution_log', log_upload, 'text/plain')
+                log.info(f"Execution logs saved to S3: {log_s3_key}")
+            except Exception as log_error:
+                log.error(f"Failed to save execution logs: {log_error}")
+        else:
+            log.warning("No stdout output to save")
 
-            return s3_key, result.stdout
+        return video_path, result.stdout
 
     except subprocess.TimeoutExpired:
-        print("Playwright script execution timed out after 5 minutes")
+        log.error(f"Playwright script execution timed out after {PLAYWRIGHT_SCRIPT_TIMEOUT} seconds")
         raise Exception("Script execution timed out")
     except Exception as e:
-        print(f"Error executing Playwright script: {e}")
+        log.error(f"Error executing Playwright script: {e}")
         raise
 
 
-@app.entrypoint
+def explore_website(payload, roast_mode):
+    """Explore the website with the browser tool and return the narrative script
+
+    Narratives are cached by normalized URL, directions, tone and credentials presence,
+    so repeated requests skip the browser session entirely.
+    """
+    system_prompt = get_exploration_system_prompt(roast_mode)
+    cache = get_exploration_cache(S3_BUCKET, REGION)
+    cache_key = exploration_cache_key(payload, roast_mode, system_prompt, MODEL_ID)
+    annotate(model=MODEL_ID, cache_hit=False)
+    if cache and not payload.get('skip_exploration_cache'):
+        cached = cache.get(cache_key, payload)
+        if cached:
+            log.info(f"Exploration cache hit ({cache_key[:12]}), skipping browser exploration")
+            annotate(cache_hit=True)
+            return cached
+
+    from strands import Agent
+    from strands_tools.browser import AgentCoreBrowser
+
+    browser_tool = AgentCoreBrowser(
+        region=REGION,
+        identifier=KIRBUK_BROWSER_IDENTIFIER
+    )
+
+    # Create agent without memory session manager to avoid throttling
+    agent = Agent(
+        model=MODEL_ID,
+        system_prompt=system_prompt,
+        tools=[browser_tool.browser]
+    )
+
+    prompt = f"Visit website {payload['product_url']}. Additional user instructions: {payload['directions']}."
+    if payload.get('test_username') and payload.get('test_password'):
+        prompt += f" Use username/email '{payload['test_username']}' and password '{payload['test_password']}' to login to the site."
+
+    log.info("STEP 1: Invoking agent to explore website")
+    with span('exploration.agent', model=MODEL_ID):
+        result = agent(prompt)
+    log.info("Agent exploration completed")
+
+    log.info("Closing browser platform")
+    browser_tool.close_platform()
+    log.info("Browser closed")
+
+    response = result.message.get('content', [{}])[0].get('text', str(result))
+    log.info(f"Agent response length: {len(response)} characters")
+
+    if cache:
+        cache.set(cache_key, response, payload)
+    return response
+
+
+def step_save_script(narrative, submission_id):
+    """Upload the narrative script for the status page"""
+    log.info("STEP 2: Saving narrative script to S3")
+    script_s3_key = save_script_to_s3(narrative, submission_id)
+    log.info(f"Script saved to S3: {script_s3_key}")
+    return script_s3_key
+
+
+def step_generate_playwright(narrative, product_url, directions):
+    """Turn the narrative into a Playwright script"""
+    log.info("STEP 3: Generating Playwright script")
+    playwright_code = generate_playwright_script(narrative, product_url, directions)
+    log.info(f"Playwright script generated ({len(playwright_code)} characters)")
+    return playwright_code
+
+
+def step_save_playwright(playwright_code, submission_id):
+    """Upload the Playwright script and keep a local debug copy"""
+    playwright_s3_key = save_playwright_to_s3(playwright_code, submission_id)
+    log.info(f"Playwright script saved to S3: {playwright_s3_key}")
+
+    # Save generated Playwright code to a file for debugging/local use
+    if playwright_code:
+        debug_script_path = f"/tmp/playwright_script_{submission_id}.py"
+        try:
+            with open(debug_script_path, "w", encoding="utf-8") as f:
+                f.write(playwright_code)
+            log.info(f"Playwright code also saved locally at: {debug_script_path}")
+        except Exception as file_save_exc:
+            log.warning(f"Failed to save playwright script to file: {file_save_exc}")
+            sentry_sdk.capture_exception(file_save_exc)
+    return playwright_s3_key
+
+
+def step_record_video(playwright_code, submission_id, workspace, encoding_profile, product_url):
+    """Record the silent demo video and measure its duration"""
+    log.info("STEP 4: Executing Playwright script to create video")
+    silent_video_path, playwright_execution_log = execute_playwright_script(
+        playwright_code,
+        submission_id,
+        workspace,
+        encoding_profile,
+        product_url=product_url
+    )
+    log.info(f"Video successfully created: {silent_video_path}")
+
+    # Measure duration on the local recording (known without probing if it was cut)
+    video_duration = media_info.duration(silent_video_path)
+    log.info(f"Video duration: {video_duration:.2f} seconds ({video_duration/60:.2f} minutes)")
+    return silent_video_path, playwright_execution_log, video_duration
+
+
+def step_generate_voice_script(narrative, product_url, video_duration, roast_mode,
+                               playwright_code, playwright_execution_log):
+    """Generate the SSML narration synchronized with the recording"""
+    log.info(f"STEP 5: Generating SSML voice script (for {video_duration:.1f}s video, with Playwright sync)")
+    voice_script = generate_voice_script(
+        narrative,
+        product_url,
+        video_duration,
+        roast_mode,
+        playwright_script=playwright_code,  # Pass Playwright script for synchronization
+        playwright_execution_log=playwright_execution_log  # Pass execution logs with timestamps for precise sync
+    )
+    log.info(f"Voice script generated ({len(voice_script)} characters)")
+    return voice_script
+
+
+def step_save_voice_script(voice_script, submission_id):
+    """Upload the SSML voice script for the status page"""
+    voice_script_s3_key = save_voice_script_to_s3(voice_script, submission_id)
+    log.info(f"Voice script saved to S3: {voice_script_s3_key}")
+    return voice_script_s3_key
+
+
+def step_synthesize_voice(voice_script, submission_id, workspace):
+    """Synthesize the narration with Polly"""
+    log.info("STEP 6: Synthesizing voice with AWS Polly")
+    voice_audio_s3_key = synthesize_voice(voice_script, submission_id, workspace)
+    log.info(f"Voice audio synthesized and saved to S3: {voice_audio_s3_key}")
+    return voice_audio_s3_key
+
+
+def step_generate_end_slide(narrative, product_url, workspace):
+    """Extract product info and render the end slide image"""
+    log.info("STEP 6.5: Generating end slide")
+    product_info = extract_product_info(narrative, product_url)
+    return generate_end_slide(
+        title=product_info['title'],
+        description=product_info['description'],
+        url=product_url,
+        output_path=workspace.path('end_slide.png')
+    )
+
+
+def step_compose_video(silent_video_path, voice_audio_s3_key, video_duration,
+                       end_slide_path, submission_id, workspace, encoding_profile):
+    """Merge the end slide, voice and background music into the final video"""
+    log.info("STEP 7: FINAL VIDEO COMPOSITION")
+
+    # Both inputs are normally local already; the narration is only downloaded if it is not
+    audio_path = workspace.fetch('voice.mp3', voice_audio_s3_key)
+
+    audio_duration = media_info.duration(audio_path)
+
+    # Calculate slide duration based on video vs audio length
+    # If audio > video: slide fills the gap so audio finishes
+    # If video > audio: slide shows for 5 seconds minimum
+    if audio_duration > video_duration:
+        slide_duration = audio_duration - video_duration
+        log.info(f"Audio ({audio_duration:.1f}s) > Video ({video_duration:.1f}s), "
+                 f"slide will fill the {slide_duration:.1f}s gap so audio finishes")
+    else:
+        slide_duration = 5.0  # Minimum 5 seconds
+        log.info(f"Video ({video_duration:.1f}s) >= Audio ({audio_duration:.1f}s), "
+                 f"slide will show for the minimum {slide_duration:.1f}s")
+
+    if not end_slide_path:
+        log.warning("Continuing with video without end slide")
+
+    # Select random background music (pre-encoded to Opus when available)
+    selected_music = pick_background_music()
+
+    final_video_path = workspace.path('final.webm')
+    _, encode = compose_final_video(
+        video_path=silent_video_path,
+        audio_path=audio_path,
+        output_path=final_video_path,
+        slide_path=end_slide_path,
+        slide_duration=slide_duration,
+        fade_duration=1.0,   # 1 second fade-in
+        music_path=selected_music,
+        voice_volume=1.0,    # Voice at 100%
+        music_volume=0.15,   # Background music at 15%
+        profile=get_profile(encoding_profile)
+    )
+
+    # Upload final video back to S3 (overwrite the silent one)
+    log.info("Uploading final video with audio to S3...")
+    video_s3_key = save_video_to_s3(final_video_path, submission_id, final=True, encode=encode)
+    log.info(f"Final video with audio uploaded to S3: {video_s3_key}")
+    log.info("FINAL VIDEO COMPOSITION COMPLETED")
+    return video_s3_key
+
+
+def build_video_pipeline():
+    """Declare the steps that turn a narrative into the final narrated video
+
+    Non-critical steps degrade the video instead of failing the job: without a recording the
+    narration is still generated for the default 2-minute duration, without an end slide the
+    video is composed without it, and without narration the silent video stays in S3.
+    """
+    return [
+        Step('save_script', step_save_script,
+             inputs=['narrative', 'submission_id'], outputs=['script_s3_key']),
+        Step('generate_playwright', step_generate_playwright,
+             inputs=['narrative', 'product_url', 'directions'], outputs=['playwright_code']),
+        Step('save_playwright', step_save_playwright,
+             inputs=['playwright_code', 'submission_id'], outputs=['playwright_s3_key']),
+        Step('record_video', step_record_video,
+             inputs=['playwright_code', 'submission_id', 'workspace', 'encoding_profile', 'product_url'],
+             outputs=['silent_video_path', 'playwright_execution_log', 'video_duration'],
+             critical=False,
+             defaults={'playwright_execution_log': '', 'video_duration': 120.0}),
+        Step('generate_voice_script', step_generate_voice_script,
+             inputs=['narrative', 'product_url', 'video_duration', 'roast_mode',
+                     'playwright_code', 'playwright_execution_log'],
+             outputs=['voice_script'], critical=False),
+        Step('save_voice_script', step_save_voice_script,
+             inputs=['voice_script', 'submission_id'], outputs=['voice_script_s3_key'],
+             critical=False),
+        Step('synthesize_voice', step_synthesize_voice,
+             inputs=['voice_script', 'submission_id', 'workspace'], outputs=['voice_audio_s3_key'],
+             critical=False),
+        Step('generate_end_slide', step_generate_end_slide,
+             inputs=['narrative', 'product_url', 'workspace'], outputs=['end_slide_path'],
+             critical=False),
+        Step('compose_video', step_compose_video,
+             inputs=['silent_video_path', 'voice_audio_s3_key', 'video_duration',
+                     'submission_id', 'workspace', 'encoding_profile'],
+             optional_inputs=['end_slide_path'], outputs=['video_s3_key'],
+             critical=False),
+    ]
+
+
+def report_step_error(step, error):
+    """Log and report a failed non-critical pipeline step, then let the job continue"""
+    log.error(f"Step '{step.name}' failed: {error}", step=step.name, exc_info=error)
+    sentry_sdk.capture_exception(error)
+
+
 def invoke(payload, context):
     global current_session
 
+    workspace = None
+    manifest = None
+    # Spans of this job (including the pipeline steps) are collected into timings.json
+    job_trace = start_job(payload.get('submission_id') if isinstance(payload, dict) else None)
+    # Every log record of this job (including the pipeline steps) carries its submission ID
+    log_context = bind_job(job_trace.submission_id)
     try:
-        # Print all received data
-        print("=" * 80)
-        print("AGENT RECEIVED DATA")
-        print("=" * 80)
-        print(f"Full payload: {payload}")
-        print("-" * 80)
-
-        # Print each field individually
+        # Log the received data as one record (passwords masked)
         if isinstance(payload, dict):
-            for key, value in payload.items():
-                # Mask password if present
-                if 'password' in key.lower() and value:
-                    print(f"{key}: ***")
-                else:
-                    print(f"{key}: {value}")
-
-        print("-" * 80)
-        print(f"Context: {context}")
-        print("=" * 80)
+            fields = {key: '***' if 'password' in key.lower() and value else value for key, value in payload.items()}
+        else:
+            fields = {'payload': payload}
+        log.info("Agent received data", payload=fields, context=context)
 
         # Extract submission_id from payload
         submission_id = payload.get('submission_id') if isinstance(payload, dict) else None
@@ -1463,32 +1539,34 @@ def invoke(payload, context):
 
         if submission_id:
             # Check if this submission has already been processed by checking if JSON file exists
-            s3_client = boto3.client('s3', region_name=REGION)
+            s3_client = get_client('s3', REGION)
             json_key = f"{S3_STAGING_PREFIX}/{submission_id}/{submission_id}.json"
 
             try:
                 s3_client.head_object(Bucket=S3_BUCKET, Key=json_key)
                 # File exists, this submission has already been processed
-                print("=" * 80)
-                print("⚠️  DUPLICATE INVOCATION DETECTED")
-                print("=" * 80)
-                print(f"Submission {submission_id} has already been processed (JSON file exists)")
-                print("Exiting to avoid duplicate work and duplicate emails")
-                print("=" * 80)
+                log.warning(f"Duplicate invocation detected: submission {submission_id} has already been "
+                            "processed (JSON file exists), exiting to avoid duplicate work and emails")
                 return {"response": "Duplicate invocation - already processed", "duplicate": True}
             except s3_client.exceptions.NoSuchKey:
                 # File doesn't exist, this is the first invocation - continue processing
-                print("✓ First invocation for this submission - proceeding with processing")
+                log.info("First invocation for this submission - proceeding with processing")
                 pass
             except Exception as check_error:
                 # If we can't check, proceed anyway to avoid blocking legitimate requests
-                print(f"Warning: Could not check for duplicate: {check_error}")
+                log.warning(f"Could not check for duplicate: {check_error}")
                 sentry_sdk.capture_exception(check_error)
                 pass
 
+            # Manifest read by the status page; every artifact upload below is recorded in it
+            manifest = open_manifest(submission_id, S3_BUCKET, S3_STAGING_PREFIX, region=REGION)
+
             # Save payload to S3 (this marks the submission as being processed)
             s3_key = save_payload_to_s3(payload, submission_id)
-            print(f"Payload saved to S3: {s3_key}")
+            log.info(f"Payload saved to S3: {s3_key}")
+
+            # Local workspace shared by all pipeline stages of this job
+            workspace = JobWorkspace(submission_id, S3_BUCKET, S3_STAGING_PREFIX, region=REGION)
 
             # Send email notification that processing has started
             if user_email:
@@ -1499,303 +1577,56 @@ def invoke(payload, context):
                     submission_id=submission_id
                 )
             else:
-                print("Warning: No user email found in payload, skipping start notification email")
+                log.warning("No user email found in payload, skipping start notification email")
         else:
-            print("Warning: No submission_id found in payload, skipping S3 save")
+            log.warning("No submission_id found in payload, skipping S3 save")
 
         # Note: Memory session manager removed to avoid throttling issues
         # Each job is independent and doesn't need persistent memory
         session_id = getattr(context, 'session_id', 'default')
         current_session = session_id
 
-        browser_tool = AgentCoreBrowser(
-            region=REGION,
-            identifier=KIRBUK_BROWSER_IDENTIFIER
-        )
-
         # Get roast mode from payload
         roast_mode = payload.get('roast_mode', False)
-        print(f"🎭 Roast Mode: {'ENABLED - Spicy commentary activated!' if roast_mode else 'Disabled - Professional tone'}")
-
-        # Create agent without memory session manager to avoid throttling
-        agent = Agent(
-            model=MODEL_ID,
-            system_prompt=get_exploration_system_prompt(roast_mode),
-            tools=[browser_tool.browser]
-        )
-
-        prompt = f"Visit website {payload['product_url']}. Additional user instructions: {payload['directions']}."
-        if payload.get('test_username') and payload.get('test_password'):
-            prompt += f" Use username/email '{payload['test_username']}' and password '{payload['test_password']}' to login to the site."
-
-        print("=" * 80)
-        print("STEP 1: Invoking agent to explore website")
-        print("=" * 80)
-        result = agent(prompt)
-        print("✓ Agent exploration completed")
+        log.info(f"🎭 Roast Mode: {'ENABLED - Spicy commentary activated!' if roast_mode else 'Disabled - Professional tone'}")
 
-        print("\nClosing browser platform...")
-        browser_tool.close_platform()
-        print("✓ Browser closed")
+        # Encoding speed/size trade-off for every FFmpeg stage of this job
+        encoding_profile = get_profile(payload.get('encoding_profile'))['name']
+        log.info(f"🎞️  Encoding profile: {encoding_profile}")
 
-        response = result.message.get('content', [{}])[0].get('text', str(result))
-        print(f"\n{'=' * 80}")
-        print(f"Agent Response Length: {len(response)} characters")
-        print(f"{'=' * 80}")
+        runner = PipelineRunner(
+            max_workers=int(os.getenv("KIRBUK_PIPELINE_WORKERS", "4")),
+            on_error=report_step_error,
+            on_transition=manifest.record_stage if manifest else None
+        )
+        values = runner.run(
+            [Step('explore', explore_website, inputs=['payload', 'roast_mode'], outputs=['narrative'])],
+            {'payload': payload, 'roast_mode': roast_mode}
+        )
+        response = values['narrative']
 
-        # Save script to S3 before returning
+        # Independent steps run concurrently; each waits only for the values it needs
         if submission_id and response:
-            print("\n" + "=" * 80)
-            print("STEP 2: Saving narrative script to S3")
-            print("=" * 80)
-            script_s3_key = save_script_to_s3(response, submission_id)
-            print(f"✓ Script saved to S3: {script_s3_key}")
-
-            # Generate and save Playwright script FIRST (before audio)
-            print("\n" + "=" * 80)
-            print("STEP 3: Generating Playwright script")
-            print("=" * 80)
-            playwright_code = generate_playwright_script(
-                response,
-                payload['product_url'],
-                payload.get('directions')
-            )
-            print(f"✓ Playwright script generated ({len(playwright_code)} characters)")
-
-            playwright_s3_key = save_playwright_to_s3(playwright_code, submission_id)
-            print(f"✓ Playwright script saved to S3: {playwright_s3_key}")
-
-            # Save generated Playwright code to a file for debugging/local use
-            if playwright_code:
-                debug_script_path = f"/tmp/playwright_script_{submission_id}.py"
-                try:
-                    with open(debug_script_path, "w", encoding="utf-8") as f:
-                        f.write(playwright_code)
-                    print(f"✓ Playwright code also saved locally at: {debug_script_path}")
-                except Exception as file_save_exc:
-                    print(f"✗ Warning: Failed to save playwright script to file: {file_save_exc}")
-                    sentry_sdk.capture_exception(file_save_exc)
-
-            # Execute the Playwright script and create SILENT video
-            print("\n" + "=" * 80)
-            print("STEP 4: Executing Playwright script to create video")
-            print("=" * 80)
-            video_duration = 120.0  # Default duration
-            playwright_execution_log = ""  # Capture execution logs with timestamps
             try:
-                video_s3_key, playwright_execution_log = execute_playwright_script(playwright_code, submission_id)
-                print(f"✓ Video successfully created and uploaded to S3: {video_s3_key}")
-
-                # Download video temporarily to measure duration
-                print("→ Measuring video duration...")
-                import tempfile
-                s3_client = boto3.client('s3', region_name=REGION)
-                with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_video:
-                    s3_client.download_file(S3_BUCKET, video_s3_key, temp_video.name)
-                    video_duration = get_video_duration(temp_video.name)
-                    # Clean up temp file
-                    os.unlink(temp_video.name)
-
-            except Exception as video_error:
-                print(f"✗ Error creating video: {video_error}")
-                import traceback
-                print(f"Video creation traceback: {traceback.format_exc()}")
-                print("⚠️  Continuing with default 2-minute duration for audio generation")
-                sentry_sdk.capture_exception(video_error)
-
-            # STEP 5: Generate voice script and audio FIRST (before end slide)
-            print("\n" + "=" * 80)
-            print(f"STEP 5: Generating SSML voice script (for {video_duration:.1f}s video, with Playwright sync)")
-            print("=" * 80)
-            voice_script = None
-            try:
-                voice_script = generate_voice_script(
-                    response,
-                    payload['product_url'],
-                    video_duration,
-                    roast_mode,
-                    playwright_script=playwright_code,  # Pass Playwright script for synchronization
-                    playwright_execution_log=playwright_execution_log  # Pass execution logs with timestamps for precise sync
-                )
-                print(f"✓ Voice script generated ({len(voice_script)} characters)")
-
-                voice_script_s3_key = save_voice_script_to_s3(voice_script, submission_id)
-                print(f"✓ Voice script saved to S3: {voice_script_s3_key}")
-
-                # Synthesize voice using AWS Polly
-                print("\n" + "=" * 80)
-                print("STEP 6: Synthesizing voice with AWS Polly")
-                print("=" * 80)
-                try:
-                    voice_audio_s3_key = synthesize_voice_with_polly(voice_script, submission_id)
-                    print(f"✓ Voice audio synthesized and saved to S3: {voice_audio_s3_key}")
-
-                    # STEP 6.5: Add end slide to video NOW (after audio generation)
-                    print("\n" + "=" * 80)
-                    print("STEP 6.5: Adding end slide to video with calculated duration")
-                    print("=" * 80)
-                    try:
-                        import tempfile
-                        with tempfile.TemporaryDirectory() as temp_dir:
-                            s3_client = boto3.client('s3', region_name=REGION)
-
-                            # Download silent video from S3
-                            silent_video_path = os.path.join(temp_dir, 'silent_video.webm')
-                            print(f"→ Downloading silent video from S3: {video_s3_key}")
-                            s3_client.download_file(S3_BUCKET, video_s3_key, silent_video_path)
-                            print(f"✓ Video downloaded (size: {os.path.getsize(silent_video_path)} bytes)")
-
-                            # Download audio from S3 to measure duration
-                            audio_path = os.path.join(temp_dir, 'voice.mp3')
-                            print(f"→ Downloading audio from S3: {voice_audio_s3_key}")
-                            s3_client.download_file(S3_BUCKET, voice_audio_s3_key, audio_path)
-                            print(f"✓ Audio downloaded (size: {os.path.getsize(audio_path)} bytes)")
-
-                            # Measure audio duration
-                            audio_duration = get_audio_duration(audio_path)
-
-                            # Calculate slide duration based on video vs audio length
-                            # If audio > video: slide fills the gap so audio finishes
-                            # If video > audio: slide shows for 5 seconds minimum
-                            if audio_duration > video_duration:
-                                slide_duration = audio_duration - video_duration
-                                print(f"📊 Audio ({audio_duration:.1f}s) > Video ({video_duration:.1f}s)")
-                                print(f"   → Slide will fill {slide_duration:.1f}s gap so audio finishes")
-                            else:
-                                slide_duration = 5.0  # Minimum 5 seconds
-                                print(f"📊 Video ({video_duration:.1f}s) >= Audio ({audio_duration:.1f}s)")
-                                print(f"   → Slide will show for minimum {slide_duration:.1f}s")
-
-                            # Extract product info from the narrative
-                            product_info = extract_product_info(response, product_url)
-
-                            # Generate end slide image
-                            end_slide_path = os.path.join(temp_dir, 'end_slide.png')
-                            generate_end_slide(
-                                title=product_info['title'],
-                                description=product_info['description'],
-                                url=product_url,
-                                output_path=end_slide_path
-                            )
-
-                            # Append end slide to silent video with calculated duration
-                            video_with_endslide_path = os.path.join(temp_dir, 'video_with_endslide.webm')
-                            append_end_slide_to_video(
-                                video_path=silent_video_path,
-                                slide_path=end_slide_path,
-                                output_path=video_with_endslide_path,
-                                slide_duration=slide_duration,
-                                fade_duration=1.0    # 1 second fade-in
-                            )
-                            print(f"✓ End slide added to video (size: {os.path.getsize(video_with_endslide_path)} bytes)")
-
-                            # Measure new video duration (with end slide)
-                            new_video_duration = get_video_duration(video_with_endslide_path)
-                            print(f"✓ New video duration with end slide: {new_video_duration:.1f}s")
-
-                            # Upload video with end slide back to S3 (overwrite)
-                            print(f"→ Uploading video with end slide to S3...")
-                            video_s3_key = save_video_to_s3(video_with_endslide_path, submission_id)
-                            print(f"✓ Video with end slide uploaded to S3: {video_s3_key}")
-
-                    except Exception as endslide_error:
-                        print(f"⚠️  Error adding end slide: {endslide_error}")
-                        import traceback
-                        print(f"End slide error traceback: {traceback.format_exc()}")
-                        print("⚠️  Continuing with video without end slide")
-                        sentry_sdk.capture_exception(endslide_error)
-                        # Continue with original video (without end slide)
-
-                    # STEP 7: FINAL VIDEO COMPOSITION - Merge audio with video now that both exist
-                    print("\n" + "=" * 80)
-                    print("STEP 7: FINAL VIDEO COMPOSITION")
-                    print("Merging audio with video (includes end slide) and background music")
-                    print("=" * 80)
-                    try:
-                        import tempfile
-                        import random
-                        import glob
-
-                        with tempfile.TemporaryDirectory() as temp_dir:
-                            s3_client = boto3.client('s3', region_name=REGION)
-
-                            # Download video from S3
-                            video_path = os.path.join(temp_dir, 'video.webm')
-                            print(f"→ Downloading video from S3: {video_s3_key}")
-                            s3_client.download_file(S3_BUCKET, video_s3_key, video_path)
-                            print(f"✓ Video downloaded (size: {os.path.getsize(video_path)} bytes)")
-
-                            # Download audio from S3
-                            audio_path = os.path.join(temp_dir, 'voice.mp3')
-                            print(f"→ Downloading audio from S3: {voice_audio_s3_key}")
-                            s3_client.download_file(S3_BUCKET, voice_audio_s3_key, audio_path)
-                            print(f"✓ Audio downloaded (size: {os.path.getsize(audio_path)} bytes)")
-
-                            # Select random background music
-                            music_dir = '/app/audio/bg_music'
-                            music_files = glob.glob(os.path.join(music_dir, '*.mp3'))
-
-                            merged_video_path = os.path.join(temp_dir, 'merged.webm')
-
-                            if music_files:
-                                # Randomly select a background music file
-                                selected_music = random.choice(music_files)
-                                music_name = os.path.basename(selected_music)
-                                print(f"🎵 Selected background music: {music_name}")
-
-                                # Merge video (already has end slide), voice, and background music
-                                print(f"→ Merging video with end slide, voice, and background music with FFmpeg...")
-                                merge_audio_video_with_music(
-                                    video_path,
-                                    audio_path,
-                                    selected_music,
-                                    merged_video_path,
-                                    voice_volume=1.0,    # Voice at 100%
-                                    music_volume=0.15    # Background music at 15%
-                                )
-                                print(f"✓ Video merged with voice and background music (size: {os.path.getsize(merged_video_path)} bytes)")
-                            else:
-                                # No background music available, merge without it
-                                print(f"⚠️  No background music files found in {music_dir}")
-                                print(f"→ Merging video with end slide and voice only...")
-                                merge_audio_video_with_ffmpeg(video_path, audio_path, merged_video_path)
-                                print(f"✓ Audio and video merged (size: {os.path.getsize(merged_video_path)} bytes)")
-
-                            # Upload final video back to S3 (overwrite the old one)
-                            print(f"→ Uploading final video with audio to S3...")
-                            video_s3_key = save_video_to_s3(merged_video_path, submission_id)
-                            print(f"✓ Final video with audio uploaded to S3: {video_s3_key}")
-                            print("\n" + "=" * 80)
-                            print("✅ FINAL VIDEO COMPOSITION COMPLETED")
-                            print("=" * 80)
-
-                    except Exception as merge_error:
-                        print(f"✗ Error merging audio with video: {merge_error}")
-                        import traceback
-                        print(f"Audio merge traceback: {traceback.format_exc()}")
-                        print("⚠️  Video uploaded without audio")
-                        sentry_sdk.capture_exception(merge_error)
-
-                except Exception as polly_error:
-                    print(f"✗ Error synthesizing voice with Polly: {polly_error}")
-                    import traceback
-                    print(f"Polly synthesis traceback: {traceback.format_exc()}")
-                    print("⚠️  Video will be uploaded without audio")
-                    sentry_sdk.capture_exception(polly_error)
-
-            except Exception as voice_error:
-                print(f"✗ Error generating voice script: {voice_error}")
-                # Don't fail the entire job if voice script generation fails
-                import traceback
-                print(f"Voice script generation traceback: {traceback.format_exc()}")
-                print("⚠️  Video will be uploaded without narration")
-                sentry_sdk.capture_exception(voice_error)
-
-        print("\n" + "=" * 80)
-        print("✅ WORKFLOW COMPLETED SUCCESSFULLY")
-        print("=" * 80)
-        print(f"Submission ID: {submission_id}")
-        print("=" * 80)
+                runner.run(build_video_pipeline(), {
+                    'narrative': response,
+                    'submission_id': submission_id,
+                    'product_url': payload['product_url'],
+                    'directions': payload.get('directions'),
+                    'roast_mode': roast_mode,
+                    'workspace': workspace,
+                    'encoding_profile': encoding_profile,
+                })
+            finally:
+                runner.log_summary()
+                log.info("Process statistics", aws_clients=client_stats(), llm_calls=llm_stats(),
+                         waiters=waiter_stats(), media_probes=media_info.media_stats(),
+                         encodes=encoding_stats(), spans=tracing_stats(), recording=recording_stats())
+
+        log.info(f"Workflow completed successfully: {submission_id}")
+
+        if manifest:
+            manifest.set_status('completed')
 
         # Send success email notification with video link
         if submission_id and user_email:
@@ -1810,11 +1641,10 @@ def invoke(payload, context):
         return {"response": response}
 
     except Exception as e:
-        print("\n" + "=" * 80)
-        print("❌ WORKFLOW FAILED")
-        print("=" * 80)
-        print(f"Error: {str(e)}")
-        print("=" * 80)
+        log.error(f"Workflow failed: {e}", exc_info=True)
+
+        if manifest:
+            manifest.set_status('failed', error=str(e))
 
         # Send failure email notification
         submission_id = payload.get('submission_id') if isinstance(payload, dict) else None
@@ -1838,5 +1668,32 @@ def invoke(payload, context):
         # Re-raise the exception to let the framework handle it
         raise
 
+    finally:
+        timings = finish_job(job_trace)
+        # Only the invocation that claimed the submission owns its timings.json; a duplicate
+        # must not overwrite it (or record into a live manifest of the same submission)
+        if manifest:
+            save_timings_to_s3(timings, job_trace.submission_id)
+        if workspace:
+            workspace.cleanup()
+        if manifest:
+            close_manifest(manifest.submission_id)
+        unbind_job(log_context)
+
+def create_app():
+    """Create the AgentCore app that serves invoke()
+
+    bedrock_agentcore is imported here so that importing this module (e.g. from the
+    benchmarks) does not load the runtime server.
+    """
+    from bedrock_agentcore.runtime import BedrockAgentCoreApp
+
+    app = BedrockAgentCoreApp()
+    app.entrypoint(invoke)
+    return app
+
+
 if __name__ == "__main__":
+    with startup.phase('app'):
+        app = create_app()
     app.run()
@@ -0,0 +1,159 @@
+"""
+Static assets for the final video: end slide fonts and background, background music.
+
+Fonts are loaded once per process and the brown slide background (including the accent
+lines) is rendered once per size, so generating an end slide only draws the text. Background
+music is transcoded from MP3 to Opus ahead of time - at container build with
+`python -m assets`, or in the background at startup if the image has no encoded tracks - so
+the composition mixes audio that is already in the output codec.
+
+Configuration via environment:
+    KIRBUK_MUSIC_DIR          source MP3 tracks (default: /app/audio/bg_music)
+    KIRBUK_MUSIC_OPUS_DIR     pre-encoded tracks (default: /app/audio/bg_music_opus)
+"""
+import glob
+import os
+import random
+import subprocess
+import threading
+from functools import lru_cache
+
+from cache_backends import CACHE_DIR
+from log import get_logger
+
+log = get_logger(__name__)
+
+MUSIC_DIR = os.getenv("KIRBUK_MUSIC_DIR", "/app/audio/bg_music")
+MUSIC_OPUS_DIR = os.getenv("KIRBUK_MUSIC_OPUS_DIR", "/app/audio/bg_music_opus")
+MUSIC_RUNTIME_DIR = os.path.join(CACHE_DIR, 'music')
+MUSIC_BITRATE = '96k'
+
+FONT_DIR = "/usr/share/fonts/truetype/dejavu"
+FONT_FILES = {
+    'regular': 'DejaVuSans.ttf',
+    'bold': 'DejaVuSans-Bold.ttf',
+}
+
+# Kirbuk brown theme colors (matching website)
+SLIDE_BG_COLOR = "#8B4513"      # Brown background
+SLIDE_TEXT_COLOR = "#FFF8DC"    # Cornsilk text
+SLIDE_ACCENT_COLOR = "#D2691E"  # Chocolate accent
+
+# Vertical position of the URL as a fraction of the height; the accent lines frame it
+SLIDE_URL_Y = 0.70
+
+_music_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_font(weight, size):
+    """Return a DejaVu font (loaded once per weight and size), or Pillow's default font"""
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(os.path.join(FONT_DIR, FONT_FILES[weight]), size)
+    except Exception as e:
+        log.warning(f"Could not load DejaVu {weight} font: {e} - using default font as fallback")
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4)
+def _slide_background(width, height):
+    from PIL import Image, ImageDraw
+
+    img = Image.new('RGB', (width, height), color=SLIDE_BG_COLOR)
+    draw = ImageDraw.Draw(img)
+    url_y = int(height * SLIDE_URL_Y)
+    for line_y in (url_y - 20, url_y + 60):
+        draw.rectangle([(int(width * 0.2), line_y), (int(width * 0.8), line_y + 2)], fill=SLIDE_ACCENT_COLOR)
+    return img
+
+
+def slide_background(width=1280, height=720):
+    """Return a fresh copy of the pre-rendered end slide background"""
+    return _slide_background(width, height).copy()
+
+
+def _encoded_path(directory, track):
+    name = os.path.splitext(os.path.basename(track))[0]
+    return os.path.join(directory, f"{name}.opus")
+
+
+def transcode_track(track, output_path):
+    """Encode an MP3 track to Opus (48 kHz stereo) next to the other encoded tracks"""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    partial_path = f"{output_path}.part"
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-i', track, '-vn',
+         '-c:a', 'libopus', '-b:a', MUSIC_BITRATE, '-ar', '48000', '-ac', '2',
+         '-f', 'ogg', partial_path],
+        capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise Exception(f"FFmpeg failed to encode {track}: {result.stderr[-1000:]}")
+    os.replace(partial_path, output_path)
+    return output_path
+
+
+def encode_music(output_dir=MUSIC_OPUS_DIR):
+    """Encode every background track that has no Opus version yet
+
+    Tracks pre-encoded into MUSIC_OPUS_DIR at build time are skipped as well when encoding
+    into another directory.
+
+    Returns:
+        Number of tracks encoded
+    """
+    encoded = 0
+    with _music_lock:
+        for track in sorted(glob.glob(os.path.join(MUSIC_DIR, '*.mp3'))):
+            if any(os.path.exists(_encoded_path(directory, track)) for directory in (MUSIC_OPUS_DIR, output_dir)):
+                continue
+            transcode_track(track, _encoded_path(output_dir, track))
+            encoded += 1
+    return encoded
+
+
+def pick_background_music():
+    """Pick a random background track, preferring its pre-encoded Opus version
+
+    Returns:
+        Path of the track, or None if there is no background music
+    """
+    tracks = glob.glob(os.path.join(MUSIC_DIR, '*.mp3'))
+    if not tracks:
+        log.warning(f"No background music files found in {MUSIC_DIR}")
+        return None
+    track = random.choice(tracks)
+    for directory in (MUSIC_OPUS_DIR, MUSIC_RUNTIME_DIR):
+        encoded_path = _encoded_path(directory, track)
+        if os.path.exists(encoded_path):
+            log.info(f"🎵 Selected background music: {os.path.basename(encoded_path)} (pre-encoded)")
+            return encoded_path
+    log.info(f"🎵 Selected background music: {os.path.basename(track)}")
+    return track
+
+
+def load_assets():
+    """Load fonts and slide backgrounds, and encode missing music tracks (startup pre-warm)"""
+    for weight, size in (('bold', 60), ('regular', 28), ('bold', 40)):
+        get_font(weight, size)
+    _slide_background(1280, 720)
+    missing = [track for track in glob.glob(os.path.join(MUSIC_DIR, '*.mp3'))
+               if not any(os.path.exists(_encoded_path(directory, track))
+                          for directory in (MUSIC_OPUS_DIR, MUSIC_RUNTIME_DIR))]
+    if missing:
+        try:
+            count = encode_music(MUSIC_RUNTIME_DIR)
+            if count:
+                log.info(f"Encoded {count} background track(s) to Opus at startup")
+        except Exception as e:
+            log.warning(f"Could not pre-encode background music: {e}")
+
+
+if __name__ == '__main__':
+    # Run at container build: RUN python -m assets
+    count = encode_music()
+    print(f"Encoded {count} background track(s) to {MUSIC_OPUS_DIR}")
@@ -0,0 +1,113 @@
+"""
+Shared, lazily created boto3 clients.
+
+Building a boto3 client costs tens of milliseconds and every new client starts with a
+cold HTTPS connection pool, so clients are created once per (service, region) and reused
+by every thread. boto3 clients are thread-safe; only their creation from a session is not,
+which is why it happens under a lock.
+
+Tuning via environment:
+    KIRBUK_BOTO_MAX_POOL_CONNECTIONS  connection pool size per client (default: 32)
+    KIRBUK_BOTO_RETRY_MODE            legacy | standard | adaptive (default: standard)
+    KIRBUK_BOTO_MAX_ATTEMPTS          total attempts including retries (default: 5)
+"""
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+MAX_POOL_CONNECTIONS = int(os.getenv("KIRBUK_BOTO_MAX_POOL_CONNECTIONS", "32"))
+RETRY_MODE = os.getenv("KIRBUK_BOTO_RETRY_MODE", "standard")
+MAX_ATTEMPTS = int(os.getenv("KIRBUK_BOTO_MAX_ATTEMPTS", "5"))
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_stats = {}
+_overrides = {}
+
+
+def build_config(**overrides):
+    """Build the botocore Config used for registry clients
+
+    Args:
+        **overrides: Config options that replace the defaults (e.g. read_timeout=900)
+
+    Returns:
+        botocore Config object
+    """
+    options = {
+        'max_pool_connections': MAX_POOL_CONNECTIONS,
+        'retries': {'mode': RETRY_MODE, 'total_max_attempts': MAX_ATTEMPTS},
+    }
+    options.update(overrides)
+    return Config(**options)
+
+
+def get_client(service_name, region_name=None, **config_overrides):
+    """Return the shared client for a service and region, creating it on first use
+
+    Args:
+        service_name: AWS service name (e.g. 's3', 'polly', 'ses')
+        region_name: AWS region (None uses the default region of the environment)
+        **config_overrides: botocore Config options; clients with different overrides are kept apart
+
+    Returns:
+        boto3 client
+    """
+    override = _overrides.get(service_name)
+    if override is not None:
+        return override
+
+    key = (service_name, region_name, tuple(sorted(config_overrides.items())))
+    client = _clients.get(key)
+    if client is not None:
+        with _lock:
+            _stats[service_name]['reused'] += 1
+        return client
+
+    global _session
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if _session is None:
+                _session = boto3.session.Session()
+            client = _session.client(service_name, region_name=region_name,
+                                     config=build_config(**config_overrides))
+            _clients[key] = client
+            _stats.setdefault(service_name, {'created': 0, 'reused': 0})['created'] += 1
+        else:
+            _stats[service_name]['reused'] += 1
+        return client
+
+
+def client_stats():
+    """Return construction and reuse counters per service
+
+    Returns:
+        Dictionary like {'s3': {'created': 1, 'reused': 42}}
+    """
+    with _lock:
+        return {service: dict(counts) for service, counts in _stats.items()}
+
+
+def set_client_override(service_name, client):
+    """Serve every get_client call for a service with the given object (None removes it)
+
+    Used by the offline benchmarks to plug in local stand-ins for S3, Polly and SES.
+    """
+    with _lock:
+        if client is None:
+            _overrides.pop(service_name, None)
+        else:
+            _overrides[service_name] = client
+
+
+def reset_clients():
+    """Drop all cached clients and counters (e.g. after a fork)"""
+    global _session
+    with _lock:
+        _clients.clear()
+        _stats.clear()
+        _session = None
@@ -0,0 +1 @@
+"""Offline benchmarks of the agent pipeline (see run_pipeline.py) and of the recording modes (recording_modes.py)"""
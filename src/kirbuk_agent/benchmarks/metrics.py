@@ -0,0 +1,178 @@
+"""
+Per-stage resource accounting for the pipeline benchmark.
+
+StageRecorder is registered with pipeline.add_step_hook and measures every step:
+
+    wall_seconds        elapsed time of the step
+    cpu_seconds         CPU time of the thread that ran the step
+    child_cpu_seconds   CPU time of child processes (FFmpeg, the Playwright runner and
+                        Chromium) during the step - process-wide, so exact only while
+                        one step runs at a time (the benchmark's default)
+    peak_rss_mb         highest resident memory of this process and all its children
+    bytes_in/bytes_out  bytes uploaded to / downloaded from the local S3
+
+CPU and memory of children are read from /proc, so they are reported as 0 elsewhere.
+"""
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+SAMPLE_INTERVAL = 0.1
+MB = 1024 * 1024
+
+
+def _read_stat(pid):
+    """Return (parent pid, CPU seconds) of a process from /proc/<pid>/stat, or None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    # Fields after the command name: state ppid ... utime(12) stime(13)
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def descendants(root_pid=None):
+    """Return {pid: CPU seconds} of every live descendant of a process"""
+    root_pid = root_pid or os.getpid()
+    try:
+        pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return {}
+    stats = {pid: stat for pid in pids if (stat := _read_stat(pid))}
+    children = {}
+    for pid, (ppid, _) in stats.items():
+        children.setdefault(ppid, []).append(pid)
+    found = {}
+    stack = list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        found[pid] = stats[pid][1]
+        stack.extend(children.get(pid, []))
+    return found
+
+
+def tree_cpu_seconds(pid):
+    """Return the CPU seconds of a live process and all its descendants"""
+    stat = _read_stat(pid)
+    return (stat[1] if stat else 0.0) + sum(descendants(pid).values())
+
+
+def processes_named(name):
+    """Return the pids of the processes whose command name is name (e.g. 'Xvfb')"""
+    pids = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/comm') as f:
+                if f.read().strip() == name:
+                    pids.append(int(entry))
+        except OSError:
+            continue
+    return pids
+
+
+def tree_rss_bytes(pids):
+    """Return the summed resident memory of this process and the given pids"""
+    total = 0
+    for pid in [os.getpid(), *pids]:
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def children_cpu_seconds():
+    """Return CPU seconds of terminated, waited-for children"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class StageRecorder:
+    """Collects resource usage per pipeline step (use as a pipeline step hook)"""
+
+    def __init__(self):
+        self.stages = {}
+        self._active = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self.peak_rss = 0
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._sample, name='benchmark-rss', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            rss = tree_rss_bytes(descendants())
+            with self._lock:
+                self.peak_rss = max(self.peak_rss, rss)
+                for entry in self._active.values():
+                    entry['peak_rss'] = max(entry['peak_rss'], rss)
+
+    def current_stage(self):
+        """Stage of the calling thread, or the only running stage for helper threads"""
+        stage = getattr(self._local, 'stage', None)
+        if stage is None:
+            with self._lock:
+                if len(self._active) == 1:
+                    stage = next(iter(self._active))
+        return stage or 'unattributed'
+
+    def add_transfer(self, direction, nbytes):
+        """on_transfer callback for the stand-ins"""
+        stage = self.current_stage()
+        with self._lock:
+            entry = self.stages.setdefault(stage, self._empty())
+            entry['bytes_in' if direction == 'in' else 'bytes_out'] += nbytes
+
+    @staticmethod
+    def _empty():
+        return {'status': None, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'child_cpu_seconds': 0.0,
+                'peak_rss_mb': 0.0, 'bytes_in': 0, 'bytes_out': 0}
+
+    @contextmanager
+    def __call__(self, name):
+        self._local.stage = name
+        window = {'peak_rss': tree_rss_bytes(descendants())}
+        with self._lock:
+            self._active[name] = window
+        children_before = descendants()
+        waited_before = children_cpu_seconds()
+        cpu_before = time.thread_time()
+        started = time.monotonic()
+        status = 'failed'
+        try:
+            yield
+            status = 'completed'
+        finally:
+            wall = time.monotonic() - started
+            cpu = time.thread_time() - cpu_before
+            children_after = descendants()
+            child_cpu = sum(seconds - children_before.get(pid, 0.0) for pid, seconds in children_after.items())
+            child_cpu += children_cpu_seconds() - waited_before
+            self._local.stage = None
+            with self._lock:
+                self._active.pop(name, None)
+                entry = self.stages.setdefault(name, self._empty())
+                entry.update({
+                    'status': status,
+                    'wall_seconds': round(entry['wall_seconds'] + wall, 3),
+                    'cpu_seconds': round(entry['cpu_seconds'] + cpu, 3),
+                    'child_cpu_seconds': round(entry['child_cpu_seconds'] + child_cpu, 3),
+                    'peak_rss_mb': round(max(entry['peak_rss_mb'], window['peak_rss'] / MB), 1),
+                })
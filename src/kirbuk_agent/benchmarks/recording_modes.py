@@ -0,0 +1,223 @@
+"""
+Benchmark of the Playwright recording modes: headless Chromium vs. headed on Xvfb.
+
+Each mode gets its own warm runner (browser_pool.RunnerProcess) that records a continuously
+animated page of the local benchmark site. Per recording it measures:
+
+    wall_seconds        time of the runner job (context, script, saving the video)
+    cpu_seconds         CPU time of the runner and its Chromium processes
+    xvfb_cpu_seconds    CPU time of the X server during the job (0 without one)
+    cpu_per_second      runner + X server CPU seconds per second of video
+    distinct_fps        video frames per second that differ from the previous frame
+    frame_interval_ms   median, p95 and max time between distinct frames
+    stalls              gaps between distinct frames longer than two nominal frames
+
+The page changes on every animation frame, so repeated frames in the video are frames the
+recording missed. Playwright writes the video at a constant 25 fps, so pacing is read from
+the distinct frames (FFmpeg's mpdecimate filter) rather than from the timestamps.
+
+Usage (from src/kirbuk_agent, with Playwright, FFmpeg and Xvfb installed):
+
+    python -m benchmarks.recording_modes --runs 3 --output recording.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.metrics import processes_named, tree_cpu_seconds
+from benchmarks.standins import StaticSite, read_fixture
+
+NOMINAL_FPS = 25  # Frame rate of Playwright's video recorder
+SHOWINFO_PATTERN = re.compile(r'pts_time:\s*([\d.]+)')
+SUMMARY_METRICS = ('wall_seconds', 'cpu_seconds', 'xvfb_cpu_seconds', 'cpu_per_second',
+                   'distinct_fps', 'frame_interval_p95_ms', 'frame_interval_max_ms', 'stalls')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--modes', default='headless,xvfb', help="comma-separated modes (default: headless,xvfb)")
+    parser.add_argument('--runs', type=int, default=3, help="recordings per mode (median)")
+    parser.add_argument('--seconds', type=int, default=10, help="seconds of animation per recording")
+    parser.add_argument('--output', default='recording-benchmark.json', help="JSON results file")
+    parser.add_argument('--keep', action='store_true', help="keep the work directory")
+    return parser.parse_args(argv)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def frame_pacing(video_path):
+    """Return frame counts and the intervals between distinct frames of a recording"""
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-nostats', '-i', video_path, '-an',
+         '-vf', 'mpdecimate,showinfo', '-f', 'null', '-'],
+        capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg failed to analyze {video_path}: {result.stderr[-1000:]}")
+    times = [float(value) for value in SHOWINFO_PATTERN.findall(result.stderr)]
+
+    import media_info
+    duration = media_info.duration(video_path)
+    intervals = [(after - before) * 1000 for before, after in zip(times, times[1:])]
+    if not intervals:
+        return {'video_seconds': round(duration, 3), 'distinct_frames': len(times)}
+    return {
+        'video_seconds': round(duration, 3),
+        'distinct_frames': len(times),
+        'distinct_fps': round(len(times) / duration, 2) if duration else 0.0,
+        'frame_interval_median_ms': round(statistics.median(intervals), 1),
+        'frame_interval_p95_ms': round(percentile(intervals, 0.95), 1),
+        'frame_interval_max_ms': round(max(intervals), 1),
+        'stalls': sum(1 for interval in intervals if interval > 2 * 1000 / NOMINAL_FPS),
+    }
+
+
+def xvfb_cpu_seconds():
+    return sum(tree_cpu_seconds(pid) for pid in processes_named('Xvfb'))
+
+
+def record(runner, script_path, work_dir, headless, display, timeout):
+    """Run one recording on the runner and return its measurements"""
+    cwd = tempfile.mkdtemp(prefix='recording_', dir=work_dir)
+    runner_cpu_before = tree_cpu_seconds(runner.process.pid)
+    xvfb_before = xvfb_cpu_seconds()
+    started = time.monotonic()
+    result = runner.run(script_path, cwd, timeout, headless=headless, display=display)
+    wall = time.monotonic() - started
+    cpu = tree_cpu_seconds(runner.process.pid) - runner_cpu_before
+    xvfb_cpu = xvfb_cpu_seconds() - xvfb_before
+
+    entry = {
+        'error': None if result.returncode == 0 else result.stderr[-1000:],
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'xvfb_cpu_seconds': round(xvfb_cpu, 3),
+    }
+    video_path = os.path.join(cwd, 'output.webm')
+    if os.path.exists(video_path):
+        entry.update(frame_pacing(video_path))
+        if entry.get('video_seconds'):
+            entry['cpu_per_second'] = round((cpu + xvfb_cpu) / entry['video_seconds'], 3)
+    elif not entry['error']:
+        entry['error'] = "No recording was saved"
+    return entry
+
+
+def benchmark_mode(mode, script_path, work_dir, args):
+    """Start a runner for one mode and record --runs times"""
+    from browser_pool import RunnerProcess
+    from recording import ensure_display
+
+    headless = mode == 'headless'
+    display = None if headless else ensure_display()
+    if not headless and display is None:
+        return {'error': "No X display and Xvfb could not be started", 'runs': []}
+
+    # The runner launches its first browser in the mode being measured
+    os.environ['KIRBUK_RECORDING_MODE'] = mode
+    if display:
+        os.environ['DISPLAY'] = display
+    runner = RunnerProcess()
+    try:
+        runs = []
+        for index in range(args.runs):
+            print(f"{mode}: recording {index + 1}/{args.runs}...", file=sys.stderr)
+            runs.append(record(runner, script_path, work_dir, headless, display, args.seconds * 3 + 60))
+    finally:
+        runner.close()
+    return {'launch_seconds': round(runner.start_seconds, 3), 'runs': runs}
+
+
+def summarize(results):
+    """Median of every metric over the successful runs of each mode"""
+    summary = {}
+    for mode, entry in results.items():
+        runs = [run for run in entry['runs'] if not run['error']]
+        summary[mode] = {'launch_seconds': entry.get('launch_seconds'),
+                         'failures': len(entry['runs']) - len(runs)}
+        for metric in SUMMARY_METRICS + ('frame_interval_median_ms', 'distinct_frames'):
+            values = [run[metric] for run in runs if run.get(metric) is not None]
+            summary[mode][metric] = round(statistics.median(values), 3) if values else None
+    return summary
+
+
+def print_table(summary, out):
+    print(f"\n{'mode':<10} {'launch s':>9} {'cpu s':>7} {'xvfb s':>7} {'cpu/s':>7} "
+          f"{'fps':>6} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7} {'stalls':>7}", file=out)
+
+    def cell(value, width, digits=2):
+        return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+    for mode, entry in summary.items():
+        print(f"{mode:<10} {cell(entry['launch_seconds'], 9)} {cell(entry['cpu_seconds'], 7)} "
+              f"{cell(entry['xvfb_cpu_seconds'], 7)} {cell(entry['cpu_per_second'], 7, 3)} "
+              f"{cell(entry['distinct_fps'], 6, 1)} {cell(entry['frame_interval_median_ms'], 7, 1)} "
+              f"{cell(entry['frame_interval_p95_ms'], 7, 1)} {cell(entry['frame_interval_max_ms'], 7, 1)} "
+              f"{cell(entry['stalls'], 7, 0)}", file=out)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    work_dir = tempfile.mkdtemp(prefix='kirbuk_recording_benchmark_')
+    os.environ.update({
+        'KIRBUK_LOG_FILE': os.path.join(work_dir, 'agent.log'),
+        'KIRBUK_CACHE_DIR': os.path.join(work_dir, 'cache'),
+    })
+
+    results = {
+        'benchmark': 'recording_modes',
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {'modes': modes, 'runs': args.runs, 'seconds': args.seconds},
+        'modes': {},
+    }
+    try:
+        with StaticSite() as site:
+            script_path = os.path.join(work_dir, 'recording_script.py')
+            with open(script_path, 'w') as f:
+                f.write(read_fixture('recording_script.py.tmpl')
+                        .replace('__BASE_URL__', site.url)
+                        .replace('__SECONDS__', str(args.seconds)))
+            for mode in modes:
+                results['modes'][mode] = benchmark_mode(mode, script_path, work_dir, args)
+        results['summary'] = summarize(results['modes'])
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print_table(results['summary'], sys.stderr)
+    failed = False
+    for mode, entry in results['modes'].items():
+        for run in entry['runs']:
+            if run['error']:
+                failed = True
+                print(f"✗ {mode} recording failed: {run['error']}", file=sys.stderr)
+        if entry.get('error'):
+            failed = True
+            print(f"✗ {mode}: {entry['error']}", file=sys.stderr)
+    print(f"\nResults written to {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
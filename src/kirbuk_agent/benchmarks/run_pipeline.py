@@ -0,0 +1,295 @@
+"""
+Offline end-to-end benchmark of the video pipeline.
+
+Runs the real agentcore_starter_strands.invoke() against local stand-ins (filesystem S3,
+canned LLM responses, espeak/sine TTS, capturing SES and a local static site recorded by
+the real Playwright runner and FFmpeg) and writes wall time, CPU time, peak RSS and bytes
+moved per stage as JSON. With --baseline, stages that got slower than the tolerance allow
+are reported and the exit code is 1, so the check can gate a deploy.
+
+Usage (from src/kirbuk_agent, with the agent's requirements, Playwright and FFmpeg installed):
+
+    python -m benchmarks.run_pipeline --runs 3 --output bench.json
+    python -m benchmarks.run_pipeline --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import types
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.metrics import StageRecorder, children_cpu_seconds, descendants, tree_rss_bytes
+from benchmarks.standins import (CapturingSES, LocalPolly, LocalS3, StaticSite, canned_agent_factory,
+                                 read_fixture)
+
+MB = 1024 * 1024
+COMPARED_METRICS = ('wall_seconds', 'cpu_seconds', 'child_cpu_seconds')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--runs', type=int, default=1, help="pipeline runs to aggregate (median)")
+    parser.add_argument('--output', default='benchmark-results.json', help="JSON results file")
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed relative slowdown per stage metric (default: 0.25)")
+    parser.add_argument('--min-delta', type=float, default=0.5,
+                        help="ignore slowdowns below this many seconds (default: 0.5)")
+    parser.add_argument('--encoding-profile', default=os.getenv("KIRBUK_ENCODING_PROFILE", "balanced"))
+    parser.add_argument('--end-slide-mode', default=os.getenv("KIRBUK_END_SLIDE_MODE", "segment"))
+    parser.add_argument('--recording-mode', choices=['headless', 'xvfb'],
+                        default=os.getenv("KIRBUK_RECORDING_MODE", "xvfb"))
+    parser.add_argument('--workers', type=int, default=1,
+                        help="pipeline workers; 1 keeps per-stage CPU attribution exact (default: 1)")
+    parser.add_argument('--tts', choices=['auto', 'espeak', 'sine'], default='auto')
+    parser.add_argument('--pause-ms', type=int, default=1500,
+                        help="pause between actions in the canned Playwright script")
+    parser.add_argument('--llm-latency', type=float, default=0.0,
+                        help="simulated seconds per canned LLM call")
+    parser.add_argument('--warm-caches', action='store_true',
+                        help="keep the LLM and narration caches on between runs")
+    parser.add_argument('--keep', action='store_true', help="keep the work directory")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, work_dir):
+    """Point the agent at local state - must run before the agent modules are imported"""
+    os.environ.update({
+        'SENTRY_DSN': '',
+        'AWS_REGION': os.getenv('AWS_REGION', 'eu-central-1'),
+        'KIRBUK_CACHE_DIR': os.path.join(work_dir, 'cache'),
+        'KIRBUK_EXPLORATION_CACHE': 's3',
+        'KIRBUK_LLM_CACHE': 'local' if args.warm_caches else 'off',
+        'KIRBUK_TTS_CACHE': 's3' if args.warm_caches else 'off',
+        'KIRBUK_PIPELINE_WORKERS': str(args.workers),
+        'KIRBUK_ENCODING_PROFILE': args.encoding_profile,
+        'KIRBUK_END_SLIDE_MODE': args.end_slide_mode,
+        'KIRBUK_RECORDING_MODE': args.recording_mode,
+        'KIRBUK_MUSIC_DIR': os.getenv('KIRBUK_MUSIC_DIR', os.path.join(work_dir, 'no_music')),
+        'KIRBUK_LOG_FILE': os.path.join(work_dir, 'agent.log'),
+        # The canned agent factory replaces strands, so there are no SDKs to pre-import
+        'KIRBUK_PREWARM': 'clients,browser,assets',
+    })
+
+
+def run_once(agent, site, s3, log_file):
+    """Run one submission through invoke() and return its measurements"""
+    import pipeline
+
+    recorder = StageRecorder()
+    s3.on_transfer = recorder.add_transfer
+    submission_id = str(uuid.uuid4())
+    payload = {
+        'submission_id': submission_id,
+        'product_url': f"{site.url}/index.html",
+        'directions': "Show the features and the pricing page",
+        'email': 'benchmark@example.com',
+        'roast_mode': False,
+    }
+
+    # The exploration stage needs a live browser agent - serve its narrative from the cache
+    system_prompt = agent.get_exploration_system_prompt(False)
+    cache_key = agent.exploration_cache_key(payload, False, system_prompt, agent.MODEL_ID)
+    agent.get_exploration_cache(agent.S3_BUCKET, agent.REGION).set(cache_key, read_fixture('narrative.md'), payload)
+
+    pipeline.add_step_hook(recorder)
+    recorder.start()
+    times_before = os.times()
+    started = time.monotonic()
+    error = None
+    try:
+        with contextlib.redirect_stdout(log_file), contextlib.redirect_stderr(log_file):
+            agent.invoke(payload, types.SimpleNamespace(session_id='benchmark'))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        wall = time.monotonic() - started
+        times_after = os.times()
+        recorder.stop()
+        pipeline.remove_step_hook(recorder)
+        s3.on_transfer = None
+
+    failed = [name for name, entry in recorder.stages.items() if entry['status'] == 'failed']
+    if failed and not error:
+        error = f"Failed stages: {', '.join(failed)}"
+
+    video_path = os.path.join(s3.root, agent.S3_BUCKET, agent.S3_STAGING_PREFIX, submission_id, 'video.webm')
+    output = {'video_bytes': os.path.getsize(video_path) if os.path.exists(video_path) else 0}
+    if output['video_bytes']:
+        import media_info
+        try:
+            output['video_seconds'] = round(media_info.duration(video_path), 3)
+        except media_info.MediaProbeError as e:
+            output['video_seconds'] = None
+            error = error or str(e)
+
+    return {
+        'submission_id': submission_id,
+        'error': error,
+        'total': {
+            'wall_seconds': round(wall, 3),
+            'cpu_seconds': round((times_after.user - times_before.user) + (times_after.system - times_before.system), 3),
+            'child_cpu_seconds': round((times_after.children_user - times_before.children_user)
+                                       + (times_after.children_system - times_before.children_system), 3),
+            'peak_rss_mb': round(recorder.peak_rss / MB, 1),
+        },
+        'stages': recorder.stages,
+        'output': output,
+    }
+
+
+def summarize(runs):
+    """Median of every stage metric over the runs (peak RSS: maximum)"""
+    summary = {}
+    names = sorted({name for run in runs for name in run['stages']})
+    for name in names:
+        entries = [run['stages'][name] for run in runs if name in run['stages']]
+        summary[name] = {
+            metric: round(statistics.median(entry[metric] for entry in entries), 3)
+            for metric in ('wall_seconds', 'cpu_seconds', 'child_cpu_seconds', 'bytes_in', 'bytes_out')
+        }
+        summary[name]['peak_rss_mb'] = max(entry['peak_rss_mb'] for entry in entries)
+        summary[name]['failures'] = sum(1 for entry in entries if entry['status'] == 'failed')
+    summary['total'] = {
+        metric: round(statistics.median(run['total'][metric] for run in runs), 3)
+        for metric in ('wall_seconds', 'cpu_seconds', 'child_cpu_seconds')
+    }
+    summary['total']['peak_rss_mb'] = max(run['total']['peak_rss_mb'] for run in runs)
+    return summary
+
+
+def compare(summary, baseline, tolerance, min_delta):
+    """Return a description of every stage metric that regressed against the baseline"""
+    regressions = []
+    for name, entry in summary.items():
+        previous = baseline.get('summary', {}).get(name)
+        if not previous:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), entry.get(metric)
+            if before is None or after is None:
+                continue
+            if after - before > min_delta and after > before * (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {before:.2f}s -> {after:.2f}s "
+                                   f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+        if entry.get('failures', 0) > previous.get('failures', 0):
+            regressions.append(f"{name}: {entry['failures']} failed run(s)")
+    return regressions
+
+
+def print_table(summary, out):
+    print(f"\n{'stage':<24} {'wall s':>8} {'cpu s':>8} {'child s':>8} {'rss MB':>8} {'in KB':>10} {'out KB':>10}", file=out)
+    for name, entry in summary.items():
+        print(f"{name:<24} {entry['wall_seconds']:>8.2f} {entry['cpu_seconds']:>8.2f} "
+              f"{entry['child_cpu_seconds']:>8.2f} {entry['peak_rss_mb']:>8.1f} "
+              f"{entry.get('bytes_in', 0) / 1024:>10.1f} {entry.get('bytes_out', 0) / 1024:>10.1f}", file=out)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    work_dir = tempfile.mkdtemp(prefix='kirbuk_benchmark_')
+    configure_environment(args, work_dir)
+
+    import aws_clients
+    import llm
+
+    s3 = LocalS3(os.path.join(work_dir, 's3'))
+    polly = LocalPolly(args.tts)
+    ses = CapturingSES()
+    for service, client in (('s3', s3), ('polly', polly), ('ses', ses)):
+        aws_clients.set_client_override(service, client)
+
+    log_path = os.path.join(work_dir, 'agent.log')
+    results = {
+        'benchmark': 'pipeline',
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'runs': args.runs,
+            'workers': args.workers,
+            'encoding_profile': args.encoding_profile,
+            'end_slide_mode': args.end_slide_mode,
+            'recording_mode': args.recording_mode,
+            'tts': polly.engine,
+            'pause_ms': args.pause_ms,
+            'llm_latency': args.llm_latency,
+            'warm_caches': args.warm_caches,
+        },
+    }
+
+    runs = []
+    try:
+        with StaticSite() as site, open(log_path, 'a') as log_file:
+            llm.set_agent_factory(canned_agent_factory(site.url, args.pause_ms, args.llm_latency))
+
+            started = time.monotonic()
+            with contextlib.redirect_stdout(log_file):
+                import agentcore_starter_strands as agent
+            results['import_seconds'] = round(time.monotonic() - started, 3)
+
+            for index in range(args.runs):
+                print(f"Run {index + 1}/{args.runs}...", file=sys.stderr)
+                runs.append(run_once(agent, site, s3, log_file))
+
+        import media_info
+        from encoding import encoding_stats
+        from recording import recording_stats
+        from tracing import tracing_stats
+        from waiters import waiter_stats
+        results['runs'] = runs
+        results['summary'] = summarize(runs)
+        results['counters'] = {
+            'aws_clients': aws_clients.client_stats(),
+            'llm': llm.llm_stats(),
+            'media': media_info.media_stats(),
+            'encodes': encoding_stats(),
+            'waiters': waiter_stats(),
+            'spans': tracing_stats(),
+            'recording': recording_stats(),
+            's3_bytes_in': s3.bytes_in,
+            's3_bytes_out': s3.bytes_out,
+            'tts_characters': polly.characters,
+            'emails': len(ses.messages),
+        }
+        results['children_cpu_seconds'] = round(children_cpu_seconds(), 3)
+        results['final_rss_mb'] = round(tree_rss_bytes(descendants()) / MB, 1)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    exit_code = 1 if any(run['error'] for run in runs) else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results['regressions'] = compare(results['summary'], baseline, args.tolerance, args.min_delta)
+        if results['regressions']:
+            exit_code = 1
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print_table(results['summary'], sys.stderr)
+    for run in runs:
+        if run['error']:
+            print(f"✗ Run {run['submission_id']} failed: {run['error']}", file=sys.stderr)
+    for regression in results.get('regressions', []):
+        print(f"✗ Regression: {regression}", file=sys.stderr)
+    print(f"\nResults written to {args.output}" + (f", agent log kept in {log_path}" if args.keep else ""),
+          file=sys.stderr)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Local stand-ins for the services the pipeline calls.
+
+    LocalS3       filesystem-backed S3 (the boto3 calls the agent uses)
+    LocalPolly    synthesize_speech with espeak, or a sine tone when espeak is missing
+    CapturingSES  records send_email calls instead of sending them
+    CannedAgent   answers LLM calls with the fixtures in benchmarks/fixtures
+    StaticSite    serves benchmarks/fixtures/site over HTTP for the Playwright recording
+
+Every stand-in reports the bytes it moves to an optional on_transfer(direction, nbytes)
+callback, so the benchmark can attribute them to the running stage.
+"""
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from botocore.exceptions import ClientError
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _client_error(code, operation, status=404):
+    return {'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}, operation
+
+
+class _Exceptions:
+    class NoSuchKey(ClientError):
+        pass
+
+
+class LocalS3:
+    """The subset of the S3 client API used by the agent, stored under a directory"""
+
+    exceptions = _Exceptions
+
+    def __init__(self, root, on_transfer=None):
+        self.root = root
+        self.on_transfer = on_transfer
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, key)
+
+    def _meta_path(self, bucket, key):
+        return self._path(bucket, key) + '.__meta__.json'
+
+    def _count(self, direction, nbytes):
+        with self._lock:
+            if direction == 'in':
+                self.bytes_in += nbytes
+            else:
+                self.bytes_out += nbytes
+        if self.on_transfer:
+            self.on_transfer(direction, nbytes)
+
+    def _store(self, bucket, key, source_path=None, body=None, content_type=None, metadata=None):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if source_path is not None:
+            shutil.copyfile(source_path, path)
+        else:
+            with open(path, 'wb') as f:
+                f.write(body)
+        size = os.path.getsize(path)
+        etag = f'"{int(time.time() * 1e6):x}{size:x}"'
+        with open(self._meta_path(bucket, key), 'w') as f:
+            json.dump({'ContentType': content_type, 'Metadata': metadata or {}, 'ETag': etag}, f)
+        self._count('in', size)
+        return etag
+
+    def _meta(self, bucket, key, operation):
+        path = self._path(bucket, key)
+        if not os.path.exists(path):
+            if operation == 'GetObject':
+                raise self.exceptions.NoSuchKey(*_client_error('NoSuchKey', operation))
+            raise ClientError(*_client_error('404', operation))
+        with open(self._meta_path(bucket, key)) as f:
+            return json.load(f), os.path.getsize(path)
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, Metadata=None, **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode('utf-8')
+        elif hasattr(Body, 'read'):
+            Body = Body.read()
+        return {'ETag': self._store(Bucket, Key, body=Body, content_type=ContentType, metadata=Metadata)}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None, Callback=None):
+        extra = ExtraArgs or {}
+        self._store(Bucket, Key, source_path=Filename, content_type=extra.get('ContentType'),
+                    metadata=extra.get('Metadata'))
+
+    def head_object(self, Bucket, Key, **kwargs):
+        meta, size = self._meta(Bucket, Key, 'HeadObject')
+        return {'ContentLength': size, 'ETag': meta['ETag'], 'ContentType': meta['ContentType'],
+                'Metadata': meta['Metadata']}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        meta, size = self._meta(Bucket, Key, 'GetObject')
+        with open(self._path(Bucket, Key), 'rb') as f:
+            data = f.read()
+        self._count('out', size)
+        return {'Body': io.BytesIO(data), 'ContentLength': size, 'ETag': meta['ETag'],
+                'ContentType': meta['ContentType'], 'Metadata': meta['Metadata']}
+
+    def download_file(self, Bucket, Key, Filename, ExtraArgs=None, Config=None, Callback=None):
+        self._meta(Bucket, Key, 'HeadObject')
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+        self._count('out', os.path.getsize(Filename))
+
+    def copy_object(self, Bucket, CopySource, Key, **kwargs):
+        meta, _ = self._meta(CopySource['Bucket'], CopySource['Key'], 'CopyObject')
+        etag = self._store(Bucket, Key, source_path=self._path(CopySource['Bucket'], CopySource['Key']),
+                           content_type=meta['ContentType'], metadata=meta['Metadata'])
+        return {'CopyObjectResult': {'ETag': etag}}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        for path in (self._path(Bucket, Key), self._meta_path(Bucket, Key)):
+            if os.path.exists(path):
+                os.remove(path)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        return 'file://' + self._path(Params['Bucket'], Params['Key'])
+
+
+class LocalPolly:
+    """synthesize_speech backed by espeak (SSML mode), or a sine tone paced like speech"""
+
+    WORDS_PER_SECOND = 2.6
+
+    def __init__(self, engine='auto'):
+        if engine == 'auto':
+            engine = 'espeak' if shutil.which('espeak') or shutil.which('espeak-ng') else 'sine'
+        self.engine = engine
+        self.espeak = shutil.which('espeak-ng') or shutil.which('espeak')
+        self.characters = 0
+
+    def _sine_seconds(self, ssml):
+        pauses = sum(float(value) / (1000 if unit == 'ms' else 1)
+                     for value, unit in re.findall(r'<break[^>]*time="([\d.]+)(ms|s)"', ssml))
+        words = len(re.sub(r'<[^>]+>', ' ', ssml).split())
+        return max(0.5, words / self.WORDS_PER_SECOND + pauses)
+
+    def synthesize_speech(self, Text, SampleRate='24000', OutputFormat='mp3', **kwargs):
+        self.characters += len(Text)
+        work_dir = tempfile.mkdtemp(prefix='local_polly_')
+        try:
+            output_path = os.path.join(work_dir, f"speech.{OutputFormat}")
+            if self.engine == 'espeak':
+                wav_path = os.path.join(work_dir, 'speech.wav')
+                subprocess.run([self.espeak, '-m', '-w', wav_path, Text], check=True, capture_output=True)
+                source = ['-i', wav_path]
+            else:
+                source = ['-f', 'lavfi', '-i', f"sine=frequency=220:duration={self._sine_seconds(Text):.2f}"]
+            subprocess.run(['ffmpeg', '-v', 'error', '-y', *source, '-ar', str(SampleRate), '-ac', '1',
+                            '-c:a', 'libmp3lame', '-b:a', '48k', output_path],
+                           check=True, capture_output=True)
+            with open(output_path, 'rb') as f:
+                audio = f.read()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return {'AudioStream': io.BytesIO(audio), 'ContentType': 'audio/mpeg',
+                'RequestCharacters': len(Text)}
+
+
+class CapturingSES:
+    """send_email that keeps the messages in memory"""
+
+    def __init__(self):
+        self.messages = []
+
+    def send_email(self, Source, Destination, Message, **kwargs):
+        self.messages.append({'source': Source, 'destination': Destination,
+                              'subject': Message['Subject']['Data']})
+        return {'MessageId': f"benchmark-{len(self.messages)}"}
+
+
+class CannedResult:
+    def __init__(self, text):
+        self.message = {'role': 'assistant', 'content': [{'text': text}]}
+        self.metrics = None
+
+    def __str__(self):
+        return self.message['content'][0]['text']
+
+
+class CannedAgent:
+    """Stand-in for a strands Agent: picks a fixture by the system prompt it was created with"""
+
+    def __init__(self, system_prompt, playwright_script, latency=0.0):
+        self.system_prompt = system_prompt or ''
+        self.playwright_script = playwright_script
+        self.latency = latency
+        self.messages = []
+
+    def __call__(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        if 'Playwright' in self.system_prompt:
+            text = self.playwright_script
+        elif 'SSML' in self.system_prompt:
+            text = read_fixture('voice_script.xml')
+        else:
+            text = read_fixture('product_info.json')
+        return CannedResult(text)
+
+
+def canned_agent_factory(base_url, pause_ms=1500, latency=0.0):
+    """Return a factory(model_id, system_prompt) for llm.set_agent_factory"""
+    script = (read_fixture('playwright_script.py.tmpl')
+              .replace('__BASE_URL__', base_url)
+              .replace('__PAUSE_MS__', str(int(pause_ms))))
+    return lambda model_id, system_prompt: CannedAgent(system_prompt, script, latency)
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class StaticSite:
+    """Serves the benchmark website on 127.0.0.1 in a background thread"""
+
+    def __init__(self, directory=os.path.join(FIXTURES_DIR, 'site')):
+        handler = partial(_QuietHandler, directory=directory)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name='benchmark-site', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,237 @@
+"""
+Pool of warm Playwright runner processes (see playwright_runner.py).
+
+Each runner keeps Python, Playwright and a launched Chromium alive between scripts, so a
+recording attempt no longer pays for interpreter startup, imports and a cold browser
+launch. Runners are leased one job at a time. A runner that crashes or exceeds its time
+limit is killed and replaced, which keeps a misbehaving script from affecting other jobs.
+
+Configuration via environment:
+    KIRBUK_BROWSER_POOL_SIZE      number of warm runners (default: 1, 0 disables the pool)
+    KIRBUK_BROWSER_LEASE_TIMEOUT  seconds to wait for a free runner (default: 30)
+"""
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from log import get_logger
+
+log = get_logger(__name__)
+
+BROWSER_POOL_SIZE = int(os.getenv("KIRBUK_BROWSER_POOL_SIZE", "1"))
+BROWSER_LEASE_TIMEOUT = float(os.getenv("KIRBUK_BROWSER_LEASE_TIMEOUT", "30"))
+RUNNER_START_TIMEOUT = 90
+# Extra time the runner gets on top of the script timeout to close the context and save the video
+RUNNER_GRACE_SECONDS = 60
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'playwright_runner.py')
+
+
+class RunnerUnavailable(Exception):
+    """Raised when no warm runner can be used (pool disabled, failed to start or busy)"""
+
+
+class RunnerProcess:
+    """One playwright_runner.py subprocess and its response channel"""
+
+    def __init__(self):
+        read_fd, write_fd = os.pipe()
+        started = time.monotonic()
+        self.process = subprocess.Popen(
+            [sys.executable, RUNNER_SCRIPT, str(write_fd)],
+            stdin=subprocess.PIPE,
+            pass_fds=(write_fd,),
+            text=True,
+        )
+        os.close(write_fd)
+        self._responses = queue.Queue()
+        self._reader = threading.Thread(target=self._read, args=(read_fd,), daemon=True)
+        self._reader.start()
+
+        ready = self._next_response(RUNNER_START_TIMEOUT)
+        if not ready or not ready.get('ready'):
+            self.kill()
+            raise RunnerUnavailable("Playwright runner failed to start")
+        self.start_seconds = time.monotonic() - started
+        self.jobs = 0
+
+    def _read(self, read_fd):
+        with os.fdopen(read_fd, 'r') as responses:
+            for line in responses:
+                self._responses.put(json.loads(line))
+        self._responses.put(None)  # Runner exited
+
+    def _next_response(self, timeout):
+        try:
+            return self._responses.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def run(self, script_path, cwd, timeout, attempt=0, headless=None, display=None):
+        """Run a script and return a CompletedProcess like subprocess.run would
+
+        headless selects the recording mode (None: the runner's default) and display the X
+        display of headed runs.
+        """
+        request = {'script_path': script_path, 'cwd': cwd, 'timeout': timeout, 'attempt': attempt,
+                   'headless': headless, 'display': display}
+        args = ['playwright_runner', script_path]
+        try:
+            self.process.stdin.write(json.dumps(request) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            return subprocess.CompletedProcess(args, -9, '', f"Playwright runner is gone: {e}")
+        self.jobs += 1
+
+        response = self._next_response(timeout + RUNNER_GRACE_SECONDS)
+        if response is None:
+            # Hung (e.g. a blocking call in the script) or crashed - never reuse this runner
+            self.kill()
+            return subprocess.CompletedProcess(args, -9, '', f"Playwright runner did not finish within {timeout}s")
+        return subprocess.CompletedProcess(args, response['returncode'], response['stdout'], response['stderr'])
+
+    def kill(self):
+        if self.alive():
+            self.process.kill()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def close(self):
+        if self.alive():
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=15)
+            except Exception:
+                self.kill()
+
+
+class BrowserPool:
+    """Fixed-size pool of warm runners, started in the background"""
+
+    def __init__(self, size=BROWSER_POOL_SIZE):
+        self.size = size
+        self._idle = queue.Queue()
+        self._started = threading.Event()
+        self.failed = False
+        self.stats = {'leases': 0, 'replacements': 0, 'start_seconds': []}
+
+    def start(self):
+        """Launch the runners without blocking the caller"""
+        threading.Thread(target=self._start_all, name='browser-pool', daemon=True).start()
+
+    def _start_all(self):
+        try:
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+        except Exception as e:
+            log.warning(f"Browser pool unavailable, falling back to one process per script: {e}")
+            self.failed = True
+        finally:
+            self._started.set()
+
+    def wait_ready(self, timeout=RUNNER_START_TIMEOUT):
+        """Block until the runners have started (or failed to); return True if they are usable"""
+        if self.size <= 0:
+            return False
+        self._started.wait(timeout)
+        return self._started.is_set() and not self.failed
+
+    def _spawn(self):
+        runner = RunnerProcess()
+        self.stats['start_seconds'].append(round(runner.start_seconds, 3))
+        log.info(f"Warm Playwright runner ready in {runner.start_seconds:.1f}s")
+        return runner
+
+    @contextmanager
+    def lease(self, timeout=BROWSER_LEASE_TIMEOUT):
+        """Borrow a runner for one job
+
+        Raises:
+            RunnerUnavailable: If the pool is disabled, failed to start or stays busy
+        """
+        if self.size <= 0:
+            raise RunnerUnavailable("Browser pool disabled")
+        self._started.wait(RUNNER_START_TIMEOUT)
+        if self.failed:
+            raise RunnerUnavailable("Browser pool failed to start")
+        try:
+            runner = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RunnerUnavailable(f"No warm runner free within {timeout:.0f}s")
+
+        if not runner.alive():
+            try:
+                runner = self._replace(runner)
+            except Exception as e:
+                raise RunnerUnavailable(f"Could not restart Playwright runner: {e}")
+
+        try:
+            self.stats['leases'] += 1
+            yield runner
+        finally:
+            if not runner.alive():
+                try:
+                    runner = self._replace(runner)
+                except Exception as e:
+                    log.warning(f"Could not replace Playwright runner: {e}")
+                    runner = None
+            if runner is not None:
+                self._idle.put(runner)
+
+    def _replace(self, runner):
+        runner.kill()
+        self.stats['replacements'] += 1
+        return self._spawn()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Return the process-wide pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            if _pool.size > 0:
+                _pool.start()
+        return _pool
+
+
+def run_script(script_path, cwd, timeout, attempt=0, headless=None, display=None):
+    """Run a generated script on a warm runner, or on a one-off runner if none is available
+
+    Returns:
+        subprocess.CompletedProcess with the script's return code, stdout and stderr
+    """
+    try:
+        with get_browser_pool().lease() as runner:
+            log.info(f"Running on warm Playwright runner (job {runner.jobs + 1} of this runner)")
+            return runner.run(script_path, cwd, timeout, attempt, headless, display)
+    except RunnerUnavailable as e:
+        log.warning(f"{e} - starting a one-off runner")
+
+    runner = RunnerProcess()
+    try:
+        return runner.run(script_path, cwd, timeout, attempt, headless, display)
+    finally:
+        runner.close()
@@ -0,0 +1,180 @@
+"""
+Key/value storage for content-addressed caches (exploration narratives, LLM responses).
+
+Entries are small JSON documents stored either on local disk (fast, but only shared by
+jobs running in the same container) or in S3 (shared by every agent instance). Every entry
+carries its own expiry time; expired entries are treated as missing and removed lazily.
+"""
+import json
+import os
+import tempfile
+import time
+
+from aws_clients import get_client
+from log import get_logger
+
+log = get_logger(__name__)
+
+CACHE_DIR = os.getenv("KIRBUK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "kirbuk-cache"))
+CACHE_PREFIX = "cache"
+
+
+def make_entry(key, value, ttl, metadata=None):
+    """Wrap a value in a cache entry expiring after ttl seconds"""
+    now = time.time()
+    return {
+        'key': key,
+        'created_at': now,
+        'expires_at': now + ttl,
+        'metadata': metadata or {},
+        'value': value,
+    }
+
+
+def is_expired(entry):
+    return entry.get('expires_at', 0) <= time.time()
+
+
+def evict_least_recently_used(directory, max_bytes, suffix='.json'):
+    """Remove the oldest files (by modification time) of a cache directory beyond max_bytes
+
+    Readers touch the files they hit, so the modification time doubles as the LRU timestamp.
+    """
+    files = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+class LocalCacheBackend:
+    """Cache entries stored as JSON files, evicting the least recently used beyond max_bytes"""
+
+    name = 'local'
+
+    def __init__(self, namespace, directory=CACHE_DIR, max_bytes=None):
+        """Create a backend
+
+        Args:
+            namespace: Subdirectory for this cache (e.g. 'exploration')
+            directory: Root directory of all local caches
+            max_bytes: Optional size bound; least recently read entries are removed beyond it
+        """
+        self.directory = os.path.join(directory, namespace)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the entry stored under key, or None if missing or expired"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning(f"Unreadable cache entry {path}: {e}")
+            self.delete(key)
+            return None
+        if is_expired(entry):
+            self.delete(key)
+            return None
+        # The modification time doubles as the LRU timestamp
+        os.utime(path)
+        return entry
+
+    def set(self, key, entry):
+        """Store an entry (atomically, so concurrent readers never see partial files)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.max_bytes:
+            evict_least_recently_used(self.directory, self.max_bytes)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3CacheBackend:
+    """Cache entries stored as JSON objects under s3://bucket/cache/<namespace>/"""
+
+    name = 's3'
+
+    def __init__(self, namespace, bucket, region=None):
+        self.bucket = bucket
+        self.prefix = f"{CACHE_PREFIX}/{namespace}"
+        self.region = region
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}.json"
+
+    def get(self, key):
+        """Return the entry stored under key, or None if missing or expired"""
+        s3_client = get_client('s3', self.region)
+        try:
+            response = s3_client.get_object(Bucket=self.bucket, Key=self._key(key))
+            entry = json.loads(response['Body'].read())
+        except s3_client.exceptions.NoSuchKey:
+            return None
+        if is_expired(entry):
+            self.delete(key)
+            return None
+        return entry
+
+    def set(self, key, entry):
+        get_client('s3', self.region).put_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=json.dumps(entry),
+            ContentType='application/json'
+        )
+
+    def delete(self, key):
+        get_client('s3', self.region).delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def create_backend(mode, namespace, bucket=None, region=None, max_bytes=None):
+    """Create a cache backend from a mode string
+
+    Args:
+        mode: 's3', 'local' or 'off'
+        namespace: Name of the cache (separates caches sharing a directory or bucket)
+        bucket: S3 bucket (required for 's3')
+        region: AWS region of the bucket
+        max_bytes: Size bound for the local backend
+
+    Returns:
+        Backend object, or None if caching is off
+    """
+    mode = (mode or 'off').lower()
+    if mode == 'off':
+        return None
+    if mode == 'local':
+        return LocalCacheBackend(namespace, max_bytes=max_bytes)
+    if mode == 's3':
+        return S3CacheBackend(namespace, bucket, region)
+    raise ValueError(f"Unknown cache mode '{mode}' (expected s3, local or off)")
@@ -0,0 +1,384 @@
+"""
+Video composition for the final Kirbuk demo video.
+
+The end slide is appended segment by segment: only the slide (with its fade-in) is encoded,
+with the codec, resolution and frame rate of the recording, and the two are joined by the
+concat demuxer with stream copy. The recorded demo is never decoded, so the cost of the
+slide does not depend on the length of the video. The narration and the optional background
+music are mixed and encoded in the same pass that muxes the video.
+
+If the recording cannot be matched (unknown codec, probe failure) or the segment append
+fails, the composition falls back to a single FFmpeg filter graph that re-encodes the demo.
+
+Configuration via environment:
+    KIRBUK_END_SLIDE_MODE  segment | filter (default: segment)
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import media_info
+from encoding import audio_args, get_profile, record_encode, video_args
+from log import get_logger
+from tracing import annotate, traced
+
+log = get_logger(__name__)
+
+END_SLIDE_MODE = os.getenv("KIRBUK_END_SLIDE_MODE", "segment").lower()
+
+# Codecs the slide segment can be encoded in to match the recording (ffprobe name -> encoding codec)
+SEGMENT_CODECS = {'vp8': 'vp8', 'vp9': 'vp9'}
+DEFAULT_FRAME_RATE = '25'
+
+
+def _audio_inputs(voice_index, audio_path, music_path, voice_volume, music_volume):
+    """Return the audio inputs and the filters mixing them into [outa]
+
+    Args:
+        voice_index: FFmpeg input index the narration will get
+
+    Returns:
+        Tuple (input arguments, filter list)
+    """
+    inputs = ['-i', audio_path]                    # Voice narration
+    filters = []
+    if music_path:
+        inputs += [
+            '-stream_loop', '-1',                  # Loop music indefinitely
+            '-i', music_path,                      # Background music
+        ]
+        music_index = voice_index + 1
+        filters.append(f'[{voice_index}:a]volume={voice_volume}[voice]')
+        filters.append(f'[{music_index}:a]volume={music_volume}[music]')
+        filters.append('[voice][music]amix=inputs=2:duration=first,apad[outa]')
+    else:
+        filters.append(f'[{voice_index}:a]volume={voice_volume},apad[outa]')
+    return inputs, filters
+
+
+def _audio_outputs(profile, output_path):
+    return [
+        '-map', '[outa]',
+        *audio_args(profile),                      # Encode audio to Opus for WebM
+        '-shortest',                               # Padded audio ends with the video
+        '-y',                                      # Overwrite output file if exists
+        output_path
+    ]
+
+
+def build_composition_command(video_path, audio_path, output_path, slide_path=None,
+                              slide_duration=5.0, fade_duration=1.0, music_path=None,
+                              voice_volume=1.0, music_volume=0.15, width=1280, height=720,
+                              profile=None):
+    """Build the FFmpeg command line for the filter graph composition
+
+    Args:
+        video_path: Path to the silent Playwright recording (webm)
+        audio_path: Path to the voice narration (mp3)
+        output_path: Path for the final video (webm with audio)
+        slide_path: Optional path to the end slide PNG image
+        slide_duration: How long to show the end slide in seconds (default: 5)
+        fade_duration: Fade-in duration of the end slide in seconds (default: 1.0)
+        music_path: Optional path to a background music file (mp3)
+        voice_volume: Volume level for voice (default 1.0 = 100%)
+        music_volume: Volume level for background music (default 0.15 = 15%)
+        width: Output width in pixels (default: 1280)
+        height: Output height in pixels (default: 720)
+        profile: Encoding profile from encoding.get_profile (default profile if None)
+
+    Returns:
+        List of command line arguments
+    """
+    profile = profile or get_profile()
+    cmd = ['ffmpeg', '-i', video_path]            # Input 0: silent video
+    filters = []
+
+    if slide_path:
+        cmd += [
+            '-loop', '1',                          # Loop the image
+            '-t', str(slide_duration),             # Duration of slide
+            '-i', slide_path,                      # Input 1: end slide image
+        ]
+        # Scale slide to match resolution, add fade-in, then concatenate
+        filters.append(
+            f'[1:v]scale={width}:{height},format=yuv420p,'
+            f'fade=t=in:st=0:d={fade_duration}[slide]'
+        )
+        filters.append('[0:v][slide]concat=n=2:v=1:a=0[outv]')
+
+    audio_inputs, audio_filters = _audio_inputs(2 if slide_path else 1, audio_path, music_path,
+                                                voice_volume, music_volume)
+    cmd += audio_inputs
+    filters += audio_filters
+
+    cmd += ['-filter_complex', ';'.join(filters)]
+
+    if slide_path:
+        cmd += ['-map', '[outv]', *video_args(profile)]
+    else:
+        # No slide to append - the recording can be muxed as-is
+        cmd += ['-map', '0:v', '-c:v', 'copy']
+
+    return cmd + _audio_outputs(profile, output_path)
+
+
+def match_recording(video_path):
+    """Return the codec, resolution and frame rate a slide segment needs to match a recording
+
+    Raises:
+        ValueError: If the recording's codec cannot be matched for a stream copy concat
+        media_info.MediaProbeError: If the recording cannot be probed
+    """
+    stream = media_info.probe(video_path)['video']
+    if not stream or stream['codec'] not in SEGMENT_CODECS:
+        raise ValueError(f"Recording codec {stream and stream['codec']} cannot be matched for a segment append")
+    frame_rate = stream.get('frame_rate')
+    if not frame_rate or frame_rate.startswith('0'):
+        frame_rate = DEFAULT_FRAME_RATE
+    return {
+        'codec': SEGMENT_CODECS[stream['codec']],
+        'width': stream['width'],
+        'height': stream['height'],
+        'frame_rate': frame_rate,
+    }
+
+
+def build_slide_segment_command(slide_path, output_path, recording, slide_duration=5.0,
+                                fade_duration=1.0, profile=None):
+    """Build the FFmpeg command that encodes the end slide as a segment matching the recording
+
+    Args:
+        slide_path: Path to the end slide PNG image
+        output_path: Path for the slide segment (webm)
+        recording: Stream parameters from match_recording
+        slide_duration: How long to show the end slide in seconds (default: 5)
+        fade_duration: Fade-in duration of the end slide in seconds (default: 1.0)
+        profile: Encoding profile from encoding.get_profile (default profile if None)
+
+    Returns:
+        List of command line arguments
+    """
+    profile = profile or get_profile()
+    return [
+        'ffmpeg',
+        '-loop', '1', '-framerate', recording['frame_rate'],
+        '-t', str(slide_duration),
+        '-i', slide_path,
+        '-vf', (f"scale={recording['width']}:{recording['height']},format=yuv420p,"
+                f"fade=t=in:st=0:d={fade_duration}"),
+        '-r', recording['frame_rate'],
+        '-an',
+        *video_args(profile, codec=recording['codec']),
+        '-y',
+        output_path
+    ]
+
+
+def build_segment_composition_command(list_path, audio_path, output_path, music_path=None,
+                                      voice_volume=1.0, music_volume=0.15, profile=None):
+    """Build the FFmpeg command that joins the segments by stream copy and adds the audio
+
+    Args:
+        list_path: Concat demuxer list of the recording and the slide segment
+        audio_path: Path to the voice narration (mp3)
+        output_path: Path for the final video (webm with audio)
+        music_path: Optional path to a background music file
+        voice_volume: Volume level for voice (default 1.0 = 100%)
+        music_volume: Volume level for background music (default 0.15 = 15%)
+        profile: Encoding profile from encoding.get_profile (default profile if None)
+
+    Returns:
+        List of command line arguments
+    """
+    profile = profile or get_profile()
+    cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', list_path]    # Input 0: recording + slide
+    audio_inputs, audio_filters = _audio_inputs(1, audio_path, music_path, voice_volume, music_volume)
+    cmd += audio_inputs
+    cmd += ['-filter_complex', ';'.join(audio_filters)]
+    cmd += ['-map', '0:v', '-c:v', 'copy']                             # The demo is never decoded
+    return cmd + _audio_outputs(profile, output_path)
+
+
+def _run_ffmpeg(cmd, timeout):
+    started = time.monotonic()
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        log.error("FFmpeg failed", returncode=result.returncode, stderr=result.stderr[-4000:])
+        raise Exception(f"FFmpeg failed with return code {result.returncode}: {result.stderr[-2000:]}")
+    return result, time.monotonic() - started
+
+
+def compose_with_slide_segment(video_path, audio_path, output_path, slide_path, slide_duration,
+                               fade_duration, music_path, voice_volume, music_volume, timeout, profile):
+    """Append the end slide as a separately encoded segment and mux the audio
+
+    Returns:
+        Tuple (FFmpeg result of the mux, encode statistics)
+    """
+    recording = match_recording(video_path)
+    segment_dir = tempfile.mkdtemp(prefix='end_slide_', dir=os.path.dirname(output_path))
+    segment_path = os.path.join(segment_dir, 'slide.webm')
+    list_path = os.path.join(segment_dir, 'segments.txt')
+    try:
+        log.info(f"Encoding end slide segment ({recording['codec']}, {recording['width']}x{recording['height']} "
+                 f"@ {recording['frame_rate']} fps)...")
+        result, seconds = _run_ffmpeg(
+            build_slide_segment_command(slide_path, segment_path, recording, slide_duration,
+                                        fade_duration, profile),
+            timeout
+        )
+        slide_encode = record_encode('end_slide', profile, result.stderr, seconds)
+
+        with open(list_path, 'w') as f:
+            f.write(f"file '{os.path.abspath(video_path)}'\n")
+            f.write(f"file '{os.path.abspath(segment_path)}'\n")
+        result, seconds = _run_ffmpeg(
+            build_segment_composition_command(list_path, audio_path, output_path, music_path,
+                                              voice_volume, music_volume, profile),
+            timeout
+        )
+        encode = record_encode('mux', profile, result.stderr, seconds)
+        encode['end_slide'] = slide_encode
+        return result, encode
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+
+@traced('compose')
+def compose_final_video(video_path, audio_path, output_path, slide_path=None,
+                        slide_duration=5.0, fade_duration=1.0, music_path=None,
+                        voice_volume=1.0, music_volume=0.15, timeout=600, profile=None,
+                        end_slide_mode=None):
+    """Render the final video (recording + end slide + narration + music)
+
+    The narration is padded with silence so the output length always follows the
+    video track, which means the end slide is never cut short by a shorter voice-over.
+
+    Args:
+        video_path: Path to the silent Playwright recording (webm)
+        audio_path: Path to the voice narration (mp3)
+        output_path: Path for the final video (webm with audio)
+        slide_path: Optional path to the end slide PNG image
+        slide_duration: How long to show the end slide in seconds (default: 5)
+        fade_duration: Fade-in duration of the end slide in seconds (default: 1.0)
+        music_path: Optional path to a background music file (mp3)
+        voice_volume: Volume level for voice (default 1.0 = 100%)
+        music_volume: Volume level for background music (default 0.15 = 15%)
+        timeout: FFmpeg timeout in seconds (default: 600)
+        profile: Encoding profile from encoding.get_profile (default profile if None)
+        end_slide_mode: 'segment' or 'filter' (default: KIRBUK_END_SLIDE_MODE)
+
+    Returns:
+        Tuple (output path, encode statistics from encoding.record_encode)
+    """
+    profile = profile or get_profile()
+    end_slide_mode = (end_slide_mode or END_SLIDE_MODE) if slide_path else None
+    try:
+        log.info(f"Composing final video (end slide: {end_slide_mode or 'none'}, profile '{profile['name']}')",
+                 video=video_path, slide=slide_path, slide_seconds=slide_duration, fade_seconds=fade_duration,
+                 voice=audio_path, voice_volume=voice_volume, music=music_path, music_volume=music_volume,
+                 output=output_path)
+
+        result = None
+        if end_slide_mode == 'segment':
+            try:
+                result, encode = compose_with_slide_segment(
+                    video_path, audio_path, output_path, slide_path, slide_duration, fade_duration,
+                    music_path, voice_volume, music_volume, timeout, profile
+                )
+            except subprocess.TimeoutExpired:
+                raise
+            except Exception as e:
+                log.warning(f"Segment end slide append failed, re-encoding with a filter graph: {e}")
+                end_slide_mode = 'filter'
+
+        if result is None:
+            cmd = build_composition_command(
+                video_path,
+                audio_path,
+                output_path,
+                slide_path=slide_path,
+                slide_duration=slide_duration,
+                fade_duration=fade_duration,
+                music_path=music_path,
+                voice_volume=voice_volume,
+                music_volume=music_volume,
+                profile=profile,
+            )
+            result, seconds = _run_ffmpeg(cmd, timeout)
+            encode = record_encode('compose', profile, result.stderr, seconds)
+
+        encode['end_slide_mode'] = end_slide_mode
+        media_info.record_duration(output_path, media_info.duration_from_ffmpeg_log(result.stderr))
+        annotate(end_slide_mode=end_slide_mode, profile=profile['name'], frames=encode['frames'],
+                 fps=encode['fps'], bytes=os.path.getsize(output_path))
+        log.info(f"Final video composed: {output_path} ({os.path.getsize(output_path):,} bytes)")
+        return output_path, encode
+
+    except subprocess.TimeoutExpired:
+        log.error(f"FFmpeg composition timed out after {timeout} seconds")
+        raise Exception("Video composition timed out")
+    except Exception as e:
+        log.error(f"Error composing final video: {e}")
+        raise
+
+
+def build_cut_command(video_path, intervals, output_path, fps=25, profile=None):
+    """Build the FFmpeg command that removes time intervals from a silent recording
+
+    Args:
+        video_path: Path to the silent Playwright recording (webm)
+        intervals: List of [start, end] pairs in seconds to drop
+        output_path: Path for the cut recording (webm)
+        fps: Frame rate of the recording (Playwright records at 25 fps)
+        profile: Encoding profile from encoding.get_profile (default profile if None)
+
+    Returns:
+        List of command line arguments
+    """
+    profile = profile or get_profile()
+    dropped = '+'.join(f'between(t,{start:.3f},{end:.3f})' for start, end in intervals)
+    return [
+        'ffmpeg', '-i', video_path,
+        '-vf', f"fps={fps},select='not({dropped})',setpts=N/{fps}/TB",
+        '-an',
+        *video_args(profile, codec='vp8'),         # Same codec as the recording
+        '-y',
+        output_path
+    ]
+
+
+@traced('ffmpeg.cut')
+def remove_intervals(video_path, intervals, output_path, timeout=600, profile=None):
+    """Cut failed segment attempts out of a recording
+
+    Args:
+        video_path: Path to the silent Playwright recording (webm)
+        intervals: List of [start, end] pairs in seconds to drop
+        output_path: Path for the cut recording (webm)
+        timeout: FFmpeg timeout in seconds (default: 600)
+        profile: Encoding profile from encoding.get_profile (default profile if None)
+
+    Returns:
+        Path to the output file
+    """
+    profile = profile or get_profile()
+    log.info(f"Cutting {len(intervals)} failed segment attempt(s) "
+             f"({sum(end - start for start, end in intervals):.1f}s) from the recording...")
+    started = time.monotonic()
+    result = subprocess.run(
+        build_cut_command(video_path, intervals, output_path, profile=profile),
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg cut failed with return code {result.returncode}: {result.stderr[-2000:]}")
+    encode = record_encode('cut', profile, result.stderr, time.monotonic() - started)
+    annotate(intervals=len(intervals), frames=encode['frames'], fps=encode['fps'],
+             bytes=os.path.getsize(output_path))
+    media_info.record_duration(output_path, media_info.duration_from_ffmpeg_log(result.stderr))
+    log.info(f"Recording cut: {output_path} ({os.path.getsize(output_path):,} bytes)")
+    return output_path
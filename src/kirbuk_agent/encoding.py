@@ -0,0 +1,129 @@
+"""
+Named FFmpeg encoding profiles for every stage that encodes video or audio.
+
+libvpx with default settings (no deadline, cpu-used, row-mt or tiles) is one of the
+slowest VP9 configurations there is. A profile fixes the speed/size trade-off of all
+encodes of a job in one place:
+
+    fast      realtime deadline, highest cpu-used - lowest latency, largest files
+    balanced  good deadline, cpu-used 4 with row-mt and tiles (default)
+    archive   good deadline, cpu-used 1 with alt-ref frames - smallest files, slowest
+
+The profile comes from the submission payload ('encoding_profile') or from
+KIRBUK_ENCODING_PROFILE. Every encode records its frame count and throughput (fps), so
+profiles can be tuned against output size.
+"""
+import os
+import re
+import threading
+
+from log import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_PROFILE = os.getenv("KIRBUK_ENCODING_PROFILE", "balanced").lower()
+ENCODER_THREADS = os.cpu_count() or 2
+
+PROFILES = {
+    'fast': {
+        'deadline': 'realtime',
+        'cpu_used': 8,
+        'vp9': {'crf': 36, 'tile_columns': 2, 'extra': ['-lag-in-frames', '0']},
+        'vp8': {'crf': 10, 'bitrate': '2M'},
+        'opus_bitrate': '64k',
+    },
+    'balanced': {
+        'deadline': 'good',
+        'cpu_used': 4,
+        'vp9': {'crf': 32, 'tile_columns': 2, 'extra': []},
+        'vp8': {'crf': 10, 'bitrate': '2M'},
+        'opus_bitrate': '96k',
+    },
+    'archive': {
+        'deadline': 'good',
+        'cpu_used': 1,
+        'vp9': {'crf': 28, 'tile_columns': 1, 'extra': ['-auto-alt-ref', '1', '-lag-in-frames', '25']},
+        'vp8': {'crf': 6, 'bitrate': '4M'},
+        'opus_bitrate': '128k',
+    },
+}
+
+FFMPEG_FRAME_PATTERN = re.compile(r'frame=\s*(\d+)')
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_profile(name=None):
+    """Return the encoding profile called name (or the default) as a dictionary
+
+    Unknown names fall back to the default profile - the name may come from a submission.
+    """
+    name = (name or DEFAULT_PROFILE).lower()
+    if name not in PROFILES:
+        log.warning(f"Unknown encoding profile '{name}', using '{DEFAULT_PROFILE}'")
+        name = DEFAULT_PROFILE if DEFAULT_PROFILE in PROFILES else 'balanced'
+    return dict(PROFILES[name], name=name)
+
+
+def video_args(profile, codec='vp9'):
+    """Return the FFmpeg output options for a VP9 or VP8 (WebM) video stream"""
+    common = ['-deadline', profile['deadline'], '-cpu-used', str(profile['cpu_used']),
+              '-threads', str(ENCODER_THREADS)]
+    if codec == 'vp8':
+        settings = profile['vp8']
+        return ['-c:v', 'libvpx', *common, '-crf', str(settings['crf']), '-b:v', settings['bitrate']]
+    settings = profile['vp9']
+    return [
+        '-c:v', 'libvpx-vp9', *common,
+        '-row-mt', '1',
+        '-tile-columns', str(settings['tile_columns']),
+        '-crf', str(settings['crf']), '-b:v', '0',   # Constant quality
+        *settings['extra'],
+    ]
+
+
+def audio_args(profile):
+    """Return the FFmpeg output options for the Opus audio stream"""
+    return ['-c:a', 'libopus', '-b:a', profile['opus_bitrate']]
+
+
+def record_encode(stage, profile, stderr, seconds):
+    """Record frames and throughput of a finished encode
+
+    Args:
+        stage: Name of the encoding stage (e.g. 'compose')
+        profile: Profile the stage used
+        stderr: FFmpeg's stderr (its last progress line holds the frame count)
+        seconds: Wall-clock duration of the encode
+
+    Returns:
+        Dictionary with stage, profile, frames, seconds and fps
+    """
+    matches = FFMPEG_FRAME_PATTERN.findall(stderr or '')
+    frames = int(matches[-1]) if matches else 0
+    fps = frames / seconds if seconds > 0 else 0.0
+    encode = {
+        'stage': stage,
+        'profile': profile['name'],
+        'frames': frames,
+        'seconds': round(seconds, 3),
+        'fps': round(fps, 1),
+    }
+    log.info(f"Encoded {frames} frames in {seconds:.1f}s ({fps:.1f} fps, profile '{profile['name']}')")
+
+    with _stats_lock:
+        entry = _stats.setdefault(f"{stage}/{profile['name']}", {'encodes': 0, 'frames': 0, 'seconds': 0.0})
+        entry['encodes'] += 1
+        entry['frames'] += frames
+        entry['seconds'] = round(entry['seconds'] + seconds, 3)
+    return encode
+
+
+def encoding_stats():
+    """Return encode counts, frames and average fps per stage and profile"""
+    with _stats_lock:
+        return {
+            key: dict(entry, fps=round(entry['frames'] / entry['seconds'], 1) if entry['seconds'] else 0.0)
+            for key, entry in _stats.items()
+        }
@@ -0,0 +1,147 @@
+"""
+Content-addressed cache of website exploration narratives.
+
+Browser exploration is the slowest and most expensive step of a job. Its result only
+depends on the site, the user's directions, the tone and whether the agent could log in,
+so resubmissions and retries of the same request reuse the stored narrative.
+
+Configuration via environment:
+    KIRBUK_EXPLORATION_CACHE      s3 | local | off (default: s3)
+    KIRBUK_EXPLORATION_CACHE_TTL  seconds a narrative stays valid (default: 86400)
+"""
+import hashlib
+import json
+import os
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from cache_backends import create_backend, make_entry
+from log import get_logger
+
+log = get_logger(__name__)
+
+EXPLORATION_CACHE_MODE = os.getenv("KIRBUK_EXPLORATION_CACHE", "s3")
+EXPLORATION_CACHE_TTL = int(os.getenv("KIRBUK_EXPLORATION_CACHE_TTL", str(24 * 3600)))
+
+# Bump to invalidate every cached narrative (e.g. after changing the key format)
+CACHE_KEY_VERSION = 1
+
+# Query parameters that never change what a page shows
+TRACKING_PARAM_PREFIX = 'utm_'
+TRACKING_PARAMS = {'gclid', 'fbclid', 'msclkid'}
+
+# Credential values are never stored; they are swapped for placeholders and restored on a hit
+USERNAME_PLACEHOLDER = '{{test_username}}'
+PASSWORD_PLACEHOLDER = '{{test_password}}'
+# Shorter values cannot be replaced reliably, so such narratives are not cached at all
+MIN_REDACTABLE_LENGTH = 4
+
+
+def normalize_url(url):
+    """Normalize a product URL so trivially different spellings share a cache entry
+
+    Lowercases scheme and host, adds a missing scheme, drops default ports, fragments,
+    tracking parameters and trailing slashes, and sorts the remaining query parameters.
+    """
+    url = (url or '').strip()
+    if '://' not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip('/')
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAM_PREFIX) and name.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def normalize_directions(directions):
+    """Collapse whitespace and case so reformatted directions share a cache entry"""
+    return ' '.join((directions or '').split()).lower()
+
+
+def exploration_cache_key(payload, roast_mode, system_prompt, model_id):
+    """Return the sha256 cache key of an exploration request
+
+    The system prompt and model are part of the key, so prompt changes invalidate old
+    narratives on their own.
+    """
+    material = {
+        'version': CACHE_KEY_VERSION,
+        'url': normalize_url(payload.get('product_url')),
+        'directions': normalize_directions(payload.get('directions')),
+        'roast_mode': bool(roast_mode),
+        'credentials': bool(payload.get('test_username') and payload.get('test_password')),
+        'model': model_id,
+        'system_prompt': hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def redact_credentials(narrative, payload):
+    """Replace the submission's credential values with placeholders"""
+    if payload.get('test_password'):
+        narrative = narrative.replace(payload['test_password'], PASSWORD_PLACEHOLDER)
+    if payload.get('test_username'):
+        narrative = narrative.replace(payload['test_username'], USERNAME_PLACEHOLDER)
+    return narrative
+
+
+def restore_credentials(narrative, payload):
+    """Put the current submission's credential values back into a cached narrative"""
+    narrative = narrative.replace(USERNAME_PLACEHOLDER, payload.get('test_username') or '')
+    return narrative.replace(PASSWORD_PLACEHOLDER, payload.get('test_password') or '')
+
+
+class ExplorationCache:
+    """Stores exploration narratives by request key"""
+
+    def __init__(self, backend, ttl=EXPLORATION_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, key, payload):
+        """Return the cached narrative for key, or None on a miss or backend error"""
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            log.warning(f"Exploration cache lookup failed: {e}")
+            return None
+        if entry is None:
+            return None
+        return restore_credentials(entry['value'], payload)
+
+    def set(self, key, narrative, payload):
+        """Store a narrative (failures are logged, never raised)"""
+        credentials = [payload.get('test_username'), payload.get('test_password')]
+        if any(value and len(value) < MIN_REDACTABLE_LENGTH for value in credentials):
+            log.warning("Not caching exploration narrative: credentials too short to redact")
+            return
+        try:
+            self.backend.set(key, make_entry(
+                key,
+                redact_credentials(narrative, payload),
+                self.ttl,
+                metadata={'product_url': normalize_url(payload.get('product_url'))}
+            ))
+        except Exception as e:
+            log.error(f"Failed to store exploration narrative: {e}")
+
+
+_cache = None
+
+
+def get_exploration_cache(bucket, region=None):
+    """Return the process-wide exploration cache, or None if it is disabled"""
+    global _cache
+    if _cache is None:
+        backend = create_backend(EXPLORATION_CACHE_MODE, 'exploration', bucket=bucket, region=region)
+        if backend is None:
+            return None
+        _cache = ExplorationCache(backend)
+        log.info(f"Exploration cache enabled ({backend.name}, TTL {EXPLORATION_CACHE_TTL}s)")
+    return _cache
@@ -0,0 +1,209 @@
+"""
+Memoized LLM calls for the tool-less generation steps.
+
+Playwright script, voice script and product info generation are plain prompt -> text
+calls. Their responses are cached by a hash of model ID, system prompt and user prompt,
+so retries and regenerations with identical inputs return immediately. Each call checks out
+its own Agent: idle agents are pooled per (model, system prompt) and share one model client
+per model ID, so concurrent calls with the same prompt run in parallel. Every call's latency
+and token usage is recorded.
+
+Configuration via environment:
+    KIRBUK_LLM_CACHE            s3 | local | off (default: local)
+    KIRBUK_LLM_CACHE_TTL        seconds a response stays valid (default: 604800)
+    KIRBUK_LLM_CACHE_MAX_BYTES  size bound of the local cache (default: 256 MB)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cache_backends import create_backend, make_entry
+from log import get_logger
+from tracing import annotate, traced
+
+log = get_logger(__name__)
+
+LLM_CACHE_MODE = os.getenv("KIRBUK_LLM_CACHE", "local")
+LLM_CACHE_TTL = int(os.getenv("KIRBUK_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("KIRBUK_LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+MAX_CACHED_AGENTS = 16   # (model, system prompt) pairs with pooled agents
+MAX_IDLE_AGENTS = 4      # Idle agents kept per pair; busier pairs create more on demand
+
+# Bump to invalidate every cached response (e.g. after changing the response format)
+CACHE_KEY_VERSION = 1
+
+_agents = OrderedDict()  # (model, system prompt hash) -> idle agents
+_models = {}
+_agents_lock = threading.Lock()
+# Running totals per label - the process lives for many jobs, so single calls are not kept
+_call_stats = {}
+_calls_lock = threading.Lock()
+_backend = None
+_backend_ready = False
+_backend_lock = threading.Lock()
+_agent_factory = None
+
+
+def llm_cache_key(model_id, system_prompt, prompt):
+    """Return the sha256 cache key of an LLM call"""
+    material = json.dumps({
+        'version': CACHE_KEY_VERSION,
+        'model': model_id,
+        'system_prompt': system_prompt or '',
+        'prompt': prompt,
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def configure_cache(bucket=None, region=None):
+    """Create the response cache backend (call once at startup; later calls are ignored)"""
+    global _backend, _backend_ready
+    with _backend_lock:
+        if not _backend_ready:
+            _backend = create_backend(LLM_CACHE_MODE, 'llm', bucket=bucket, region=region,
+                                      max_bytes=LLM_CACHE_MAX_BYTES)
+            _backend_ready = True
+            if _backend:
+                log.info(f"LLM response cache enabled ({_backend.name}, TTL {LLM_CACHE_TTL}s)")
+    return _backend
+
+
+def _new_agent(model_id, system_prompt):
+    if _agent_factory:
+        return _agent_factory(model_id, system_prompt)
+    # strands is imported on first use; the startup pre-warm has usually loaded it
+    from strands import Agent
+    from strands.models import BedrockModel
+    with _agents_lock:
+        # The model (and its Bedrock client) is thread-safe and shared by all agents
+        model = _models.get(model_id)
+        if model is None:
+            model = _models[model_id] = BedrockModel(model_id=model_id)
+    if system_prompt:
+        return Agent(model=model, system_prompt=system_prompt)
+    return Agent(model=model)
+
+
+def _checkout_agent(model_id, system_prompt):
+    """Return (pool key, agent) for a call; the agent is used by this call only"""
+    key = (model_id, hashlib.sha256((system_prompt or '').encode('utf-8')).hexdigest())
+    with _agents_lock:
+        idle = _agents.get(key)
+        if idle:
+            _agents.move_to_end(key)
+            return key, idle.pop()
+    return key, _new_agent(model_id, system_prompt)
+
+
+def _release_agent(key, agent):
+    """Put an agent back into its pool once its call finished"""
+    # Each call is independent - drop the conversation
+    agent.messages = []
+    with _agents_lock:
+        idle = _agents.setdefault(key, [])
+        _agents.move_to_end(key)
+        if len(idle) < MAX_IDLE_AGENTS:
+            idle.append(agent)
+        while len(_agents) > MAX_CACHED_AGENTS:
+            _agents.popitem(last=False)
+
+
+def set_agent_factory(factory):
+    """Create agents with factory(model_id, system_prompt) instead of strands (None restores it)
+
+    Used by the offline benchmarks to answer with canned responses.
+    """
+    global _agent_factory
+    with _agents_lock:
+        _agent_factory = factory
+        _agents.clear()
+        _models.clear()
+
+
+def _usage(result):
+    """Return token usage of an agent result ({} if the SDK does not report it)"""
+    metrics = getattr(result, 'metrics', None)
+    usage = getattr(metrics, 'accumulated_usage', None) or {}
+    return {
+        'input_tokens': usage.get('inputTokens', 0),
+        'output_tokens': usage.get('outputTokens', 0),
+        'total_tokens': usage.get('totalTokens', 0),
+    }
+
+
+def _record_call(label, model_id, cached, latency, usage):
+    call = {
+        'label': label,
+        'model': model_id,
+        'cached': cached,
+        'latency_seconds': round(latency, 3),
+    }
+    call.update(usage)
+    with _calls_lock:
+        entry = _call_stats.setdefault(label, {
+            'calls': 0, 'cache_hits': 0, 'latency_seconds': 0.0,
+            'input_tokens': 0, 'output_tokens': 0, 'models': {},
+        })
+        entry['calls'] += 1
+        entry['cache_hits'] += int(cached)
+        entry['latency_seconds'] = round(entry['latency_seconds'] + latency, 3)
+        entry['input_tokens'] += usage.get('input_tokens', 0)
+        entry['output_tokens'] += usage.get('output_tokens', 0)
+        entry['models'][model_id] = entry['models'].get(model_id, 0) + 1
+    annotate(**call)
+    source = 'cache hit' if cached else f"{usage.get('input_tokens', 0)} in / {usage.get('output_tokens', 0)} out tokens"
+    log.info(f"LLM call '{label}' took {latency:.2f}s ({source})")
+
+
+@traced('llm')
+def complete(prompt, model_id, system_prompt=None, label='llm', use_cache=True):
+    """Run a single-turn LLM call and return the response text
+
+    Args:
+        prompt: User prompt
+        model_id: Bedrock model ID
+        system_prompt: Optional system prompt
+        label: Name used in logs and call statistics
+        use_cache: If False, always call the model (the fresh response is still stored)
+
+    Returns:
+        Response text
+    """
+    started = time.monotonic()
+    key = llm_cache_key(model_id, system_prompt, prompt)
+    backend = _backend
+
+    if backend and use_cache:
+        try:
+            entry = backend.get(key)
+        except Exception as e:
+            log.warning(f"LLM cache lookup failed: {e}")
+            entry = None
+        if entry is not None:
+            _record_call(label, model_id, True, time.monotonic() - started, {})
+            return entry['value']
+
+    pool_key, agent = _checkout_agent(model_id, system_prompt)
+    result = agent(prompt)
+    # An agent whose call failed may hold a broken conversation - it is not reused
+    _release_agent(pool_key, agent)
+    text = result.message.get('content', [{}])[0].get('text', str(result))
+    usage = _usage(result)
+    _record_call(label, model_id, False, time.monotonic() - started, usage)
+
+    if backend:
+        try:
+            backend.set(key, make_entry(key, text, LLM_CACHE_TTL, metadata={'label': label, 'model': model_id, **usage}))
+        except Exception as e:
+            log.error(f"Failed to store LLM response: {e}")
+    return text
+
+
+def llm_stats():
+    """Return per-label call counts, cache hits, latency and token totals of this process
+    (plus the number of calls per model)"""
+    with _calls_lock:
+        return {label: {**entry, 'models': dict(entry['models'])} for label, entry in _call_stats.items()}
@@ -0,0 +1,205 @@
+"""
+Structured, buffered logging for the agent.
+
+Every module logs through get_logger(__name__) instead of print(). Records are put on an
+in-memory queue by the calling thread and written by a background listener, so a large
+log line never stalls a pipeline stage on a slow stdout. Each record is one JSON object
+with level, logger, message, the fields bound to the current job (submission ID, set with
+bind_job() and inherited by the pipeline steps) and the keyword fields of the call:
+
+    log = get_logger(__name__)
+    log.info("Uploaded artifact", key=key, bytes=size)
+
+Strings longer than KIRBUK_LOG_MAX_FIELD characters are cut, so one runaway value cannot
+flood the log stream. Verbose sections (script listings, directory trees) use
+log.verbose(): they are logged for a sampled fraction of jobs and otherwise only at DEBUG.
+Large blobs such as the full Playwright output belong in S3 artifacts, not in the log.
+
+Environment:
+    KIRBUK_LOG_LEVEL                DEBUG | INFO | WARNING | ERROR (default: INFO)
+    KIRBUK_LOG_FORMAT               json | text (default: json)
+    KIRBUK_LOG_FILE                 write to this file instead of stdout
+    KIRBUK_LOG_MAX_FIELD            characters kept per message or field (default: 4000)
+    KIRBUK_LOG_VERBOSE_SAMPLE_RATE  fraction of jobs with verbose sections logged (default: 0.05)
+"""
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("KIRBUK_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("KIRBUK_LOG_FORMAT", "json").lower()
+LOG_FILE = os.getenv("KIRBUK_LOG_FILE")
+LOG_MAX_FIELD = int(os.getenv("KIRBUK_LOG_MAX_FIELD", "4000"))
+VERBOSE_SAMPLE_RATE = float(os.getenv("KIRBUK_LOG_VERBOSE_SAMPLE_RATE", "0.05"))
+
+ROOT_LOGGER = 'kirbuk'
+# Keyword arguments that belong to logging itself rather than to the record's fields
+_LOGGING_KWARGS = ('exc_info', 'stack_info', 'stacklevel', 'extra')
+
+_context = contextvars.ContextVar('kirbuk_log_context', default={})
+_verbose = contextvars.ContextVar('kirbuk_log_verbose', default=False)
+_listener = None
+_configure_lock = threading.Lock()
+
+
+def truncate(value, limit=None):
+    """Cut a string to the field size limit, noting how much was dropped"""
+    limit = limit or LOG_MAX_FIELD
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} more chars]"
+    return value
+
+
+def _cap(value):
+    """Apply the field size limit to a value and to the strings nested in it"""
+    if isinstance(value, str):
+        return truncate(value)
+    if isinstance(value, dict):
+        return {key: _cap(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_cap(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return truncate(str(value))
+
+
+def is_sampled(submission_id):
+    """Return True if the verbose sections of this job are logged (stable per submission)"""
+    if VERBOSE_SAMPLE_RATE >= 1:
+        return True
+    if not submission_id or VERBOSE_SAMPLE_RATE <= 0:
+        return False
+    bucket = int(hashlib.sha256(str(submission_id).encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < VERBOSE_SAMPLE_RATE
+
+
+def bind(**fields):
+    """Add fields to every record logged in this context (and the pipeline steps it runs)
+
+    Returns:
+        Token for unbind()
+    """
+    return _context.set({**_context.get(), **fields})
+
+
+def unbind(token):
+    _context.reset(token)
+
+
+def bind_job(submission_id):
+    """Bind the submission ID and decide whether this job's verbose sections are logged
+
+    Returns:
+        Token for unbind_job()
+    """
+    return bind(submission_id=submission_id), _verbose.set(is_sampled(submission_id))
+
+
+def unbind_job(token):
+    context_token, verbose_token = token
+    _verbose.reset(verbose_token)
+    _context.reset(context_token)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': truncate(record.getMessage()),
+        }
+        entry.update(getattr(record, 'context', {}))
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_text:
+            entry['exception'] = truncate(record.exc_text)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable lines for local runs: time, level, message and key=value fields"""
+
+    def format(self, record):
+        fields = {**getattr(record, 'context', {}), **getattr(record, 'fields', {})}
+        line = f"{self.formatTime(record)} {record.levelname:<7} {truncate(record.getMessage())}"
+        if fields:
+            line += '  ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += '\n' + truncate(record.exc_text)
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Captures the job context on the logging thread and keeps fields structured"""
+
+    def prepare(self, record):
+        record.context = _context.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JobLogger(logging.LoggerAdapter):
+    """Logger that takes structured fields as keyword arguments"""
+
+    def process(self, msg, kwargs):
+        fields = {key: _cap(kwargs.pop(key)) for key in list(kwargs) if key not in _LOGGING_KWARGS}
+        if fields:
+            kwargs['extra'] = {**kwargs.get('extra', {}), 'fields': fields}
+        return msg, kwargs
+
+    def verbose(self, msg, *args, **kwargs):
+        """Log a verbose section: at INFO for sampled jobs, otherwise only at DEBUG"""
+        level = logging.INFO if _verbose.get() else logging.DEBUG
+        self.log(level, msg, *args, **kwargs)
+
+
+def configure():
+    """Set up the queue, the listener and the output handler once per process"""
+    global _listener
+    with _configure_lock:
+        root = logging.getLogger(ROOT_LOGGER)
+        if root.handlers:
+            return
+        if LOG_FILE:
+            output = logging.FileHandler(LOG_FILE, encoding='utf-8')
+        else:
+            output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+
+        records = queue.SimpleQueue()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_QueueHandler(records))
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Write every queued record and stop the listener (registered to run at exit)"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name):
+    """Return the structured logger of a module (e.g. get_logger(__name__))"""
+    configure()
+    return JobLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"), {})
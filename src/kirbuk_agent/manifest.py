@@ -0,0 +1,121 @@
+"""
+Per-submission manifest describing pipeline progress and artifacts.
+
+The agent keeps one compact staging_area/<uuid>/manifest.json up to date with stage
+states and the size, ETag and timestamp of every artifact it writes. The web app's status
+endpoint reads only this object instead of probing every artifact in S3.
+"""
+import json
+import threading
+from datetime import datetime, timezone
+
+from aws_clients import get_client
+from log import get_logger
+
+log = get_logger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def utc_now():
+    """Return the current UTC time as an ISO 8601 string"""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class SubmissionManifest:
+    """In-memory manifest of one submission, written through to S3 on every change"""
+
+    def __init__(self, submission_id, bucket, prefix, region=None):
+        self.submission_id = submission_id
+        self.bucket = bucket
+        self.key = f"{prefix}/{submission_id}/{MANIFEST_FILENAME}"
+        self.region = region
+        self._lock = threading.Lock()
+        now = utc_now()
+        self.data = {
+            'submission_id': submission_id,
+            'revision': 0,
+            'status': 'processing',
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            'stages': {},
+            'artifacts': {},
+        }
+
+    def record_stage(self, stage, state):
+        """Record a pipeline stage transition (running, completed, failed, skipped, cancelled)"""
+        with self._lock:
+            self.data['stages'][stage] = {'state': state, 'updated_at': utc_now()}
+            self._write()
+
+    def record_artifact(self, name, key, size=None, etag=None, content_type=None, **extra):
+        """Record an artifact written to S3
+
+        Args:
+            name: Artifact name (e.g. 'script', 'video')
+            key: S3 key of the artifact
+            size: Size in bytes
+            etag: S3 ETag of the stored object
+            content_type: MIME type of the artifact
+            **extra: Additional fields stored with the artifact (e.g. final=True)
+        """
+        with self._lock:
+            entry = {
+                'key': key,
+                'size': size,
+                'etag': etag.strip('"') if etag else None,
+                'content_type': content_type,
+                'updated_at': utc_now(),
+            }
+            entry.update(extra)
+            self.data['artifacts'][name] = entry
+            self._write()
+
+    def set_status(self, status, error=None):
+        """Set the overall submission status (processing, completed, failed)"""
+        with self._lock:
+            self.data['status'] = status
+            self.data['error'] = error
+            self._write()
+
+    def _write(self):
+        """Upload the manifest (caller holds the lock so writes stay in order)"""
+        self.data['revision'] += 1
+        self.data['updated_at'] = utc_now()
+        try:
+            get_client('s3', self.region).put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=json.dumps(self.data, indent=2),
+                ContentType='application/json',
+                CacheControl='no-cache'
+            )
+        except Exception as e:
+            # The manifest is advisory - never fail the job because of it
+            log.error(f"Failed to write manifest {self.key}: {e}")
+
+
+def open_manifest(submission_id, bucket, prefix, region=None):
+    """Create (or return the existing) manifest of a submission"""
+    with _manifests_lock:
+        manifest = _manifests.get(submission_id)
+        if manifest is None:
+            manifest = SubmissionManifest(submission_id, bucket, prefix, region)
+            _manifests[submission_id] = manifest
+        return manifest
+
+
+def get_manifest(submission_id):
+    """Return the open manifest of a submission, or None"""
+    with _manifests_lock:
+        return _manifests.get(submission_id)
+
+
+def close_manifest(submission_id):
+    """Forget the in-memory manifest of a finished submission"""
+    with _manifests_lock:
+        _manifests.pop(submission_id, None)
@@ -0,0 +1,183 @@
+"""
+Media metadata for every file the pipeline touches.
+
+probe() runs ffprobe once per file and returns its duration, container format and stream
+layout (codec, resolution, sample rate). Results are cached by file identity (device and
+inode, so moving a file into the job workspace keeps its entry), modification time and size:
+a file that is measured again is not probed again, and a rewritten file is.
+
+FFmpeg stages already know the duration of what they wrote: their final progress line
+("time=00:02:03.45") is parsed by duration_from_ffmpeg_log() and stored with
+record_duration(), so duration() can answer without spawning ffprobe at all.
+"""
+import json
+import os
+import re
+import subprocess
+import threading
+from collections import OrderedDict
+
+from tracing import span
+
+PROBE_TIMEOUT = 30
+MAX_CACHED_FILES = 256
+
+FFMPEG_TIME_PATTERN = re.compile(r'time=\s*(-?\d+):(\d{2}):(\d{2}(?:\.\d+)?)')
+
+
+class MediaProbeError(Exception):
+    """Raised when a media file cannot be probed or has no usable duration"""
+
+
+_probes = OrderedDict()
+_durations = OrderedDict()
+_lock = threading.Lock()
+_stats = {'probes': 0, 'hits': 0, 'recorded': 0}
+
+
+def _cache_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise MediaProbeError(f"Cannot probe {path}: {e}")
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _remember(cache, key, value):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > MAX_CACHED_FILES:
+        cache.popitem(last=False)
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stream_info(stream):
+    info = {
+        'index': stream.get('index'),
+        'type': stream.get('codec_type'),
+        'codec': stream.get('codec_name'),
+        'duration': _float(stream.get('duration')),
+    }
+    if info['type'] == 'video':
+        info['width'] = stream.get('width')
+        info['height'] = stream.get('height')
+        info['frame_rate'] = stream.get('avg_frame_rate') or stream.get('r_frame_rate')
+        info['pix_fmt'] = stream.get('pix_fmt')
+    elif info['type'] == 'audio':
+        info['sample_rate'] = int(stream['sample_rate']) if stream.get('sample_rate') else None
+        info['channels'] = stream.get('channels')
+    return info
+
+
+def parse_probe(path, data):
+    """Turn ffprobe's JSON output into a media info dictionary
+
+    Raises:
+        MediaProbeError: If neither the container nor a stream reports a duration
+    """
+    fmt = data.get('format', {})
+    streams = [_stream_info(stream) for stream in data.get('streams', [])]
+    duration = _float(fmt.get('duration'))
+    if duration is None:
+        # Some muxers only write stream durations
+        stream_durations = [stream['duration'] for stream in streams if stream['duration'] is not None]
+        duration = max(stream_durations) if stream_durations else None
+    if duration is None:
+        raise MediaProbeError(f"{path} has no duration (format: {fmt.get('format_name')})")
+
+    video = next((stream for stream in streams if stream['type'] == 'video'), None)
+    audio = next((stream for stream in streams if stream['type'] == 'audio'), None)
+    return {
+        'path': path,
+        'format': fmt.get('format_name'),
+        'duration': duration,
+        'size': int(fmt['size']) if fmt.get('size') else os.path.getsize(path),
+        'bit_rate': int(fmt['bit_rate']) if fmt.get('bit_rate') else None,
+        'streams': streams,
+        'video': video,
+        'audio': audio,
+    }
+
+
+def probe(path):
+    """Return duration, format and streams of a media file (cached per file version)
+
+    Raises:
+        MediaProbeError: If the file is missing, ffprobe fails or no duration is reported
+    """
+    key = _cache_key(path)
+    with _lock:
+        if key in _probes:
+            _stats['hits'] += 1
+            _probes.move_to_end(key)
+            return _probes[key]
+
+    try:
+        with span('ffprobe', file=os.path.basename(path), bytes=key[3]):
+            result = subprocess.run(
+                ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path],
+                capture_output=True, text=True, timeout=PROBE_TIMEOUT
+            )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise MediaProbeError(f"ffprobe could not run on {path}: {e}")
+    if result.returncode != 0:
+        raise MediaProbeError(f"ffprobe failed on {path}: {result.stderr.strip()}")
+    try:
+        data = json.loads(result.stdout)
+    except ValueError as e:
+        raise MediaProbeError(f"ffprobe returned invalid JSON for {path}: {e}")
+    info = parse_probe(path, data)
+
+    with _lock:
+        _stats['probes'] += 1
+        _remember(_probes, key, info)
+        _remember(_durations, key, info['duration'])
+    return info
+
+
+def duration(path):
+    """Return the duration of a media file in seconds
+
+    Uses a duration recorded by the FFmpeg stage that wrote the file when there is one,
+    and probes the file otherwise.
+
+    Raises:
+        MediaProbeError: If the duration cannot be determined
+    """
+    key = _cache_key(path)
+    with _lock:
+        if key in _durations:
+            _stats['hits'] += 1
+            return _durations[key]
+    return probe(path)['duration']
+
+
+def record_duration(path, seconds):
+    """Remember the duration of a file an FFmpeg stage just wrote"""
+    if seconds is None:
+        return
+    key = _cache_key(path)
+    with _lock:
+        _stats['recorded'] += 1
+        _remember(_durations, key, seconds)
+
+
+def duration_from_ffmpeg_log(stderr):
+    """Return the output duration from the last progress line of an FFmpeg run, or None"""
+    matches = FFMPEG_TIME_PATTERN.findall(stderr or '')
+    if not matches:
+        return None
+    hours, minutes, seconds = matches[-1]
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def media_stats():
+    """Return probe, cache hit and recorded-duration counters"""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,235 @@
+"""
+Small declarative step graph for the video generation pipeline.
+
+Each step names the values it consumes and produces. The runner starts every step whose
+inputs are available on a thread pool, so independent steps (uploads, slide rendering,
+product info extraction) overlap with the long ones (recording, narration).
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import ExitStack
+
+from log import get_logger
+
+log = get_logger(__name__)
+
+_step_hooks = []
+
+
+def add_step_hook(hook):
+    """Wrap every step of every runner in hook(step_name), a context manager factory
+
+    The context is entered on the thread that runs the step, just around the step function.
+    """
+    _step_hooks.append(hook)
+
+
+def remove_step_hook(hook):
+    if hook in _step_hooks:
+        _step_hooks.remove(hook)
+
+
+class Step:
+    """A single pipeline step with explicit inputs and outputs"""
+
+    def __init__(self, name, func, inputs=(), outputs=(), optional_inputs=(),
+                 critical=True, defaults=None):
+        """Declare a step
+
+        Args:
+            name: Unique step name (used for timings and logs)
+            func: Callable invoked with the inputs as keyword arguments. It returns the single
+                output value, a tuple of values matching `outputs`, or nothing
+            inputs: Names of values the step requires. If one is unavailable the step is skipped
+            outputs: Names of values the step produces
+            optional_inputs: Names of values passed as None when their producer failed or was skipped
+            critical: If True, a failure of this step fails the whole run
+            defaults: Output values to publish when a non-critical step fails or is skipped.
+                Outputs without a default become unavailable
+        """
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.optional_inputs = tuple(optional_inputs)
+        self.critical = critical
+        self.defaults = defaults or {}
+
+    def __repr__(self):
+        return f"Step({self.name!r})"
+
+
+class StepFailed(Exception):
+    """Raised when a critical step fails"""
+
+    def __init__(self, step_name, error):
+        super().__init__(f"Step '{step_name}' failed: {error}")
+        self.step_name = step_name
+        self.error = error
+
+
+class PipelineRunner:
+    """Runs step graphs on a thread pool and records per-step timings"""
+
+    def __init__(self, max_workers=4, on_error=None, on_transition=None):
+        """Create a runner
+
+        Args:
+            max_workers: Maximum number of steps running at the same time
+            on_error: Optional callback(step, exception) for failed non-critical steps
+            on_transition: Optional callback(step_name, state) for every state change
+                (running, completed, failed, skipped, cancelled)
+        """
+        self.max_workers = max_workers
+        self.on_error = on_error
+        self.on_transition = on_transition
+        self.timings = {}
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def run(self, steps, values):
+        """Run a step graph until every step has finished, failed or been skipped
+
+        Args:
+            steps: List of Step objects
+            values: Initial values (e.g. payload fields) available to every step
+
+        Returns:
+            Dictionary with the initial values plus every produced output
+        """
+        values = dict(values)
+        self._validate(steps, values)
+
+        unavailable = set()
+        pending = {step.name: step for step in steps}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pipeline') as executor:
+            critical_error = None
+
+            while pending or running:
+                if critical_error is None:
+                    # Skipping a step can make more steps skippable, so scan until nothing changes
+                    changed = True
+                    while changed:
+                        changed = False
+                        for step in list(pending.values()):
+                            needed = step.inputs + step.optional_inputs
+                            if any(name in unavailable for name in step.inputs):
+                                del pending[step.name]
+                                self._skip(step, values, unavailable)
+                                changed = True
+                            elif all(name in values or name in unavailable for name in needed):
+                                del pending[step.name]
+                                kwargs = {name: values[name] for name in step.inputs}
+                                kwargs.update({name: values.get(name) for name in step.optional_inputs})
+                                # Steps run in a copy of the caller's context, so context variables
+                                # (e.g. the job trace) reach the pool threads
+                                context = contextvars.copy_context()
+                                running[executor.submit(context.run, self._execute, step, kwargs)] = step
+                else:
+                    # A critical step failed - do not start anything new
+                    for step in pending.values():
+                        self._record(step.name, 'cancelled', 0.0, 0.0)
+                    pending.clear()
+
+                if not running:
+                    if pending:
+                        raise RuntimeError(f"Pipeline deadlock, unresolved steps: {sorted(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        if step.critical:
+                            critical_error = critical_error or StepFailed(step.name, error)
+                        else:
+                            if self.on_error:
+                                self.on_error(step, error)
+                            self._publish_defaults(step, values, unavailable)
+                        continue
+                    self._publish(step, result, values)
+
+            if critical_error is not None:
+                raise critical_error
+
+        return values
+
+    def _validate(self, steps, values):
+        """Check that names are unique and every input has a producer"""
+        produced = set(values)
+        names = set()
+        for step in steps:
+            if step.name in names:
+                raise ValueError(f"Duplicate step name: {step.name}")
+            names.add(step.name)
+            produced.update(step.outputs)
+        for step in steps:
+            missing = [name for name in step.inputs + step.optional_inputs if name not in produced]
+            if missing:
+                raise ValueError(f"Step '{step.name}' has inputs nobody produces: {missing}")
+
+    def _execute(self, step, kwargs):
+        """Run one step and record its timing"""
+        started = time.monotonic()
+        status = 'failed'
+        self._transition(step.name, 'running')
+        try:
+            with ExitStack() as stack:
+                for hook in list(_step_hooks):
+                    stack.enter_context(hook(step.name))
+                result = step.func(**kwargs)
+            status = 'completed'
+            return result
+        finally:
+            self._record(step.name, status, started - self._started, time.monotonic() - started)
+
+    def _record(self, name, status, offset, duration):
+        with self._lock:
+            self.timings[name] = {
+                'status': status,
+                'started_at': round(offset, 3),
+                'duration_seconds': round(duration, 3),
+            }
+        self._transition(name, status)
+
+    def _transition(self, name, state):
+        if self.on_transition:
+            try:
+                self.on_transition(name, state)
+            except Exception as e:
+                log.warning(f"Transition callback failed for '{name}': {e}")
+
+    def _publish(self, step, result, values):
+        """Store the outputs of a finished step"""
+        if len(step.outputs) == 1:
+            values[step.outputs[0]] = result
+        elif step.outputs:
+            if not isinstance(result, tuple) or len(result) != len(step.outputs):
+                raise ValueError(f"Step '{step.name}' must return {len(step.outputs)} values")
+            values.update(zip(step.outputs, result))
+
+    def _publish_defaults(self, step, values, unavailable):
+        """Publish default outputs of a failed/skipped step and mark the rest unavailable"""
+        for name in step.outputs:
+            if name in step.defaults:
+                values[name] = step.defaults[name]
+            else:
+                unavailable.add(name)
+
+    def _skip(self, step, values, unavailable):
+        missing = [name for name in step.inputs if name in unavailable]
+        log.warning(f"Skipping step '{step.name}' (unavailable inputs: {', '.join(missing)})")
+        self._record(step.name, 'skipped', time.monotonic() - self._started, 0.0)
+        self._publish_defaults(step, values, unavailable)
+
+    def log_summary(self):
+        """Log the per-step timings ordered by start time as one record"""
+        steps = dict(sorted(self.timings.items(), key=lambda item: item[1]['started_at']))
+        log.info("Pipeline timings", steps=steps, total_seconds=round(time.monotonic() - self._started, 3))
+
@@ -0,0 +1,296 @@
+"""
+Long-lived Playwright worker process used by browser_pool.
+
+The worker imports Playwright and launches Chromium once, then runs generated scripts
+against that browser. Each run gets its own browser context (fresh cookies, storage and
+video recording), so attempts are isolated but cost seconds instead of a cold start.
+
+Generated scripts define an entrypoint instead of launching a browser, either a single
+coroutine or a list of checkpointed segments:
+
+    async def run(context, page):
+        ...
+
+    async def open_homepage(page, log):
+        log("Navigating to homepage")
+        ...
+
+    SEGMENTS = [open_homepage, show_pricing, ...]
+
+Each request says whether to record headless or headed on an X display (see recording.py
+in the agent). The runner keeps one browser per mode, launched on first use through
+launch_browser(), so a fallback from headless to Xvfb does not cost a new runner.
+
+A segment that fails is retried from the URL it started on and skipped if it keeps
+failing, so a flaky selector costs one segment instead of the whole recording. The video
+intervals of failed attempts are reported in segments.json for the agent to cut out, and
+the timestamps printed by log() are shifted to match the cut video.
+
+Protocol: one JSON request per line on stdin, one JSON response per line on the file
+descriptor given as the first argument (stdout stays free for logs).
+"""
+import asyncio
+import contextlib
+import inspect
+import io
+import json
+import os
+import sys
+import time
+import traceback
+
+from playwright.async_api import async_playwright
+
+VIEWPORT = {'width': 1280, 'height': 720}
+CONTEXT_OPTIONS = {
+    'viewport': VIEWPORT,
+    'record_video_size': VIEWPORT,
+    'locale': 'en-US',
+    'extra_http_headers': {'Accept-Language': 'en-US,en;q=0.9'},
+}
+BROWSER_ARGS = ['--no-sandbox', '--disable-dev-shm-usage']
+# Headless Chromium announces itself as 'HeadlessChrome', which some sites block or serve
+# differently; headless runs use the user agent of the headed browser instead
+HEADED_USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                     "Chrome/{version} Safari/537.36")
+SEGMENT_ATTEMPTS = 2
+SEGMENT_TIMEOUT = 180
+SEGMENT_REPORT = 'segments.json'
+
+
+def default_headless():
+    """Mode of the first browser: headless in headless recording mode or without a display"""
+    return os.environ.get('KIRBUK_RECORDING_MODE') == 'headless' or not os.environ.get('DISPLAY')
+
+
+async def launch_browser(playwright, headless, display=None):
+    """Launch Chromium for recording, headless or headed on an X display
+
+    Headless runs use Chromium's new headless mode (the full 'chromium' channel instead of
+    the headless shell), which renders pages like the headed browser does.
+
+    Returns:
+        Tuple (browser, context options for the recordings)
+    """
+    if headless:
+        browser = await playwright.chromium.launch(headless=True, channel='chromium', args=BROWSER_ARGS)
+        return browser, {**CONTEXT_OPTIONS, 'user_agent': HEADED_USER_AGENT.format(version=browser.version)}
+    env = {**os.environ, 'DISPLAY': display or os.environ.get('DISPLAY', '')}
+    browser = await playwright.chromium.launch(headless=False, args=BROWSER_ARGS, env=env)
+    return browser, CONTEXT_OPTIONS
+
+
+class Browsers:
+    """The runner's browsers, one per recording mode, launched on first use"""
+
+    def __init__(self, playwright):
+        self.playwright = playwright
+        self._browsers = {}
+
+    async def get(self, headless, display=None):
+        """Return (browser, context options) for a mode, relaunching a browser that crashed"""
+        if not headless and not (display or os.environ.get('DISPLAY')):
+            print("No X display for a headed run - recording headless", file=sys.stderr)
+            headless = True
+        key = 'headless' if headless else (display or os.environ.get('DISPLAY'))
+        entry = self._browsers.get(key)
+        if entry is None or not entry[0].is_connected():
+            entry = await launch_browser(self.playwright, headless, display)
+            self._browsers[key] = entry
+        return entry
+
+    async def close(self):
+        for browser, _ in self._browsers.values():
+            await browser.close()
+
+
+def load_script(script_path):
+    """Execute a generated script as a fresh module and return its namespace"""
+    with open(script_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    namespace = {'__name__': 'kirbuk_generated_script', '__file__': script_path}
+    exec(compile(source, script_path, 'exec'), namespace)
+    return namespace
+
+
+def load_entrypoint(namespace):
+    """Return the script's run() coroutine function"""
+    run = namespace.get('run')
+    if not inspect.iscoroutinefunction(run):
+        raise ValueError("Script does not define 'async def run(context, page)' or SEGMENTS")
+    return run
+
+
+def load_segments(namespace):
+    """Return the script's SEGMENTS as (name, coroutine function) pairs, or None"""
+    segments = namespace.get('SEGMENTS')
+    if segments is None:
+        return None
+    if not segments or not all(inspect.iscoroutinefunction(segment) for segment in segments):
+        raise ValueError("SEGMENTS must be a non-empty list of 'async def segment(page, log)' functions")
+    return [(segment.__name__, segment) for segment in segments]
+
+
+def format_timestamp(seconds):
+    seconds = int(max(0, seconds))
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class SegmentLog:
+    """Collects timestamped log lines of one segment attempt in video time"""
+
+    def __init__(self, video_started):
+        self.video_started = video_started
+        self.lines = []
+
+    def __call__(self, message):
+        self.lines.append((time.monotonic() - self.video_started, str(message)))
+
+
+def shift_for_cuts(seconds, cuts):
+    """Map a time in the raw recording to the recording with the cuts removed"""
+    removed = 0.0
+    for start, end in cuts:
+        if seconds >= end:
+            removed += end - start
+        elif seconds > start:
+            removed += seconds - start
+    return seconds - removed
+
+
+async def run_segments(page, segments, video_started, deadline, segment_timeout):
+    """Run segments one by one, retrying or skipping the ones that fail
+
+    Returns:
+        Tuple (report, stdout lines) - the report lists every segment's status and the
+        intervals of the raw recording to cut out
+    """
+    report = {'segments': [], 'cuts': []}
+    kept = []
+    for index, (name, segment) in enumerate(segments, 1):
+        start_url = page.url
+        entry = {'name': name, 'status': 'skipped', 'attempts': 0}
+        for attempt in range(1, SEGMENT_ATTEMPTS + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"Segment {index} '{name}': no time left, skipping", file=sys.stderr)
+                break
+            attempt_started = time.monotonic() - video_started
+            log = SegmentLog(video_started)
+            entry['attempts'] = attempt
+            try:
+                await asyncio.wait_for(segment(page, log), timeout=min(segment_timeout, remaining))
+            except Exception:
+                print(f"Segment {index} '{name}' failed (attempt {attempt}/{SEGMENT_ATTEMPTS}):",
+                      file=sys.stderr)
+                traceback.print_exc()
+                # Return to where the segment started; the failed attempt and the
+                # recovery navigation are cut from the recording
+                if start_url and start_url != 'about:blank':
+                    try:
+                        await page.goto(start_url, wait_until='load', timeout=30000)
+                    except Exception:
+                        traceback.print_exc()
+                report['cuts'].append([round(attempt_started, 3),
+                                       round(time.monotonic() - video_started, 3)])
+                continue
+            entry['status'] = 'ok'
+            kept.extend(log.lines)
+            break
+        if entry['status'] != 'ok':
+            kept.append((time.monotonic() - video_started, f"[skipped segment '{name}' - not in the video]"))
+        report['segments'].append(entry)
+
+    lines = [f"{format_timestamp(shift_for_cuts(seconds, report['cuts']))} - {message}"
+             for seconds, message in kept]
+    return report, lines
+
+
+async def run_job(browsers, request):
+    """Run one script attempt in a new context and save its recording as output.webm"""
+    cwd = request['cwd']
+    os.chdir(cwd)
+    output_path = os.path.join(cwd, 'output.webm')
+    report_path = os.path.join(cwd, SEGMENT_REPORT)
+    for stale in (output_path, report_path):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    returncode = 0
+    deadline = time.monotonic() + request['timeout']
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        headless = request.get('headless')
+        browser, context_options = await browsers.get(default_headless() if headless is None else headless,
+                                                      request.get('display'))
+        context = await browser.new_context(
+            record_video_dir=os.path.join(cwd, 'videos', f"attempt_{request.get('attempt', 0)}"),
+            **context_options
+        )
+        page = await context.new_page()
+        video_started = time.monotonic()
+        try:
+            namespace = load_script(request['script_path'])
+            segments = load_segments(namespace)
+            if segments is not None:
+                report, lines = await run_segments(
+                    page, segments, video_started, deadline,
+                    request.get('segment_timeout', SEGMENT_TIMEOUT)
+                )
+                for line in lines:
+                    print(line)
+                with open(report_path, 'w') as f:
+                    json.dump(report, f, indent=2)
+                if not any(entry['status'] == 'ok' for entry in report['segments']):
+                    print("Every segment failed", file=sys.stderr)
+                    returncode = 1
+            else:
+                run = load_entrypoint(namespace)
+                arguments = (page,) if len(inspect.signature(run).parameters) == 1 else (context, page)
+                await asyncio.wait_for(run(*arguments), timeout=request['timeout'])
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            video = page.video
+            await context.close()
+            if video:
+                try:
+                    await video.save_as(output_path)
+                except Exception:
+                    traceback.print_exc()
+    return {'returncode': returncode, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+async def main(response_fd):
+    responses = os.fdopen(response_fd, 'w', buffering=1)
+
+    def respond(message):
+        responses.write(json.dumps(message) + '\n')
+
+    started = time.monotonic()
+    async with async_playwright() as playwright:
+        browsers = Browsers(playwright)
+        await browsers.get(default_headless())
+        respond({'ready': True, 'launch_seconds': round(time.monotonic() - started, 3)})
+
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                break
+            request = json.loads(line)
+            job_started = time.monotonic()
+            try:
+                response = await run_job(browsers, request)
+            except Exception:
+                response = {'returncode': 1, 'stdout': '', 'stderr': traceback.format_exc()}
+            response['seconds'] = round(time.monotonic() - job_started, 3)
+            respond(response)
+
+        await browsers.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1])))
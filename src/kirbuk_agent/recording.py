@@ -0,0 +1,165 @@
+"""
+Recording mode of the Playwright runs: headless Chromium, or headed on an Xvfb display.
+
+Playwright records video from headless Chromium as well, so the Xvfb server is only needed
+for sites that misbehave without a real display. In headless mode the runner launches
+Chromium through its controlled launch wrapper (see playwright_runner.launch_browser) and a
+script that fails headless is retried headed: Xvfb is started on first use by
+ensure_display(). Only if the headed retry then succeeds is the site recorded headed from
+the start for the next KIRBUK_HEADED_HOST_TTL seconds (at most MAX_HEADED_HOSTS sites are
+remembered). In xvfb mode every run is headed on the display start.sh started, as before.
+
+Scripts that launch their own browser (no SEGMENTS or run() entrypoint) always get the
+display.
+
+Configuration via environment:
+    KIRBUK_RECORDING_MODE   headless | xvfb (default: xvfb)
+    KIRBUK_HEADED_HOST_TTL  seconds a site that needed a display is recorded headed (default: 86400)
+    DISPLAY                 X display Xvfb runs on (default: :99)
+"""
+import atexit
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from log import get_logger
+
+log = get_logger(__name__)
+
+RECORDING_MODES = ('headless', 'xvfb')
+RECORDING_MODE = os.getenv("KIRBUK_RECORDING_MODE", "xvfb").lower()
+XVFB_DISPLAY = os.getenv("DISPLAY") or ':99'
+XVFB_SCREEN = '1280x720x24'
+XVFB_START_TIMEOUT = 5
+HEADED_HOST_TTL = int(os.getenv("KIRBUK_HEADED_HOST_TTL", str(24 * 3600)))
+MAX_HEADED_HOSTS = 256
+
+if RECORDING_MODE not in RECORDING_MODES:
+    log.warning(f"Unknown KIRBUK_RECORDING_MODE '{RECORDING_MODE}' - using xvfb")
+    RECORDING_MODE = 'xvfb'
+
+_xvfb = None
+_xvfb_lock = threading.Lock()
+# Hosts that failed headless but recorded fine headed -> when they stop being recorded
+# headed first (LRU, like the other per-process caches)
+_headed_hosts = OrderedDict()
+_stats = {'headless_attempts': 0, 'xvfb_attempts': 0, 'fallbacks': 0, 'headed_successes': 0, 'xvfb_starts': 0}
+_stats_lock = threading.Lock()
+
+
+def display_ready(display=XVFB_DISPLAY):
+    """Return True if an X server accepts connections on the display"""
+    number = display.lstrip(':').split('.')[0]
+    socket_path = f"/tmp/.X11-unix/X{number}"
+    if os.path.exists(socket_path):
+        return True
+    # Xvfb runs with -nolisten unix, which leaves only the abstract socket
+    try:
+        with open('/proc/net/unix') as f:
+            return any(line.rstrip().endswith(f"@{socket_path}") for line in f)
+    except OSError:
+        return False
+
+
+def ensure_display():
+    """Return the X display for headed runs, starting Xvfb on first use
+
+    Returns:
+        The display (e.g. ':99'), or None if there is no X server and Xvfb is not installed
+    """
+    global _xvfb
+    with _xvfb_lock:
+        if display_ready():
+            return XVFB_DISPLAY
+        if not shutil.which('Xvfb'):
+            log.warning("No X display and Xvfb is not installed - recording headless")
+            return None
+
+        started = time.monotonic()
+        _xvfb = subprocess.Popen(
+            ['Xvfb', XVFB_DISPLAY, '-screen', '0', XVFB_SCREEN, '-ac', '-nolisten', 'tcp', '-nolisten', 'unix'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        atexit.register(_stop_xvfb)
+        while not display_ready():
+            if _xvfb.poll() is not None or time.monotonic() - started > XVFB_START_TIMEOUT:
+                log.warning(f"Xvfb did not start on {XVFB_DISPLAY} - recording headless")
+                _stop_xvfb()
+                return None
+            time.sleep(0.05)
+
+        os.environ['DISPLAY'] = XVFB_DISPLAY
+        with _stats_lock:
+            _stats['xvfb_starts'] += 1
+        log.info(f"Started Xvfb on {XVFB_DISPLAY} in {time.monotonic() - started:.2f}s")
+        return XVFB_DISPLAY
+
+
+def _stop_xvfb():
+    global _xvfb
+    if _xvfb is not None and _xvfb.poll() is None:
+        _xvfb.terminate()
+        try:
+            _xvfb.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            _xvfb.kill()
+    _xvfb = None
+
+
+def _host(url):
+    return urlparse(url or '').hostname or ''
+
+
+def starts_headless(url, mode=None):
+    """Return True if recording a site should start headless"""
+    if (mode or RECORDING_MODE) != 'headless':
+        return False
+    host = _host(url)
+    with _stats_lock:
+        expires_at = _headed_hosts.get(host)
+        if expires_at is None:
+            return True
+        if expires_at <= time.monotonic():
+            del _headed_hosts[host]
+            return True
+        _headed_hosts.move_to_end(host)
+        return False
+
+
+def record_attempt(headless):
+    with _stats_lock:
+        _stats['headless_attempts' if headless else 'xvfb_attempts'] += 1
+
+
+def record_headless_failure(url):
+    """Count a headless attempt that failed and is retried headed"""
+    with _stats_lock:
+        _stats['fallbacks'] += 1
+
+
+def record_headed_success(url):
+    """Remember that a site recorded fine headed after failing headless
+
+    Failures that have nothing to do with the display fail headed as well and are not
+    remembered, so the site keeps starting headless.
+    """
+    host = _host(url)
+    with _stats_lock:
+        _stats['headed_successes'] += 1
+        if not host:
+            return
+        _headed_hosts[host] = time.monotonic() + HEADED_HOST_TTL
+        _headed_hosts.move_to_end(host)
+        while len(_headed_hosts) > MAX_HEADED_HOSTS:
+            _headed_hosts.popitem(last=False)
+
+
+def recording_stats():
+    """Return attempt counts per mode, headless-to-Xvfb fallbacks (and how many of them
+    recorded fine headed) and lazy Xvfb starts"""
+    with _stats_lock:
+        return {**_stats, 'mode': RECORDING_MODE, 'headed_hosts': len(_headed_hosts)}
@@ -0,0 +1,285 @@
+"""
+Parallel narration synthesis with Amazon Polly.
+
+The sanitized SSML is split at paragraph and <break> boundaries into chunks that are
+synthesized concurrently with the synchronous synthesize_speech API, so the narration takes
+about as long as its longest chunk instead of the whole script. Each chunk's audio is cached
+by a hash of its SSML and the voice settings, so a regenerated script only pays for the
+chunks that changed. The chunks are joined with FFmpeg's concat demuxer and the offset of
+every chunk is kept for later synchronization.
+
+Configuration via environment:
+    KIRBUK_TTS_CONCURRENCY      chunks synthesized in parallel (default: 4)
+    KIRBUK_TTS_MAX_CHUNK_CHARS  target SSML size of a chunk (default: 1500)
+    KIRBUK_TTS_CACHE            s3 | local | off (default: s3)
+    KIRBUK_TTS_CACHE_MAX_BYTES  size bound of the local chunk audio (default: 512 MB)
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import media_info
+from aws_clients import get_client
+from cache_backends import CACHE_DIR, CACHE_PREFIX, evict_least_recently_used
+from log import get_logger
+from tracing import annotate, traced
+
+log = get_logger(__name__)
+
+TTS_CONCURRENCY = int(os.getenv("KIRBUK_TTS_CONCURRENCY", "4"))
+TTS_MAX_CHUNK_CHARS = int(os.getenv("KIRBUK_TTS_MAX_CHUNK_CHARS", "1500"))
+TTS_CACHE_MODE = os.getenv("KIRBUK_TTS_CACHE", "s3").lower()
+TTS_CACHE_MAX_BYTES = int(os.getenv("KIRBUK_TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# synthesize_speech rejects SSML above 6000 characters (3000 billed)
+POLLY_MAX_SSML_CHARS = 6000
+
+VOICE_ID = 'Matthew'
+ENGINE = 'generative'
+OUTPUT_FORMAT = 'mp3'
+SAMPLE_RATE = '24000'
+
+TAG_PATTERN = re.compile(r'<(/?)([A-Za-z][\w:.-]*)[^>]*?(/?)>')
+
+
+class ChunkTooLong(Exception):
+    """Raised when the SSML cannot be split into chunks synthesize_speech accepts"""
+
+
+def speak_body(ssml):
+    """Return the content between <speak> and </speak> (without the XML declaration)"""
+    ssml = re.sub(r'<\?xml[^>]*\?>', '', ssml).strip()
+    match = re.search(r'<speak[^>]*>(.*)</speak>', ssml, flags=re.DOTALL | re.IGNORECASE)
+    return (match.group(1) if match else ssml).strip()
+
+
+def split_segments(body):
+    """Split SSML content into top-level segments ending at </p> or <break/>
+
+    Boundaries inside an open element (e.g. a break inside a paragraph) are ignored so
+    every segment stays well-formed on its own.
+    """
+    segments = []
+    depth = 0
+    start = 0
+    for match in TAG_PATTERN.finditer(body):
+        closing, name, self_closing = match.group(1), match.group(2).lower(), match.group(3)
+        if self_closing:
+            boundary = name == 'break' and depth == 0
+        elif closing:
+            depth = max(0, depth - 1)
+            boundary = depth == 0 and name == 'p'
+        else:
+            depth += 1
+            boundary = False
+        if boundary:
+            segments.append(body[start:match.end()])
+            start = match.end()
+    segments.append(body[start:])
+    return [segment for segment in segments if segment.strip()]
+
+
+def split_ssml(ssml, max_chars=TTS_MAX_CHUNK_CHARS):
+    """Split an SSML document into <speak> chunks of about max_chars characters
+
+    Raises:
+        ChunkTooLong: If a single segment exceeds the synthesize_speech limit
+    """
+    chunks = []
+    current = ''
+    for segment in split_segments(speak_body(ssml)):
+        # Pauses without text stay with the preceding speech - a silent chunk is rejected
+        has_text = TAG_PATTERN.sub('', segment).strip()
+        if has_text and current and len(current) + len(segment) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += segment
+    if current.strip():
+        chunks.append(current)
+
+    chunks = [f"<speak>{chunk.strip()}</speak>" for chunk in chunks]
+    for chunk in chunks:
+        if len(chunk) > POLLY_MAX_SSML_CHARS:
+            raise ChunkTooLong(f"SSML segment of {len(chunk)} characters exceeds {POLLY_MAX_SSML_CHARS}")
+    return chunks
+
+
+def chunk_cache_key(chunk):
+    """Return the content hash of a chunk's audio (SSML plus voice settings)"""
+    material = json.dumps([ENGINE, VOICE_ID, OUTPUT_FORMAT, SAMPLE_RATE, chunk])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ChunkAudioCache:
+    """Content-addressed chunk audio on local disk, optionally backed by S3
+
+    The local copies are bounded by max_bytes, evicting the least recently used chunks like
+    cache_backends.LocalCacheBackend.
+    """
+
+    def __init__(self, mode=TTS_CACHE_MODE, bucket=None, region=None, max_bytes=TTS_CACHE_MAX_BYTES):
+        self.mode = mode
+        self.bucket = bucket
+        self.region = region
+        self.max_bytes = max_bytes
+        self.directory = os.path.join(CACHE_DIR, 'polly')
+        if mode != 'off':
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _local_path(self, key):
+        return os.path.join(self.directory, f"{key}.{OUTPUT_FORMAT}")
+
+    def _s3_key(self, key):
+        return f"{CACHE_PREFIX}/polly/{key}.{OUTPUT_FORMAT}"
+
+    def get(self, key, destination):
+        """Copy cached audio to destination; returns False on a miss"""
+        if self.mode == 'off':
+            return False
+        local_path = self._local_path(key)
+        try:
+            shutil.copyfile(local_path, destination)
+            os.utime(local_path)
+            return True
+        except FileNotFoundError:
+            pass
+        if self.mode == 's3' and self.bucket:
+            s3_client = get_client('s3', self.region)
+            try:
+                s3_client.download_file(self.bucket, self._s3_key(key), destination)
+            except Exception:
+                return False
+            self._store_local(key, destination)
+            return True
+        return False
+
+    def _store_local(self, key, source):
+        # Copied atomically, so concurrent readers never see a partial chunk
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, self._local_path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.max_bytes:
+            evict_least_recently_used(self.directory, self.max_bytes, suffix=f".{OUTPUT_FORMAT}")
+
+    def put(self, key, source):
+        if self.mode == 'off':
+            return
+        try:
+            self._store_local(key, source)
+            if self.mode == 's3' and self.bucket:
+                get_client('s3', self.region).upload_file(
+                    source, self.bucket, self._s3_key(key),
+                    ExtraArgs={'ContentType': 'audio/mpeg'}
+                )
+        except Exception as e:
+            log.error(f"Failed to cache narration chunk {key[:12]}: {e}")
+
+
+def synthesize_chunk(chunk, path, region=None):
+    """Synthesize one SSML chunk to an MP3 file with synthesize_speech"""
+    response = get_client('polly', region).synthesize_speech(
+        Engine=ENGINE,
+        VoiceId=VOICE_ID,
+        OutputFormat=OUTPUT_FORMAT,
+        SampleRate=SAMPLE_RATE,
+        TextType='ssml',
+        Text=chunk
+    )
+    stream = response['AudioStream']
+    try:
+        with open(path, 'wb') as f:
+            for data in iter(lambda: stream.read(64 * 1024), b''):
+                f.write(data)
+    finally:
+        stream.close()
+
+
+@traced('ffmpeg.concat_audio')
+def concat_audio(paths, output_path):
+    """Join MP3 files of identical format without re-encoding"""
+    list_fd, list_path = tempfile.mkstemp(suffix='.txt', dir=os.path.dirname(output_path))
+    try:
+        with os.fdopen(list_fd, 'w') as f:
+            for path in paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        result = subprocess.run(
+            ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_path, '-c', 'copy', output_path],
+            capture_output=True, text=True, timeout=120
+        )
+        if result.returncode != 0:
+            raise Exception(f"FFmpeg concat failed: {result.stderr[-2000:]}")
+        media_info.record_duration(output_path, media_info.duration_from_ffmpeg_log(result.stderr))
+    finally:
+        os.remove(list_path)
+
+
+@traced('polly.synthesize')
+def synthesize_ssml(ssml, output_path, region=None, cache_bucket=None):
+    """Synthesize an SSML narration chunk-by-chunk in parallel
+
+    Args:
+        ssml: Sanitized SSML document
+        output_path: Path of the joined MP3
+        region: AWS region for Polly (and the chunk cache bucket)
+        cache_bucket: S3 bucket for the shared chunk cache (None keeps it local)
+
+    Returns:
+        List of chunk descriptions with index, start and duration (seconds), characters,
+        cache key and whether the audio came from the cache
+
+    Raises:
+        ChunkTooLong: If the SSML cannot be chunked for synthesize_speech
+    """
+    chunks = split_ssml(ssml)
+    cache = ChunkAudioCache(bucket=cache_bucket, region=region)
+    chunk_dir = tempfile.mkdtemp(prefix='voice_chunks_', dir=os.path.dirname(output_path))
+    log.info(f"Synthesizing narration in {len(chunks)} chunk(s), {TTS_CONCURRENCY} at a time")
+
+    def render(index):
+        chunk = chunks[index]
+        key = chunk_cache_key(chunk)
+        path = os.path.join(chunk_dir, f"{index:04d}.{OUTPUT_FORMAT}")
+        cached = cache.get(key, path)
+        if not cached:
+            synthesize_chunk(chunk, path, region)
+            cache.put(key, path)
+        return {'index': index, 'path': path, 'key': key, 'characters': len(chunk), 'cached': cached}
+
+    try:
+        with ThreadPoolExecutor(max_workers=TTS_CONCURRENCY, thread_name_prefix='polly') as executor:
+            rendered = list(executor.map(render, range(len(chunks))))
+
+        concat_audio([item['path'] for item in rendered], output_path)
+
+        timeline = []
+        offset = 0.0
+        for item in rendered:
+            duration = media_info.duration(item['path'])
+            timeline.append({
+                'index': item['index'],
+                'start': round(offset, 3),
+                'duration': round(duration, 3),
+                'characters': item['characters'],
+                'key': item['key'],
+                'cached': item['cached'],
+            })
+            offset += duration
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+    cached_count = sum(1 for item in timeline if item['cached'])
+    annotate(chunks=len(timeline), cached_chunks=cached_count, characters=len(ssml),
+             audio_seconds=round(offset, 3), bytes=os.path.getsize(output_path))
+    log.info(f"Narration synthesized: {len(timeline)} chunks ({cached_count} cached), {offset:.1f}s")
+    return timeline
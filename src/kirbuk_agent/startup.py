@@ -0,0 +1,142 @@
+"""
+Cold-start bookkeeping and background pre-warm for the agent container.
+
+The first invocation after a scale-out pays for everything the process has not done yet:
+importing the agent SDKs, building boto3 clients, launching Chromium and loading the video
+assets. The agent therefore imports strands and bedrock_agentcore only where they are used
+and hands the expensive setup to prewarm(), which runs each task on its own background
+thread while the runtime starts serving.
+
+phase() times the synchronous startup steps and every pre-warm task records its duration.
+Once the pre-warm has finished, one 'Startup timings' record lists them with their offsets
+from process start (and from container start when start.sh exports
+KIRBUK_CONTAINER_STARTED).
+
+Configuration via environment:
+    KIRBUK_PREWARM   comma-separated tasks: clients, browser, assets, imports
+                     (default: all of them; 'none' disables the pre-warm)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from log import get_logger
+
+log = get_logger(__name__)
+
+PREWARM_TASKS = ('clients', 'browser', 'assets', 'imports')
+PREWARM = os.getenv("KIRBUK_PREWARM", ','.join(PREWARM_TASKS))
+
+_phases = []
+_phases_lock = threading.Lock()
+
+
+def _process_started():
+    """Return the monotonic time the process was started (or this module was imported)"""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.monotonic() - (uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic()
+
+
+PROCESS_STARTED = _process_started()
+
+
+def _record(name, started, status='ok', error=None):
+    entry = {
+        'phase': name,
+        'start': round(started - PROCESS_STARTED, 3),
+        'seconds': round(time.monotonic() - started, 3),
+        'status': status,
+    }
+    if error:
+        entry['error'] = error
+    with _phases_lock:
+        _phases.append(entry)
+
+
+@contextmanager
+def phase(name):
+    """Time a synchronous startup step"""
+    started = time.monotonic()
+    try:
+        yield
+    except Exception as e:
+        _record(name, started, 'failed', str(e))
+        raise
+    _record(name, started)
+
+
+def mark(name):
+    """Record a phase that ran from process start until now (e.g. the module imports)"""
+    _record(name, PROCESS_STARTED)
+
+
+def warm(name, func):
+    """Run a pre-warm task on a background thread and record its duration
+
+    Returns:
+        The started thread
+    """
+    def run():
+        started = time.monotonic()
+        try:
+            func()
+        except Exception as e:
+            log.warning(f"Pre-warm task '{name}' failed: {e}")
+            _record(name, started, 'failed', str(e))
+        else:
+            _record(name, started)
+
+    thread = threading.Thread(target=run, name=f"prewarm-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def prewarm(tasks):
+    """Start the enabled pre-warm tasks and log the startup report once they have finished
+
+    Args:
+        tasks: Dictionary of task name -> callable; names not enabled by KIRBUK_PREWARM are skipped
+
+    Returns:
+        List of started threads
+    """
+    enabled = {name.strip() for name in PREWARM.split(',')} - {'', 'none'}
+    threads = [warm(name, func) for name, func in tasks.items() if name in enabled]
+
+    def report_when_done():
+        for thread in threads:
+            thread.join()
+        log_report()
+
+    threading.Thread(target=report_when_done, name='prewarm-report', daemon=True).start()
+    return threads
+
+
+def startup_report():
+    """Return the startup phases ordered by start offset"""
+    with _phases_lock:
+        phases = sorted(_phases, key=lambda entry: entry['start'])
+    report = {
+        'since_process_start': round(time.monotonic() - PROCESS_STARTED, 3),
+        'phases': phases,
+    }
+    container_started = os.getenv("KIRBUK_CONTAINER_STARTED")
+    if container_started:
+        try:
+            # Offset of the Python process from start.sh (Xvfb and dbus start before it)
+            process_epoch = time.time() - (time.monotonic() - PROCESS_STARTED)
+            report['container_to_process'] = round(process_epoch - float(container_started), 3)
+        except ValueError:
+            pass
+    return report
+
+
+def log_report():
+    log.info("Startup timings", **startup_report())
@@ -0,0 +1,4 @@
+import os
+
+# The modules under test log every step; keep the test output readable
+os.environ.setdefault('KIRBUK_LOG_LEVEL', 'WARNING')
@@ -0,0 +1,50 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import media_info
+from composition import build_cut_command, remove_intervals
+
+
+class RemoveIntervalsTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.output_path = os.path.join(self.directory, 'cut.webm')
+
+    def test_cut_command_selects_everything_outside_the_intervals(self):
+        command = build_cut_command('in.webm', [(1, 2.5), (4, 5)], 'out.webm')
+        video_filter = command[command.index('-vf') + 1]
+        self.assertEqual(video_filter,
+                         "fps=25,select='not(between(t,1.000,2.500)+between(t,4.000,5.000))',setpts=N/25/TB")
+        self.assertEqual(command[:3], ['ffmpeg', '-i', 'in.webm'])
+        self.assertEqual(command[-1], 'out.webm')
+        self.assertIn('-an', command)
+
+    def fake_ffmpeg(self, returncode=0):
+        def run(command, **kwargs):
+            if returncode == 0:
+                with open(command[-1], 'wb') as f:
+                    f.write(b'webm')
+            return subprocess.CompletedProcess(command, returncode, stdout='',
+                                               stderr="frame=  100 fps=50 time=00:00:04.00 speed=2x\n")
+        return mock.patch('composition.subprocess.run', side_effect=run)
+
+    def test_records_the_duration_of_the_cut_recording(self):
+        with self.fake_ffmpeg() as run:
+            self.assertEqual(remove_intervals('in.webm', [(1, 2)], self.output_path), self.output_path)
+        run.assert_called_once()
+        # Known from FFmpeg's progress output, so no probe is needed
+        self.assertEqual(media_info.duration(self.output_path), 4.0)
+
+    def test_ffmpeg_failure_raises(self):
+        with self.fake_ffmpeg(returncode=1):
+            with self.assertRaises(Exception):
+                remove_intervals('in.webm', [(1, 2)], self.output_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+import unittest
+
+from cache_backends import LocalCacheBackend
+from exploration_cache import (ExplorationCache, PASSWORD_PLACEHOLDER, exploration_cache_key, normalize_directions,
+                               normalize_url)
+
+
+class NormalizeURLTests(unittest.TestCase):
+    def test_trivial_spellings_share_a_url(self):
+        expected = 'https://example.com/app'
+        for url in ('example.com/app', 'HTTPS://Example.COM/app/', 'https://example.com:443/app#pricing',
+                    'https://example.com/app?utm_source=x&gclid=1', '  https://example.com/app  '):
+            with self.subTest(url=url):
+                self.assertEqual(normalize_url(url), expected)
+
+    def test_meaningful_differences_are_kept(self):
+        self.assertEqual(normalize_url('http://example.com:8080/a?b=2&a=1'), 'http://example.com:8080/a?a=1&b=2')
+        self.assertNotEqual(normalize_url('https://example.com/a'), normalize_url('https://example.com/b'))
+        self.assertNotEqual(normalize_url('http://example.com'), normalize_url('https://example.com'))
+
+    def test_directions_ignore_case_and_whitespace(self):
+        self.assertEqual(normalize_directions('  Show the\n  Dashboard '), 'show the dashboard')
+        self.assertEqual(normalize_directions(None), '')
+
+
+class ExplorationCacheKeyTests(unittest.TestCase):
+    def key(self, payload, roast_mode=False, system_prompt='prompt', model_id='model'):
+        return exploration_cache_key(payload, roast_mode, system_prompt, model_id)
+
+    def test_equivalent_requests_share_a_key(self):
+        self.assertEqual(self.key({'product_url': 'example.com', 'directions': 'Show  pricing'}),
+                         self.key({'product_url': 'https://example.com/', 'directions': 'show pricing'}))
+
+    def test_inputs_that_change_the_narrative_change_the_key(self):
+        base = {'product_url': 'https://example.com'}
+        variants = [
+            self.key(base),
+            self.key(base, roast_mode=True),
+            self.key(base, system_prompt='other prompt'),
+            self.key(base, model_id='other model'),
+            self.key({**base, 'directions': 'show pricing'}),
+            self.key({**base, 'test_username': 'demo', 'test_password': 'secret'}),
+        ]
+        self.assertEqual(len(set(variants)), len(variants))
+
+    def test_credential_values_are_not_part_of_the_key(self):
+        self.assertEqual(self.key({'product_url': 'a.com', 'test_username': 'one', 'test_password': 'pw-one'}),
+                         self.key({'product_url': 'a.com', 'test_username': 'two', 'test_password': 'pw-two'}))
+
+
+class ExplorationCacheTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.backend = LocalCacheBackend('exploration', directory=directory)
+        self.cache = ExplorationCache(self.backend, ttl=60)
+
+    def test_credentials_are_redacted_and_restored(self):
+        self.cache.set('k', 'Logged in with demo-user / hunter22', {'test_username': 'demo-user',
+                                                                    'test_password': 'hunter22'})
+        self.assertIn(PASSWORD_PLACEHOLDER, self.backend.get('k')['value'])
+        self.assertNotIn('hunter22', self.backend.get('k')['value'])
+        self.assertEqual(self.cache.get('k', {'test_username': 'other', 'test_password': 'pass-2'}),
+                         'Logged in with other / pass-2')
+
+    def test_short_credentials_are_not_cached(self):
+        self.cache.set('k', 'Logged in with pw', {'test_username': 'demo', 'test_password': 'pw'})
+        self.assertIsNone(self.cache.get('k', {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+
+import pipeline
+from pipeline import PipelineRunner, Step, StepFailed
+
+
+def fail(**kwargs):
+    raise RuntimeError("boom")
+
+
+class PipelineRunnerTests(unittest.TestCase):
+    def test_steps_receive_the_outputs_they_depend_on(self):
+        values = PipelineRunner().run([
+            Step('double', lambda x: x * 2, inputs=['x'], outputs=['doubled']),
+            Step('split', lambda doubled: (doubled, -doubled), inputs=['doubled'], outputs=['plus', 'minus']),
+        ], {'x': 21})
+        self.assertEqual((values['doubled'], values['plus'], values['minus']), (42, 42, -42))
+
+    def test_independent_steps_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+        runner = PipelineRunner(max_workers=2)
+        # Each step waits for the other, so this only finishes if both run at once
+        runner.run([
+            Step('a', barrier.wait, outputs=['a']),
+            Step('b', barrier.wait, outputs=['b']),
+        ], {})
+        self.assertEqual({runner.timings['a']['status'], runner.timings['b']['status']}, {'completed'})
+
+    def test_failed_non_critical_step_publishes_defaults_and_skips_dependents(self):
+        errors = []
+        runner = PipelineRunner(on_error=lambda step, error: errors.append((step.name, str(error))))
+        values = runner.run([
+            Step('info', fail, outputs=['info', 'logo'], critical=False, defaults={'info': {}}),
+            Step('uses_info', lambda info: len(info), inputs=['info'], outputs=['size']),
+            Step('uses_logo', lambda logo: logo, inputs=['logo'], outputs=['logo_copy']),
+            Step('after_skip', lambda logo_copy: logo_copy, inputs=['logo_copy'], outputs=['final']),
+        ], {})
+        self.assertEqual(errors, [('info', 'boom')])
+        self.assertEqual(values['size'], 0)
+        self.assertNotIn('logo', values)
+        self.assertNotIn('final', values)
+        self.assertEqual(runner.timings['uses_logo']['status'], 'skipped')
+        # Skips propagate to steps that depend on skipped outputs
+        self.assertEqual(runner.timings['after_skip']['status'], 'skipped')
+
+    def test_optional_inputs_are_none_when_unavailable(self):
+        values = PipelineRunner().run([
+            Step('music', fail, outputs=['music'], critical=False),
+            Step('compose', lambda video, music: (video, music), inputs=['video'],
+                 optional_inputs=['music'], outputs=['result']),
+        ], {'video': 'v.webm'})
+        self.assertEqual(values['result'], ('v.webm', None))
+
+    def test_critical_failure_raises_and_cancels_pending_steps(self):
+        transitions = []
+        runner = PipelineRunner(max_workers=2, on_transition=lambda name, state: transitions.append((name, state)))
+        with self.assertRaises(StepFailed) as raised:
+            runner.run([
+                Step('record', fail, outputs=['video']),
+                Step('slow', lambda: time.sleep(0.2), outputs=['voice']),
+                Step('compose', lambda video, voice: None, inputs=['video', 'voice'], outputs=['final']),
+            ], {})
+        self.assertEqual(raised.exception.step_name, 'record')
+        self.assertIsInstance(raised.exception.error, RuntimeError)
+        self.assertEqual(runner.timings['record']['status'], 'failed')
+        # Steps already running finish; nothing new is started
+        self.assertEqual(runner.timings['slow']['status'], 'completed')
+        self.assertEqual(runner.timings['compose']['status'], 'cancelled')
+        self.assertIn(('compose', 'cancelled'), transitions)
+        self.assertNotIn(('compose', 'running'), transitions)
+
+    def test_failing_transition_callback_does_not_fail_the_run(self):
+        def broken(name, state):
+            raise RuntimeError("manifest unavailable")
+        values = PipelineRunner(on_transition=broken).run([Step('a', lambda: 1, outputs=['a'])], {})
+        self.assertEqual(values['a'], 1)
+
+    def test_step_returning_the_wrong_number_of_values_fails(self):
+        with self.assertRaises(ValueError):
+            PipelineRunner().run([Step('pair', lambda: 1, outputs=['a', 'b'])], {})
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            PipelineRunner().run([Step('a', lambda: 1, outputs=['a']), Step('a', lambda: 2, outputs=['b'])], {})
+        with self.assertRaises(ValueError):
+            PipelineRunner().run([Step('a', lambda missing: 1, inputs=['missing'])], {})
+
+    def test_step_hooks_wrap_every_step_on_its_thread(self):
+        seen = []
+
+        @contextmanager
+        def hook(name):
+            seen.append((name, threading.current_thread().name.startswith('pipeline')))
+            yield
+
+        pipeline.add_step_hook(hook)
+        self.addCleanup(pipeline.remove_step_hook, hook)
+        PipelineRunner().run([Step('a', lambda: 1, outputs=['a'])], {})
+        self.assertEqual(seen, [('a', True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
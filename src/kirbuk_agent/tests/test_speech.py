@@ -0,0 +1,45 @@
+import unittest
+
+import speech
+from speech import ChunkTooLong, split_ssml
+
+
+def paragraph(text):
+    return f"<p>{text}</p>"
+
+
+class SplitSSMLTests(unittest.TestCase):
+    def test_short_script_is_one_chunk(self):
+        ssml = f'<?xml version="1.0"?><speak>{paragraph("Hello.")}<break time="1s"/>{paragraph("Bye.")}</speak>'
+        self.assertEqual(split_ssml(ssml), [f'<speak>{paragraph("Hello.")}<break time="1s"/>{paragraph("Bye.")}</speak>'])
+
+    def test_splits_at_paragraphs_near_max_chars(self):
+        paragraphs = [paragraph("x" * 40) for _ in range(5)]
+        chunks = split_ssml(f"<speak>{''.join(paragraphs)}</speak>", max_chars=100)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(''.join(chunk[len('<speak>'):-len('</speak>')] for chunk in chunks), ''.join(paragraphs))
+        for chunk in chunks:
+            self.assertTrue(chunk.startswith('<speak><p>') and chunk.endswith('</p></speak>'))
+
+    def test_breaks_inside_a_paragraph_are_not_boundaries(self):
+        first = paragraph("one <break time='1s'/> two")
+        chunks = split_ssml(f"<speak>{first}{paragraph('three')}</speak>", max_chars=10)
+        self.assertEqual(chunks, [f"<speak>{first}</speak>", f"<speak>{paragraph('three')}</speak>"])
+
+    def test_trailing_pause_stays_with_the_preceding_speech(self):
+        chunks = split_ssml(f"<speak>{paragraph('a' * 20)}<break time='2s'/></speak>", max_chars=10)
+        self.assertEqual(chunks, [f"<speak>{paragraph('a' * 20)}<break time='2s'/></speak>"])
+
+    def test_segment_over_the_polly_limit_raises(self):
+        with self.assertRaises(ChunkTooLong):
+            split_ssml(f"<speak>{paragraph('x' * speech.POLLY_MAX_SSML_CHARS)}</speak>")
+
+
+class ChunkCacheKeyTests(unittest.TestCase):
+    def test_key_depends_on_the_chunk(self):
+        self.assertEqual(speech.chunk_cache_key('<speak>a</speak>'), speech.chunk_cache_key('<speak>a</speak>'))
+        self.assertNotEqual(speech.chunk_cache_key('<speak>a</speak>'), speech.chunk_cache_key('<speak>b</speak>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
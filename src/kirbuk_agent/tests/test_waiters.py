@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+
+import waiters
+from waiters import WaitTimeout, Waiter
+
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep, so waits take no real time"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class WaiterTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for name in ('monotonic', 'sleep'):
+            patcher = mock.patch(f'waiters.time.{name}', getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_delays_grow_exponentially_up_to_the_cap(self):
+        waiter = Waiter('test_growth', initial_delay=1, max_delay=5, multiplier=2, jitter=0)
+        delays = waiter.delays()
+        self.assertEqual([next(delays) for _ in range(5)], [1, 2, 4, 5, 5])
+
+    def test_jitter_stays_within_its_fraction(self):
+        delays = Waiter('test_jitter', initial_delay=10, jitter=0.25).delays()
+        self.assertTrue(7.5 <= next(delays) <= 12.5)
+
+    def test_returns_the_first_value(self):
+        results = iter([None, None, 'done'])
+        polled = []
+        waiter = Waiter('test_value', initial_delay=1, jitter=0,
+                        on_poll=lambda waiter, value: polled.append(value))
+        self.assertEqual(waiter.wait(lambda: next(results)), 'done')
+        self.assertEqual(waiter.polls, 3)
+        self.assertEqual(self.clock.sleeps, [1, 2])
+        self.assertEqual(polled, [None, None, 'done'])
+
+    def test_times_out_without_sleeping_past_the_deadline(self):
+        waiter = Waiter('test_timeout', timeout=10, initial_delay=4, multiplier=2, jitter=0)
+        with self.assertRaises(WaitTimeout):
+            waiter.wait(lambda: None)
+        # 4s, then only the 6s left instead of 8s
+        self.assertEqual(self.clock.sleeps, [4, 6])
+        self.assertEqual(waiters.waiter_stats()['test_timeout']['timeouts'], 1)
+
+    def test_check_errors_abort_the_wait(self):
+        def check():
+            raise RuntimeError("task failed")
+        with self.assertRaises(RuntimeError):
+            Waiter('test_error').wait(check)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(waiters.waiter_stats()['test_error']['timeouts'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+Per-stage tracing spans and the timing summary of every submission.
+
+span() opens an OpenTelemetry span when the SDK is installed (the container runs under
+opentelemetry-instrument, which exports them) and always records the span in the trace of
+the current job. Every pipeline step is wrapped automatically (see step_span); the stages
+inside them - Playwright attempts, ffprobe, LLM calls, Polly, encodes, uploads and emails -
+open their own spans (span() or @traced) and add attributes such as bytes, retry counts
+and model IDs to the innermost one with annotate().
+
+A job is traced between start_job() and finish_job(); its spans are then written as
+timings.json next to the other artifacts. tracing_stats() aggregates span durations per
+name for the whole process.
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # Tracing to a backend is optional; the job timings work without it
+    otel_trace = None
+
+TRACER_NAME = 'kirbuk.agent'
+
+_job = contextvars.ContextVar('kirbuk_job_trace', default=None)
+_current = contextvars.ContextVar('kirbuk_current_span', default=None)
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _attribute_value(value):
+    """OpenTelemetry attributes only take primitives"""
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class JobTrace:
+    """Spans of one submission, in the order they finished"""
+
+    def __init__(self, submission_id):
+        self.submission_id = submission_id
+        self.started = time.monotonic()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def summary(self):
+        """Return the spans plus total seconds and count per span name"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record['start'])
+        totals = {}
+        for record in spans:
+            entry = totals.setdefault(record['name'], {'count': 0, 'seconds': 0.0, 'errors': 0})
+            entry['count'] += 1
+            entry['seconds'] = round(entry['seconds'] + record['duration'], 3)
+            entry['errors'] += int(record['status'] == 'error')
+        return {
+            'submission_id': self.submission_id,
+            'total_seconds': round(time.monotonic() - self.started, 3),
+            'totals': totals,
+            'spans': spans,
+        }
+
+
+class SpanHandle:
+    """Lets the code inside a span add attributes as they become known"""
+
+    def __init__(self, name, otel_span):
+        self.name = name
+        self.attributes = {}
+        self._otel_span = otel_span
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        if self._otel_span is not None:
+            for key, value in attributes.items():
+                if value is not None:
+                    self._otel_span.set_attribute(f"kirbuk.{key}", _attribute_value(value))
+
+
+@contextmanager
+def _otel_span(name):
+    if otel_trace is None:
+        yield None
+        return
+    with otel_trace.get_tracer(TRACER_NAME).start_as_current_span(name, record_exception=True,
+                                                                  set_status_on_exception=True) as otel_span:
+        yield otel_span
+
+
+@contextmanager
+def span(name, **attributes):
+    """Trace a stage
+
+    Args:
+        name: Span name (e.g. 'upload', 'playwright.attempt')
+        **attributes: Initial attributes; more can be added with the yielded handle's set()
+
+    Yields:
+        SpanHandle
+    """
+    job = _job.get()
+    parent = _current.get()
+    started = time.monotonic()
+    status = 'ok'
+    with _otel_span(name) as otel_span:
+        handle = SpanHandle(name, otel_span)
+        handle.set(**attributes)
+        token = _current.set(handle)
+        try:
+            yield handle
+        except BaseException as e:
+            status = 'error'
+            # The OpenTelemetry span records the exception and error status itself
+            handle.attributes['error'] = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            _current.reset(token)
+            duration = time.monotonic() - started
+            _record_stats(name, duration, status)
+            if job is not None:
+                job.add({
+                    'name': name,
+                    'parent': parent.name if parent else None,
+                    'start': round(started - job.started, 3),
+                    'duration': round(duration, 3),
+                    'status': status,
+                    'attributes': {key: value for key, value in handle.attributes.items() if value is not None},
+                })
+
+
+def traced(name):
+    """Decorator: run every call of the function in a span called name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attributes):
+    """Add attributes to the innermost open span (ignored outside of spans)"""
+    handle = _current.get()
+    if handle is not None:
+        handle.set(**attributes)
+
+
+def _record_stats(name, duration, status):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'errors': 0})
+        entry['count'] += 1
+        entry['seconds'] = round(entry['seconds'] + duration, 3)
+        entry['max_seconds'] = round(max(entry['max_seconds'], duration), 3)
+        entry['errors'] += int(status == 'error')
+
+
+def step_span(step_name):
+    """Pipeline step hook: one span per step (register with pipeline.add_step_hook)"""
+    return span(f"step.{step_name}")
+
+
+def start_job(submission_id):
+    """Start collecting the spans of a submission in this context and the pipeline steps it runs
+
+    Returns:
+        JobTrace, to be passed to finish_job()
+    """
+    trace = JobTrace(submission_id)
+    trace._token = _job.set(trace)
+    return trace
+
+
+def finish_job(trace):
+    """Stop collecting spans for the job and return its summary"""
+    if trace._token is not None:
+        _job.reset(trace._token)
+        trace._token = None
+    return trace.summary()
+
+
+def tracing_stats():
+    """Return count, total, maximum and error count of the spans per name in this process"""
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
@@ -0,0 +1,136 @@
+"""
+Artifact uploads to S3.
+
+Files are streamed from disk with a multipart transfer, so memory use is bounded by
+part size x concurrency instead of the file size. Every upload computes a SHA-256 in
+fixed-size chunks (stored as object metadata), asks S3 to verify a per-part checksum, and
+reports its throughput.
+
+Tuning via environment:
+    KIRBUK_UPLOAD_PART_SIZE_MB   multipart part size and threshold (default: 8)
+    KIRBUK_UPLOAD_CONCURRENCY    parts uploaded in parallel (default: 4)
+    KIRBUK_UPLOAD_CHECKSUM       S3 checksum algorithm: CRC32 | CRC32C | SHA256 | off (default: CRC32)
+"""
+import hashlib
+import os
+import time
+
+from boto3.s3.transfer import TransferConfig
+
+from aws_clients import get_client
+from log import get_logger
+from tracing import annotate, traced
+
+log = get_logger(__name__)
+
+MB = 1024 * 1024
+UPLOAD_PART_SIZE = int(os.getenv("KIRBUK_UPLOAD_PART_SIZE_MB", "8")) * MB
+UPLOAD_CONCURRENCY = int(os.getenv("KIRBUK_UPLOAD_CONCURRENCY", "4"))
+UPLOAD_CHECKSUM = os.getenv("KIRBUK_UPLOAD_CHECKSUM", "CRC32")
+HASH_CHUNK_SIZE = 1 * MB
+
+
+def transfer_config():
+    """Return the TransferConfig used for file uploads"""
+    return TransferConfig(
+        multipart_threshold=UPLOAD_PART_SIZE,
+        multipart_chunksize=UPLOAD_PART_SIZE,
+        max_concurrency=UPLOAD_CONCURRENCY,
+        use_threads=True,
+    )
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 of a file, reading it in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extra_args(content_type, sha256):
+    extra = {'ContentType': content_type, 'Metadata': {'sha256': sha256}}
+    if UPLOAD_CHECKSUM.lower() != 'off':
+        extra['ChecksumAlgorithm'] = UPLOAD_CHECKSUM.upper()
+    return extra
+
+
+def _report(key, size, seconds):
+    throughput = size / MB / seconds if seconds > 0 else 0.0
+    amount = f"{size / MB:.1f} MB" if size >= MB else f"{size / 1024:.1f} KB"
+    log.info(f"Uploaded {amount} to {key} in {seconds:.2f}s ({throughput:.1f} MB/s)")
+    annotate(key=key, bytes=size, transfer_seconds=round(seconds, 3), throughput_mbps=round(throughput, 2))
+    return round(throughput, 2)
+
+
+@traced('upload')
+def upload_file(local_path, bucket, key, content_type, region=None):
+    """Stream a local file to S3 with a multipart transfer
+
+    Args:
+        local_path: File to upload
+        bucket: Destination bucket
+        key: Destination key
+        content_type: MIME type of the object
+        region: AWS region of the bucket
+
+    Returns:
+        Dictionary with key, size, etag, sha256, seconds and throughput_mbps
+    """
+    s3_client = get_client('s3', region)
+    size = os.path.getsize(local_path)
+    sha256 = file_sha256(local_path)
+
+    started = time.monotonic()
+    s3_client.upload_file(local_path, bucket, key,
+                          ExtraArgs=_extra_args(content_type, sha256),
+                          Config=transfer_config())
+    seconds = time.monotonic() - started
+
+    # upload_file does not return the object's ETag
+    head = s3_client.head_object(Bucket=bucket, Key=key)
+    return {
+        'key': key,
+        'size': head.get('ContentLength', size),
+        'etag': head.get('ETag'),
+        'sha256': sha256,
+        'seconds': round(seconds, 3),
+        'throughput_mbps': _report(key, size, seconds),
+    }
+
+
+@traced('upload')
+def upload_bytes(data, bucket, key, content_type, region=None):
+    """Upload a small in-memory artifact (text, JSON) with the same checksums as upload_file
+
+    Args:
+        data: bytes or str (encoded as UTF-8)
+        bucket: Destination bucket
+        key: Destination key
+        content_type: MIME type of the object
+        region: AWS region of the bucket
+
+    Returns:
+        Dictionary with key, size, etag, sha256, seconds and throughput_mbps
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    started = time.monotonic()
+    response = get_client('s3', region).put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=data,
+        **_extra_args(content_type, sha256)
+    )
+    seconds = time.monotonic() - started
+    return {
+        'key': key,
+        'size': len(data),
+        'etag': response.get('ETag'),
+        'sha256': sha256,
+        'seconds': round(seconds, 3),
+        'throughput_mbps': _report(key, len(data), seconds),
+    }
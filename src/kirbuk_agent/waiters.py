@@ -0,0 +1,104 @@
+"""
+Polling long-running AWS tasks with exponential backoff.
+
+A fixed poll interval either wastes API calls on slow tasks or adds latency to fast ones,
+and many concurrent jobs polling in lockstep invite throttling. Waiter starts with a short
+delay, grows it exponentially up to a cap, spreads polls with random jitter and enforces a
+wall-clock deadline that includes the time spent in the API calls themselves.
+"""
+import random
+import threading
+import time
+
+
+class WaitTimeout(Exception):
+    """Raised when a waiter's deadline passes before the task finished"""
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class Waiter:
+    """Polls a check function until it returns a value or the deadline passes"""
+
+    def __init__(self, name, timeout=300.0, initial_delay=1.0, max_delay=20.0,
+                 multiplier=2.0, jitter=0.25, on_poll=None):
+        """Configure a waiter
+
+        Args:
+            name: Name used in logs and statistics (e.g. 'polly_task')
+            timeout: Wall-clock seconds before WaitTimeout is raised
+            initial_delay: Delay after the first poll in seconds
+            max_delay: Upper bound of the delay between polls
+            multiplier: Factor the delay grows by after every poll
+            jitter: Random spread as a fraction of the delay (0.25 = +/-25%)
+            on_poll: Optional callback(waiter, value) after every poll
+        """
+        self.name = name
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.on_poll = on_poll
+        self.polls = 0
+        self.elapsed = 0.0
+
+    def delays(self):
+        """Yield the (jittered) delays between polls"""
+        delay = self.initial_delay
+        while True:
+            yield delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            delay = min(self.max_delay, delay * self.multiplier)
+
+    def wait(self, check):
+        """Call check() until it returns something other than None
+
+        Args:
+            check: Callable returning None while the task is pending, a value once it is
+                done, or raising to abort the wait
+
+        Returns:
+            The first non-None value returned by check
+
+        Raises:
+            WaitTimeout: If the deadline passes first
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        delays = self.delays()
+        timed_out = False
+        try:
+            while True:
+                value = check()
+                self.polls += 1
+                self.elapsed = time.monotonic() - started
+                if self.on_poll:
+                    self.on_poll(self, value)
+                if value is not None:
+                    return value
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    raise WaitTimeout(f"{self.name} did not finish within {self.timeout:g}s "
+                                      f"({self.polls} polls)")
+                time.sleep(min(next(delays), remaining))
+        finally:
+            self.elapsed = time.monotonic() - started
+            self._record(timed_out)
+
+    def _record(self, timed_out):
+        with _stats_lock:
+            entry = _stats.setdefault(self.name, {'waits': 0, 'polls': 0, 'seconds': 0.0, 'timeouts': 0})
+            entry['waits'] += 1
+            entry['polls'] += self.polls
+            entry['seconds'] = round(entry['seconds'] + self.elapsed, 3)
+            entry['timeouts'] += int(timed_out)
+
+
+def waiter_stats():
+    """Return wait, poll and timeout counters per waiter name"""
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
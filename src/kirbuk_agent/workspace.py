@@ -0,0 +1,103 @@
+"""
+Per-submission local workspace for intermediate pipeline artifacts.
+
+Pipeline stages hand each other local file paths inside the workspace instead of
+uploading to S3 and downloading again. S3 is only written at checkpoints that the
+status page needs.
+"""
+import os
+import shutil
+import tempfile
+
+from aws_clients import get_client
+from log import get_logger
+
+log = get_logger(__name__)
+
+
+class JobWorkspace:
+    """Owns the temporary directory that holds every local artifact of one job"""
+
+    def __init__(self, submission_id, bucket, prefix, region=None):
+        """Create the workspace directory
+
+        Args:
+            submission_id: Submission the workspace belongs to
+            bucket: S3 bucket holding the staging area
+            prefix: S3 staging prefix (artifacts live under <prefix>/<submission_id>/)
+            region: AWS region for S3 downloads
+        """
+        self.submission_id = submission_id
+        self.bucket = bucket
+        self.prefix = prefix
+        self.region = region
+        self.root = tempfile.mkdtemp(prefix=f"kirbuk_{submission_id}_")
+        log.info(f"Job workspace created: {self.root}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+        return False
+
+    def path(self, name):
+        """Return the local path of an artifact (sub-directories are created as needed)"""
+        full_path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        return full_path
+
+    def directory(self, name):
+        """Return the local path of a sub-directory, creating it if needed"""
+        full_path = os.path.join(self.root, name)
+        os.makedirs(full_path, exist_ok=True)
+        return full_path
+
+    def has(self, name):
+        """Check whether an artifact already exists locally"""
+        return os.path.exists(os.path.join(self.root, name))
+
+    def s3_key(self, filename):
+        """Return the staging area S3 key for a file of this submission"""
+        return f"{self.prefix}/{self.submission_id}/{filename}"
+
+    def adopt(self, source_path, name):
+        """Move a file produced elsewhere into the workspace
+
+        Args:
+            source_path: Existing file to move
+            name: Artifact name inside the workspace
+
+        Returns:
+            Local path of the artifact
+        """
+        target_path = self.path(name)
+        if os.path.abspath(source_path) != os.path.abspath(target_path):
+            shutil.move(source_path, target_path)
+        return target_path
+
+    def fetch(self, name, s3_key):
+        """Return the local path of an artifact, downloading it from S3 only if it is missing
+
+        Only needed for artifacts that are produced remotely (e.g. Polly output).
+
+        Args:
+            name: Artifact name inside the workspace
+            s3_key: S3 key to download from when the artifact is not local
+
+        Returns:
+            Local path of the artifact
+        """
+        local_path = self.path(name)
+        if not os.path.exists(local_path):
+            s3_client = get_client('s3', self.region)
+            log.info(f"Downloading {s3_key} into workspace")
+            s3_client.download_file(self.bucket, s3_key, local_path)
+            log.info(f"Downloaded {name} ({os.path.getsize(local_path):,} bytes)")
+        return local_path
+
+    def cleanup(self):
+        """Remove the workspace directory and everything in it"""
+        if self.root and os.path.isdir(self.root):
+            shutil.rmtree(self.root, ignore_errors=True)
+            log.info(f"Job workspace removed: {self.root}")
@@ -1,4 +1,7 @@
 bind = "127.0.0.1:8000"
 workers = 3
+# Serve the ASGI application so open status streams do not tie up worker threads
+wsgi_app = "myproject.asgi:application"
+worker_class = "uvicorn_worker.UvicornWorker"
 accesslog = "/home/ubuntu/kirbuk/src/kirbuk_web_app/gunicorn_access.log"
 errorlog = "/home/ubuntu/kirbuk/src/kirbuk_web_app/gunicorn_error.log"
@@ -0,0 +1,77 @@
+"""
+Shared, lazily created boto3 clients for the web app.
+
+This is a trimmed copy of src/kirbuk_agent/aws_clients.py, which is the source of truth for
+the pool and retry configuration - the agent and the web app are built into separate
+images, so the module cannot be imported across them. Keep build_config() and the
+environment variables in sync with it; the counters and test overrides live only there.
+
+Building a boto3 client costs tens of milliseconds and every new client starts with a
+cold HTTPS connection pool, so clients are created once per (service, region) and reused
+by every thread. boto3 clients are thread-safe; only their creation from a session is not,
+which is why it happens under a lock.
+
+Tuning via environment:
+    KIRBUK_BOTO_MAX_POOL_CONNECTIONS  connection pool size per client (default: 32)
+    KIRBUK_BOTO_RETRY_MODE            legacy | standard | adaptive (default: standard)
+    KIRBUK_BOTO_MAX_ATTEMPTS          total attempts including retries (default: 5)
+"""
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+MAX_POOL_CONNECTIONS = int(os.getenv("KIRBUK_BOTO_MAX_POOL_CONNECTIONS", "32"))
+RETRY_MODE = os.getenv("KIRBUK_BOTO_RETRY_MODE", "standard")
+MAX_ATTEMPTS = int(os.getenv("KIRBUK_BOTO_MAX_ATTEMPTS", "5"))
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+
+
+def build_config(**overrides):
+    """Build the botocore Config used for registry clients
+
+    Args:
+        **overrides: Config options that replace the defaults (e.g. read_timeout=900)
+
+    Returns:
+        botocore Config object
+    """
+    options = {
+        'max_pool_connections': MAX_POOL_CONNECTIONS,
+        'retries': {'mode': RETRY_MODE, 'total_max_attempts': MAX_ATTEMPTS},
+    }
+    options.update(overrides)
+    return Config(**options)
+
+
+def get_client(service_name, region_name=None, **config_overrides):
+    """Return the shared client for a service and region, creating it on first use
+
+    Args:
+        service_name: AWS service name (e.g. 's3', 'polly', 'ses')
+        region_name: AWS region (None uses the default region of the environment)
+        **config_overrides: botocore Config options; clients with different overrides are kept apart
+
+    Returns:
+        boto3 client
+    """
+    key = (service_name, region_name, tuple(sorted(config_overrides.items())))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    global _session
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if _session is None:
+                _session = boto3.session.Session()
+            client = _session.client(service_name, region_name=region_name,
+                                     config=build_config(**config_overrides))
+            _clients[key] = client
+        return client
+
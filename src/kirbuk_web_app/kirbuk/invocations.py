@@ -0,0 +1,203 @@
+"""
+Asyncio-based agent invocation service.
+
+All agent invocations of a process are multiplexed on one event loop running in a dedicated
+thread, so a long `invoke_agent_runtime` call costs a coroutine instead of an OS thread. The
+response body is read incrementally in chunks, and a semaphore caps the number of
+invocations in flight.
+
+aiobotocore (pinned in requirements.txt to match botocore) makes the calls fully
+non-blocking. Without it the service falls back to the blocking boto3 client, logs a
+warning at startup, and drives the calls from a small executor of
+KIRBUK_BOTO3_INVOKE_THREADS threads. Every call occupies one of those threads, so only that
+many invocations make progress at once; the rest wait on the executor.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from functools import partial
+
+from kirbuk.aws_clients import build_config, get_client
+
+try:
+    from aiobotocore.session import get_session as get_aio_session
+except ImportError:  # Falls back to boto3 on an executor (warned about at startup)
+    get_aio_session = None
+
+MAX_CONCURRENT_INVOCATIONS = int(os.getenv("KIRBUK_MAX_CONCURRENT_INVOCATIONS", "100"))
+# Threads of the boto3 fallback - deliberately independent of the concurrency cap
+BOTO3_INVOKE_THREADS = int(os.getenv("KIRBUK_BOTO3_INVOKE_THREADS", "16"))
+RESPONSE_CHUNK_SIZE = int(os.getenv("KIRBUK_AGENT_RESPONSE_CHUNK_SIZE", str(64 * 1024)))
+# Agent runs take minutes; keep the connection open long enough for the slowest video
+AGENT_READ_TIMEOUT = int(os.getenv("KIRBUK_AGENT_READ_TIMEOUT", "3600"))
+
+
+def parse_agent_response(body):
+    """Decode the agent response body (JSON, or the last data line of an event stream)"""
+    text = body.decode('utf-8', errors='replace').strip()
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        data_lines = [line[len('data:'):].strip() for line in text.splitlines() if line.startswith('data:')]
+        if data_lines:
+            try:
+                return json.loads(data_lines[-1])
+            except json.JSONDecodeError:
+                return data_lines[-1]
+        return text
+
+
+class AgentInvocationService:
+    """Runs agent invocations as coroutines on a dedicated event loop thread"""
+
+    def __init__(self, agent_arn, region_name, max_concurrency=MAX_CONCURRENT_INVOCATIONS,
+                 chunk_size=RESPONSE_CHUNK_SIZE, boto3_threads=BOTO3_INVOKE_THREADS):
+        """Create the service (call start() before submitting)
+
+        Args:
+            agent_arn: ARN of the AgentCore runtime to invoke
+            region_name: AWS region of the runtime
+            max_concurrency: Maximum number of invocations in flight
+            chunk_size: Size of the chunks the response body is read in
+            boto3_threads: Executor threads of the boto3 fallback (unused with aiobotocore)
+        """
+        self.agent_arn = agent_arn
+        self.region_name = region_name
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+        self.boto3_threads = boto3_threads
+        self.backend = 'aiobotocore' if get_aio_session else 'boto3'
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._semaphore = None
+        self._aio_client = None
+        self._exit_stack = None
+        self._client_lock = None
+        self._executor = None
+
+    def start(self):
+        """Start the event loop thread"""
+        self._thread = threading.Thread(target=self._run_loop, name='agent-invocations', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        print(f"✓ Agent invocation service started ({self.backend}, max {self.max_concurrency} in flight)")
+        if self.backend == 'boto3':
+            print(f"⚠️  aiobotocore is not installed - invoking the agent with boto3 on "
+                  f"{self.boto3_threads} executor threads; install requirements.txt for non-blocking calls")
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client_lock = asyncio.Lock()
+        if self.backend == 'boto3':
+            self._executor = ThreadPoolExecutor(max_workers=self.boto3_threads, thread_name_prefix='agent-io')
+        self._ready.set()
+        self._loop.run_forever()
+
+    def submit(self, data, submission_id):
+        """Schedule an invocation from any thread
+
+        Returns:
+            concurrent.futures.Future resolving to the parsed agent response
+        """
+        return asyncio.run_coroutine_threadsafe(self.invoke(data, submission_id), self._loop)
+
+    async def invoke(self, data, submission_id):
+        """Invoke the agent and return its parsed response (raises on failure)"""
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.monotonic()
+            try:
+                # Use submission_id as session_id for tracking (must be 33+ chars)
+                # The UUID is 36 chars so it meets the requirement
+                print(f"[Invoke] Invoking agent with session_id: {submission_id} ({self.in_flight} in flight)")
+                if self.backend == 'aiobotocore':
+                    body = await self._invoke_aiobotocore(json.dumps(data), submission_id)
+                else:
+                    body = await self._invoke_boto3(json.dumps(data), submission_id)
+                response_data = parse_agent_response(body)
+                self.completed += 1
+                print(f"[Invoke] Agent finished {submission_id} in {time.monotonic() - started:.0f}s "
+                      f"({len(body)} bytes): {response_data}")
+                return response_data
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    def _invoke_params(self, payload, session_id):
+        return {
+            'agentRuntimeArn': self.agent_arn,
+            'runtimeSessionId': session_id,
+            'payload': payload,
+            'qualifier': "DEFAULT",
+        }
+
+    async def _get_aio_client(self):
+        """Create the shared aiobotocore client on first use (lives as long as the loop)"""
+        async with self._client_lock:
+            if self._aio_client is None:
+                self._exit_stack = AsyncExitStack()
+                self._aio_client = await self._exit_stack.enter_async_context(
+                    get_aio_session().create_client(
+                        'bedrock-agentcore',
+                        region_name=self.region_name,
+                        config=build_config(max_pool_connections=self.max_concurrency,
+                                            read_timeout=AGENT_READ_TIMEOUT)
+                    )
+                )
+            return self._aio_client
+
+    async def _invoke_aiobotocore(self, payload, session_id):
+        client = await self._get_aio_client()
+        response = await client.invoke_agent_runtime(**self._invoke_params(payload, session_id))
+        body = bytearray()
+        async with response['response'] as stream:
+            while True:
+                chunk = await stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                body.extend(chunk)
+        return bytes(body)
+
+    async def _invoke_boto3(self, payload, session_id):
+        loop = asyncio.get_running_loop()
+        client = get_client('bedrock-agentcore', self.region_name,
+                            max_pool_connections=self.boto3_threads,
+                            read_timeout=AGENT_READ_TIMEOUT)
+        response = await loop.run_in_executor(
+            self._executor, partial(client.invoke_agent_runtime, **self._invoke_params(payload, session_id))
+        )
+        stream = response['response']
+        body = bytearray()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self._executor, stream.read, self.chunk_size)
+                if not chunk:
+                    break
+                body.extend(chunk)
+        finally:
+            stream.close()
+        return bytes(body)
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'max_concurrency': self.max_concurrency,
+            'boto3_threads': self.boto3_threads if self.backend == 'boto3' else None,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+        }
@@ -0,0 +1,266 @@
+"""
+Durable agent job queue backed by the Django database (SQLite by default).
+
+submit_form only inserts an AgentJob row. A dispatcher thread in every server process
+claims due jobs atomically, hands them to the asyncio invocation service (kirbuk.invocations)
+and records the outcome, retrying failed invocations with exponential backoff. The
+dispatcher thread is the only one touching the database; the event loop just reports
+finished futures back to it. Running jobs hold a lease that the owning
+dispatcher renews; when a process dies its leases expire and the jobs are picked up again
+by another process (the agent ignores duplicate invocations of a submission).
+"""
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from queue import Empty, SimpleQueue
+
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from kirbuk.invocations import AgentInvocationService
+from kirbuk.models import AgentJob
+
+MAX_PENDING_JOBS = int(os.getenv("KIRBUK_MAX_PENDING_JOBS", "500"))      # Admission control limit
+JOB_MAX_ATTEMPTS = int(os.getenv("KIRBUK_JOB_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("KIRBUK_JOB_RETRY_BASE_DELAY", "30"))  # Seconds, doubled per attempt
+RETRY_MAX_DELAY = float(os.getenv("KIRBUK_JOB_RETRY_MAX_DELAY", "900"))
+LEASE_SECONDS = int(os.getenv("KIRBUK_JOB_LEASE_SECONDS", "120"))
+POLL_INTERVAL = float(os.getenv("KIRBUK_JOB_POLL_INTERVAL", "5"))
+
+# Fields that must not outlive the job once it reached a terminal state
+SENSITIVE_PAYLOAD_FIELDS = ('test_password',)
+
+
+class QueueFull(Exception):
+    """Raised when admission control rejects a new job"""
+
+
+def enqueue_job(payload, submission_id):
+    """Persist a new agent job and wake up the dispatcher
+
+    Args:
+        payload: Data sent to the agent
+        submission_id: Submission the job belongs to
+
+    Returns:
+        The created AgentJob
+
+    Raises:
+        QueueFull: If too many jobs are already queued or running
+    """
+    pending = AgentJob.objects.filter(state__in=[AgentJob.STATE_QUEUED, AgentJob.STATE_RUNNING]).count()
+    if pending >= MAX_PENDING_JOBS:
+        raise QueueFull(f"{pending} jobs pending (limit {MAX_PENDING_JOBS})")
+
+    job = AgentJob.objects.create(
+        submission_id=submission_id,
+        payload=payload,
+        max_attempts=JOB_MAX_ATTEMPTS,
+    )
+    dispatcher = start_dispatcher()
+    dispatcher.wake()
+    return job
+
+
+def retry_delay(attempts):
+    """Return the backoff delay in seconds after a failed attempt (with jitter)"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def scrub_payload(payload):
+    """Return the payload without sensitive fields"""
+    return {key: value for key, value in payload.items() if key not in SENSITIVE_PAYLOAD_FIELDS}
+
+
+class JobDispatcher:
+    """Claims due jobs from the database and submits them to the invocation service"""
+
+    def __init__(self, service):
+        """Create a dispatcher
+
+        Args:
+            service: Object with submit(payload, submission_id) returning a
+                concurrent.futures.Future, and a max_concurrency attribute
+        """
+        self.service = service
+        self.max_in_flight = service.max_concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._in_flight = set()
+        self._finished = SimpleQueue()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='agent-job-dispatcher', daemon=True)
+        self._thread.start()
+        print(f"✓ Job dispatcher started ({self.worker_id}, up to {self.max_in_flight} jobs in flight)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Check for due jobs now instead of at the next poll"""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self._record_finished()
+                self._renew_leases()
+                self._requeue_expired()
+                self._claim_and_submit()
+            except Exception as e:
+                print(f"[Dispatcher] Error: {e}")
+                print(f"[Dispatcher] Traceback: {traceback.format_exc()}")
+            finally:
+                close_old_connections()
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+        connection.close()
+
+    def _renew_leases(self):
+        with self._lock:
+            in_flight = list(self._in_flight)
+        if in_flight:
+            AgentJob.objects.filter(pk__in=in_flight, worker_id=self.worker_id).update(
+                lease_expires_at=timezone.now() + timedelta(seconds=LEASE_SECONDS)
+            )
+
+    def _requeue_expired(self):
+        """Put jobs whose owner stopped renewing the lease back into the queue"""
+        requeued = AgentJob.objects.filter(
+            state=AgentJob.STATE_RUNNING,
+            lease_expires_at__lt=timezone.now()
+        ).update(state=AgentJob.STATE_QUEUED, worker_id='', next_attempt_at=timezone.now())
+        if requeued:
+            print(f"[Dispatcher] Requeued {requeued} job(s) with expired leases")
+
+    def _claim_and_submit(self):
+        with self._lock:
+            free_slots = self.max_in_flight - len(self._in_flight)
+        if free_slots <= 0:
+            return
+
+        candidates = AgentJob.objects.filter(
+            state=AgentJob.STATE_QUEUED,
+            next_attempt_at__lte=timezone.now()
+        ).values_list('pk', flat=True)[:free_slots]
+
+        for pk in candidates:
+            # Atomic compare-and-set: only one process can move the job out of 'queued'
+            claimed = AgentJob.objects.filter(pk=pk, state=AgentJob.STATE_QUEUED).update(
+                state=AgentJob.STATE_RUNNING,
+                worker_id=self.worker_id,
+                attempts=F('attempts') + 1,
+                lease_expires_at=timezone.now() + timedelta(seconds=LEASE_SECONDS),
+            )
+            if claimed:
+                job = AgentJob.objects.get(pk=pk)
+                print(f"[Dispatcher] Submitting job {job}")
+                with self._lock:
+                    self._in_flight.add(pk)
+                future = self.service.submit(job.payload, job.submission_id)
+                future.add_done_callback(lambda future, job=job: self._on_done(job, future))
+
+    def _on_done(self, job, future):
+        """Runs on the event loop thread - hand the result over to the dispatcher thread"""
+        self._finished.put((job, future))
+        self.wake()
+
+    def _record_finished(self):
+        while True:
+            try:
+                job, future = self._finished.get_nowait()
+            except Empty:
+                return
+            try:
+                error = future.exception()
+                if error is not None:
+                    self._record_failure(job, error)
+                else:
+                    self._record_success(job, future.result())
+            except Exception as e:
+                print(f"[Dispatcher] Error recording result of job {job.pk}: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(job.pk)
+
+    def _owned(self, job):
+        """Return the job row if this attempt still owns it (fenced like _renew_leases)
+
+        A lease that expired may have been requeued and claimed again, by this or another
+        process; the late result of the old attempt must not touch the new one.
+        """
+        return AgentJob.objects.filter(pk=job.pk, state=AgentJob.STATE_RUNNING,
+                                       worker_id=self.worker_id, attempts=job.attempts)
+
+    def _drop_stale(self, job):
+        print(f"[Dispatcher] Dropping result of job {job.submission_id} (attempt {job.attempts}): "
+              f"its lease expired and the job was requeued")
+
+    def _record_success(self, job, response_data):
+        updated = self._owned(job).update(
+            state=AgentJob.STATE_SUCCEEDED,
+            finished_at=timezone.now(),
+            lease_expires_at=None,
+            last_error='',
+            payload=scrub_payload(job.payload),
+        )
+        if not updated:
+            self._drop_stale(job)
+        elif isinstance(response_data, dict) and response_data.get('duplicate'):
+            # A previous attempt already went through the agent
+            print(f"[Dispatcher] Agent reported {job.submission_id} as already processed")
+        else:
+            print(f"[Dispatcher] Job {job.submission_id} succeeded")
+
+    def _record_failure(self, job, error):
+        print(f"[Dispatcher] Job {job.submission_id} failed (attempt {job.attempts}/{job.max_attempts}): {error!r}")
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            updated = self._owned(job).update(
+                state=AgentJob.STATE_QUEUED,
+                worker_id='',
+                lease_expires_at=None,
+                last_error=str(error),
+                next_attempt_at=timezone.now() + timedelta(seconds=delay),
+            )
+            if updated:
+                print(f"[Dispatcher] Retrying {job.submission_id} in {delay:.0f}s")
+        else:
+            updated = self._owned(job).update(
+                state=AgentJob.STATE_FAILED,
+                lease_expires_at=None,
+                last_error=str(error),
+                finished_at=timezone.now(),
+                payload=scrub_payload(job.payload),
+            )
+        if not updated:
+            self._drop_stale(job)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def start_dispatcher():
+    """Start this process's dispatcher (idempotent) and return it"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            # Imported here to avoid a circular import (views enqueue jobs)
+            from kirbuk.views import AGENT_ARN, AWS_REGION
+            service = AgentInvocationService(AGENT_ARN, AWS_REGION)
+            service.start()
+            _dispatcher = JobDispatcher(service)
+            _dispatcher.start()
+        return _dispatcher
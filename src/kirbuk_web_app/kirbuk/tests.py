@@ -1,3 +1,317 @@
-from django.test import TestCase
+import io
+import json
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from kirbuk import jobs, views
+from kirbuk.models import AgentJob
+
+
+class FakeS3:
+    """Signs URLs with a counter so every newly generated URL is distinct"""
+
+    def __init__(self):
+        self.signed = 0
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        self.signed += 1
+        return f"https://s3.example/{Params['Key']}?signature={self.signed}"
+
+
+class StatusCacheTTLTests(SimpleTestCase):
+    def setUp(self):
+        views.presigned_url_cache.clear()
+        views.status_cache.clear()
+        self.s3 = FakeS3()
+
+    def test_presigned_url_is_reused_with_its_original_expiry(self):
+        first_expiries = []
+        url = views.presigned_url(self.s3, 'staging_area/a/voice.mp3', 'etag1', first_expiries)
+        later = time.monotonic() + 1000
+        second_expiries = []
+        with mock.patch('kirbuk.views.time.monotonic', return_value=later):
+            again = views.presigned_url(self.s3, 'staging_area/a/voice.mp3', 'etag1', second_expiries)
+        self.assertEqual(url, again)
+        self.assertEqual(self.s3.signed, 1)
+        self.assertEqual(first_expiries, second_expiries)
+
+    def test_finished_status_ttl_is_capped_by_the_oldest_url(self):
+        status = {'status': 'completed'}
+        urls_expire_at = time.monotonic() + 1200
+        ttl = views.status_cache_ttl(status, urls_expire_at)
+        self.assertLessEqual(ttl, 1200 - views.PRESIGNED_URL_SAFETY_MARGIN)
+        self.assertGreater(ttl, 1200 - views.PRESIGNED_URL_SAFETY_MARGIN - 5)
+
+    def test_finished_status_without_urls_uses_the_full_ttl(self):
+        self.assertEqual(views.status_cache_ttl({'status': 'failed'}), views.STATUS_CACHE_TTL_FINISHED)
+
+    def test_in_progress_status_ttl(self):
+        self.assertEqual(views.status_cache_ttl({'status': 'running'}, time.monotonic() + 10),
+                         views.STATUS_CACHE_TTL_IN_PROGRESS)
+
+    def test_status_from_manifest_reports_url_expiries(self):
+        manifest = {
+            'status': 'completed',
+            'artifacts': {
+                'voice_audio': {'key': 'staging_area/a/voice.mp3', 'etag': 'v'},
+                'video': {'key': 'staging_area/a/video.webm', 'etag': 'w', 'final': True},
+            },
+        }
+        url_expiries = []
+        status = views.status_from_manifest(self.s3, 'a', manifest, url_expiries)
+        self.assertEqual(len(url_expiries), 2)
+        self.assertTrue(status['final_video_created'])
+
+
+class FakeManifestS3(FakeS3):
+    """Serves one manifest.json whose ETag changes with every upload"""
+
+    class exceptions:
+        NoSuchKey = KeyError
+
+    def __init__(self, manifest):
+        super().__init__()
+        self.reads = 0
+        self.heads = 0
+        self.uploads = 0
+        self.upload(manifest)
+
+    def upload(self, manifest):
+        self.uploads += 1
+        self.manifest = manifest
+        self.etag = f'"manifest-{self.uploads}"'
+
+    def get_object(self, Bucket, Key):
+        self.reads += 1
+        return {'Body': io.BytesIO(json.dumps(self.manifest).encode()), 'ETag': self.etag}
+
+    def head_object(self, Bucket, Key):
+        self.heads += 1
+        return {'ETag': self.etag}
+
+
+def completed_manifest(video_etag):
+    return {
+        'status': 'completed',
+        'artifacts': {'video': {'key': 'staging_area/a/video.webm', 'etag': video_etag, 'final': True}},
+    }
+
+
+class StatusRevalidationTests(SimpleTestCase):
+    def setUp(self):
+        views.presigned_url_cache.clear()
+        views.status_cache.clear()
+        self.s3 = FakeManifestS3(completed_manifest('v1'))
+        patcher = mock.patch('kirbuk.views.get_client', return_value=self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_finished_status_is_served_from_cache(self):
+        first = views.get_status('a')
+        self.assertEqual(views.get_status('a'), first)
+        self.assertEqual((self.s3.reads, self.s3.heads), (1, 0))
+
+    def test_unchanged_manifest_is_revalidated_with_a_head_request(self):
+        first = views.get_status('a')
+        later = time.monotonic() + views.STATUS_REVALIDATE_INTERVAL + 1
+        with mock.patch('kirbuk.views.time.monotonic', return_value=later):
+            self.assertEqual(views.get_status('a'), first)
+        self.assertEqual((self.s3.reads, self.s3.heads), (1, 1))
+
+    def test_reuploaded_artifact_replaces_the_cached_status(self):
+        first = views.get_status('a')
+        self.s3.upload(completed_manifest('v2'))
+        later = time.monotonic() + views.STATUS_REVALIDATE_INTERVAL + 1
+        with mock.patch('kirbuk.views.time.monotonic', return_value=later):
+            status = views.get_status('a')
+        self.assertEqual(status['artifacts']['video']['etag'], 'v2')
+        self.assertNotEqual(status['video_url'], first['video_url'])
+        self.assertEqual(self.s3.reads, 2)
+
+
+class FakeInvocationService:
+    """Records submitted jobs and hands out futures the test resolves itself"""
+
+    max_concurrency = 2
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, payload, submission_id):
+        future = Future()
+        self.submitted.append((submission_id, future))
+        return future
+
+
+def make_job(submission_id, **fields):
+    fields.setdefault('payload', {'submission_id': submission_id, 'test_password': 'secret'})
+    fields.setdefault('max_attempts', 3)
+    return AgentJob.objects.create(submission_id=submission_id, **fields)
+
+
+class JobDispatcherTests(TestCase):
+    def setUp(self):
+        self.service = FakeInvocationService()
+        self.dispatcher = jobs.JobDispatcher(self.service)
+
+    def run_dispatcher_pass(self, dispatcher=None):
+        dispatcher = dispatcher or self.dispatcher
+        dispatcher._record_finished()
+        dispatcher._renew_leases()
+        dispatcher._requeue_expired()
+        dispatcher._claim_and_submit()
+
+    def test_claim_marks_job_running_with_a_lease(self):
+        make_job('a')
+        self.run_dispatcher_pass()
+        job = AgentJob.objects.get(submission_id='a')
+        self.assertEqual(job.state, AgentJob.STATE_RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.worker_id, self.dispatcher.worker_id)
+        self.assertGreater(job.lease_expires_at, timezone.now())
+        self.assertEqual([submission_id for submission_id, _ in self.service.submitted], ['a'])
+
+    def test_claimed_job_is_not_claimed_again(self):
+        make_job('a')
+        self.run_dispatcher_pass()
+        other = jobs.JobDispatcher(FakeInvocationService())
+        other.worker_id = 'other-host:1'
+        self.run_dispatcher_pass(other)
+        self.assertEqual(other.service.submitted, [])
+        self.assertEqual(AgentJob.objects.get(submission_id='a').attempts, 1)
+
+    def test_claims_at_most_max_concurrency_jobs(self):
+        for submission_id in ('a', 'b', 'c'):
+            make_job(submission_id)
+        self.run_dispatcher_pass()
+        self.assertEqual(len(self.service.submitted), 2)
+        self.assertEqual(AgentJob.objects.filter(state=AgentJob.STATE_QUEUED).count(), 1)
+
+    def test_lease_is_renewed_while_in_flight(self):
+        make_job('a')
+        self.run_dispatcher_pass()
+        AgentJob.objects.filter(submission_id='a').update(lease_expires_at=timezone.now() + timedelta(seconds=1))
+        self.dispatcher._renew_leases()
+        job = AgentJob.objects.get(submission_id='a')
+        self.assertGreater(job.lease_expires_at, timezone.now() + timedelta(seconds=jobs.LEASE_SECONDS - 10))
+
+    def test_expired_lease_is_requeued_and_claimed_again(self):
+        make_job('a', state=AgentJob.STATE_RUNNING, attempts=1, worker_id='dead-host:1',
+                 lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.run_dispatcher_pass()
+        job = AgentJob.objects.get(submission_id='a')
+        self.assertEqual(job.state, AgentJob.STATE_RUNNING)
+        self.assertEqual(job.worker_id, self.dispatcher.worker_id)
+        self.assertEqual(job.attempts, 2)
+
+    def test_success_scrubs_the_password(self):
+        make_job('a')
+        self.run_dispatcher_pass()
+        # The done callback hands the outcome to the dispatcher, which records it once
+        with mock.patch.object(self.dispatcher, '_record_success',
+                               wraps=self.dispatcher._record_success) as record_success:
+            self.service.submitted[0][1].set_result({'status': 'ok'})
+            self.run_dispatcher_pass()
+        record_success.assert_called_once()
+        job = AgentJob.objects.get(submission_id='a')
+        self.assertEqual(job.state, AgentJob.STATE_SUCCEEDED)
+        self.assertNotIn('test_password', job.payload)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failure_is_retried_with_backoff_until_the_attempt_limit(self):
+        make_job('a', max_attempts=2)
+        for attempt in (1, 2):
+            # Make the job due immediately instead of waiting for the backoff
+            AgentJob.objects.filter(submission_id='a', state=AgentJob.STATE_QUEUED).update(
+                next_attempt_at=timezone.now())
+            self.run_dispatcher_pass()
+            self.assertEqual(len(self.service.submitted), attempt)
+            with mock.patch.object(self.dispatcher, '_record_failure',
+                                   wraps=self.dispatcher._record_failure) as record_failure:
+                self.service.submitted[-1][1].set_exception(RuntimeError(f"boom {attempt}"))
+                self.dispatcher._record_finished()
+            record_failure.assert_called_once()
+
+            job = AgentJob.objects.get(submission_id='a')
+            if attempt == 1:
+                self.assertEqual(job.state, AgentJob.STATE_QUEUED)
+                self.assertGreater(job.next_attempt_at,
+                                   timezone.now() + timedelta(seconds=jobs.RETRY_BASE_DELAY * 0.8 - 5))
+                self.assertEqual(job.payload.get('test_password'), 'secret')
+        self.assertEqual(job.state, AgentJob.STATE_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.last_error, 'boom 2')
+        self.assertNotIn('test_password', job.payload)
+
+    def test_late_result_of_an_expired_lease_is_dropped(self):
+        make_job('a')
+        self.run_dispatcher_pass()
+        # The lease expires and another process claims the job again
+        AgentJob.objects.filter(submission_id='a').update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        other = jobs.JobDispatcher(FakeInvocationService())
+        other.worker_id = 'other-host:1'
+        self.run_dispatcher_pass(other)
+
+        self.service.submitted[0][1].set_exception(RuntimeError("late"))
+        self.dispatcher._record_finished()
+        job = AgentJob.objects.get(submission_id='a')
+        self.assertEqual(job.state, AgentJob.STATE_RUNNING)
+        self.assertEqual(job.worker_id, 'other-host:1')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.last_error, '')
+        self.assertEqual(self.dispatcher._in_flight, set())
+
+    def test_retry_delay_doubles_and_is_capped(self):
+        with mock.patch('kirbuk.jobs.random.uniform', return_value=1.0):
+            self.assertEqual(jobs.retry_delay(1), jobs.RETRY_BASE_DELAY)
+            self.assertEqual(jobs.retry_delay(2), jobs.RETRY_BASE_DELAY * 2)
+            self.assertEqual(jobs.retry_delay(50), jobs.RETRY_MAX_DELAY)
+
+
+@mock.patch('kirbuk.jobs.start_dispatcher')
+class AdmissionControlTests(TestCase):
+    def test_enqueue_rejects_jobs_over_the_limit(self, start_dispatcher):
+        with mock.patch('kirbuk.jobs.MAX_PENDING_JOBS', 1):
+            jobs.enqueue_job({'submission_id': 'a'}, 'a')
+            with self.assertRaises(jobs.QueueFull):
+                jobs.enqueue_job({'submission_id': 'b'}, 'b')
+        self.assertEqual(AgentJob.objects.count(), 1)
+
+    def test_finished_jobs_do_not_count_towards_the_limit(self, start_dispatcher):
+        make_job('done', state=AgentJob.STATE_SUCCEEDED)
+        with mock.patch('kirbuk.jobs.MAX_PENDING_JOBS', 1):
+            jobs.enqueue_job({'submission_id': 'a'}, 'a')
+        self.assertEqual(AgentJob.objects.count(), 2)
+
+    def test_submit_returns_503_with_retry_after_when_the_queue_is_full(self, start_dispatcher):
+        with mock.patch('kirbuk.jobs.MAX_PENDING_JOBS', 0):
+            response = self.client.post('/submit', data=json.dumps({'email': 'a@example.com'}),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(views.QUEUE_FULL_RETRY_AFTER))
+        self.assertEqual(AgentJob.objects.count(), 0)
+
+    def test_submit_queues_a_job(self, start_dispatcher):
+        response = self.client.post('/submit', data=json.dumps({'email': 'a@example.com'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        submission_id = response.json()['submission_id']
+        self.assertEqual(AgentJob.objects.get(submission_id=submission_id).state, AgentJob.STATE_QUEUED)
+        start_dispatcher.return_value.wake.assert_called_once()
+
+
+class CacheStatsTests(SimpleTestCase):
+    def test_hidden_by_default(self):
+        with self.settings(EXPOSE_CACHE_STATS=False):
+            self.assertEqual(self.client.get('/api/cache/stats').status_code, 404)
+
+    def test_exposed_when_enabled(self):
+        with self.settings(EXPOSE_CACHE_STATS=True):
+            response = self.client.get('/api/cache/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status']['name'], 'status')
@@ -1,59 +1,25 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse, JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+import asyncio
 import json
+import time
 import uuid
-import boto3
-import threading
+
+from asgiref.sync import sync_to_async
+from botocore.exceptions import ClientError
+
+from kirbuk.aws_clients import get_client
+from kirbuk.cache import TTLCache
+from kirbuk.jobs import QueueFull, enqueue_job
 
 # Agent configuration
 AGENT_ARN = "arn:aws:bedrock-agentcore:eu-central-1:800622328366:runtime/agentcore_starter_strands-V5kqR7Ap5a"
 AWS_REGION = "eu-central-1"
 S3_BUCKET = "sveder-kirbuk"
 S3_STAGING_PREFIX = "staging_area"
-
-# Keep track of submissions being processed to prevent duplicates across workers
-_processing_submissions = set()
-_processing_lock = threading.Lock()
-
-
-def invoke_agent_async(data, submission_id):
-    """Invoke the agent in a background thread"""
-    try:
-        agent_core_client = boto3.client('bedrock-agentcore', region_name=AWS_REGION)
-
-        # Use submission_id as session_id for tracking (must be 33+ chars)
-        # The UUID is 36 chars so it meets the requirement
-        session_id = submission_id
-
-        # Prepare the payload - send data directly without "input" wrapper
-        payload = json.dumps(data)
-
-        print(f"[Thread] Invoking agent with session_id: {session_id}")
-        print(f"[Thread] Payload: {payload}")
-
-        # Invoke the agent - this is a blocking call that waits for completion
-        response = agent_core_client.invoke_agent_runtime(
-            agentRuntimeArn=AGENT_ARN,
-            runtimeSessionId=session_id,
-            payload=payload,
-            qualifier="DEFAULT"
-        )
-
-        # Read and parse the response
-        response_body = response['response'].read()
-        response_data = json.loads(response_body)
-
-        print(f"[Thread] Agent invoked successfully. Response: {response_data}")
-
-    except Exception as agent_error:
-        print(f"[Thread] Error invoking agent: {agent_error}")
-        import traceback
-        print(f"[Thread] Traceback: {traceback.format_exc()}")
-    finally:
-        # Remove from processing set when done
-        with _processing_lock:
-            _processing_submissions.discard(submission_id)
+QUEUE_FULL_RETRY_AFTER = 60  # Seconds clients should wait when the job queue is full
 
 
 def hello_world(request):
@@ -87,24 +53,18 @@ def submit_form(request):
         print(f"Test Password: {'***' if data.get('test_password') else 'Not provided'}")
         print("=" * 80)
 
-        # Check if this submission is already being processed
-        with _processing_lock:
-            if submission_id in _processing_submissions:
-                print(f"⚠️  Duplicate submission detected for {submission_id}, skipping")
-                return JsonResponse({
-                    'success': True,
-                    'submission_id': submission_id,
-                    'message': 'Form already submitted, processing in progress'
-                })
-            # Mark as being processed
-            _processing_submissions.add(submission_id)
-
-        # Start agent invocation in background thread
-        # Thread is NOT daemon, so it will complete even if worker restarts
-        thread = threading.Thread(target=invoke_agent_async, args=(data, submission_id))
-        thread.start()
-
-        print(f"✓ Agent invocation started in background thread for {submission_id}")
+        # Persist the job; the dispatcher invokes the agent in the background
+        try:
+            enqueue_job(data, submission_id)
+        except QueueFull as e:
+            print(f"⚠️  Rejecting submission {submission_id}: {e}")
+            response = JsonResponse({
+                'error': 'We are generating a lot of videos right now, please try again in a few minutes'
+            }, status=503)
+            response['Retry-After'] = str(QUEUE_FULL_RETRY_AFTER)
+            return response
+
+        print(f"✓ Agent job queued for {submission_id}")
 
         # Return immediately - agent runs in background
         return JsonResponse({
@@ -130,107 +90,328 @@ def submission_video(request, submission_id):
     return render(request, 'video.html', {'submission_id': submission_id})
 
 
+# Status artifacts and their file names inside staging_area/<uuid>/
+MANIFEST_FILENAME = "manifest.json"
+STATUS_ARTIFACTS = {
+    'payload': '{submission_id}.json',
+    'script': 'script.txt',
+    'voice_script': 'voice_script.ssml',
+    'voice_audio': 'voice.mp3',
+    'playwright': 'playwright.py',
+    'video': 'video.webm',
+}
+
+# Text artifacts that the status page fetches on demand
+TEXT_ARTIFACTS = {
+    'script': ('script.txt', 'text/plain; charset=utf-8'),
+    'voice_script': ('voice_script.ssml', 'text/plain; charset=utf-8'),
+    'playwright': ('playwright.py', 'text/plain; charset=utf-8'),
+    'execution_log': ('playwright_execution.log', 'text/plain; charset=utf-8'),
+}
+
+PRESIGNED_URL_EXPIRY = 3600  # 1 hour
+
+# Status caching: finished submissions are cached until the earliest of their presigned URLs
+# is about to expire, in-progress ones only briefly so new stages still show up quickly.
+# A cached finished status is checked against the manifest's ETag (which changes with every
+# artifact upload) at most every STATUS_REVALIDATE_INTERVAL seconds
+PRESIGNED_URL_SAFETY_MARGIN = 300  # Never hand out a URL with less than 5 minutes left
+STATUS_CACHE_TTL_IN_PROGRESS = 5
+STATUS_CACHE_TTL_FINISHED = PRESIGNED_URL_EXPIRY - PRESIGNED_URL_SAFETY_MARGIN
+STATUS_REVALIDATE_INTERVAL = 30
+
+# Server-Sent Events progress stream
+STATUS_STREAM_POLL_INTERVAL = 3    # Seconds between (cached) status checks
+STATUS_STREAM_HEARTBEAT = 15       # Seconds of silence before a keep-alive comment
+STATUS_STREAM_TIMEOUT = 300        # Seconds before the server closes the stream
+STATUS_STREAM_RETRY_MS = 2000      # Browser reconnect delay after the stream closes
+
+status_cache = TTLCache(maxsize=2048, name='status')
+presigned_url_cache = TTLCache(maxsize=4096, name='presigned_urls')
+
+
+def artifact_key(submission_id, filename):
+    """Return the S3 key of a submission artifact"""
+    return f"{S3_STAGING_PREFIX}/{submission_id}/{filename.format(submission_id=submission_id)}"
+
+
+def presigned_url(s3_client, key, etag=None, url_expiries=None):
+    """Return a presigned GET URL, reusing a cached one while the object is unchanged
+
+    A stable URL lets browsers keep the video they already buffered across polls. The
+    URL's expiry (time.monotonic() based) is cached with it and appended to url_expiries,
+    so a status that embeds the URL is not cached for longer than the URL stays valid.
+    """
+    cache_key = (key, etag)
+    entry = presigned_url_cache.get(cache_key)
+    if entry is None:
+        expires_at = time.monotonic() + PRESIGNED_URL_EXPIRY
+        url = s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': S3_BUCKET, 'Key': key},
+            ExpiresIn=PRESIGNED_URL_EXPIRY
+        )
+        entry = (url, expires_at)
+        presigned_url_cache.set(cache_key, entry, PRESIGNED_URL_EXPIRY - PRESIGNED_URL_SAFETY_MARGIN)
+    url, expires_at = entry
+    if url_expiries is not None:
+        url_expiries.append(expires_at)
+    return url
+
+
+def status_from_manifest(s3_client, submission_id, manifest, url_expiries=None):
+    """Build the status response from the agent's manifest.json
+
+    The expiries of the embedded presigned URLs are appended to url_expiries.
+    """
+    artifacts = manifest.get('artifacts', {})
+    video = artifacts.get('video')
+    voice_audio = artifacts.get('voice_audio')
+
+    return {
+        'submission_id': submission_id,
+        'status': manifest.get('status'),
+        'error': manifest.get('error'),
+        'revision': manifest.get('revision'),
+        'updated_at': manifest.get('updated_at'),
+        'stages': manifest.get('stages', {}),
+        'artifacts': {
+            name: {field: entry.get(field) for field in ('size', 'etag', 'updated_at')}
+            for name, entry in artifacts.items()
+        },
+        'json_created': 'payload' in artifacts,
+        'script_created': 'script' in artifacts,
+        'voice_script_created': 'voice_script' in artifacts,
+        'voice_audio_created': voice_audio is not None,
+        'voice_audio_url': presigned_url(s3_client, voice_audio['key'], voice_audio.get('etag'), url_expiries)
+        if voice_audio else None,
+        'playwright_created': 'playwright' in artifacts,
+        'video_created': video is not None,
+        'final_video_created': bool(video and video.get('final')),
+        'video_url': presigned_url(s3_client, video['key'], video.get('etag'), url_expiries) if video else None,
+    }
+
+
+def legacy_status(s3_client, submission_id, url_expiries=None):
+    """Build the status response by probing S3 (submissions created before manifest.json)
+
+    The expiries of the embedded presigned URLs are appended to url_expiries.
+    """
+    status = {'submission_id': submission_id, 'status': None, 'artifacts': {}, 'stages': {}}
+    for name, filename in STATUS_ARTIFACTS.items():
+        key = artifact_key(submission_id, filename)
+        try:
+            head = s3_client.head_object(Bucket=S3_BUCKET, Key=key)
+            status['artifacts'][name] = {
+                'size': head.get('ContentLength'),
+                'etag': head.get('ETag', '').strip('"'),
+                'updated_at': head['LastModified'].isoformat() if head.get('LastModified') else None,
+            }
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                print(f"Error checking {name} file: {e}")
+
+    artifacts = status['artifacts']
+    status.update({
+        'json_created': 'payload' in artifacts,
+        'script_created': 'script' in artifacts,
+        'voice_script_created': 'voice_script' in artifacts,
+        'voice_audio_created': 'voice_audio' in artifacts,
+        'voice_audio_url': presigned_url(s3_client, artifact_key(submission_id, 'voice.mp3'),
+                                         artifacts['voice_audio']['etag'], url_expiries)
+        if 'voice_audio' in artifacts else None,
+        'playwright_created': 'playwright' in artifacts,
+        'video_created': 'video' in artifacts,
+        # Older jobs overwrote video.webm with the narrated version once the voice existed
+        'final_video_created': 'video' in artifacts and 'voice_audio' in artifacts,
+        'video_url': presigned_url(s3_client, artifact_key(submission_id, 'video.webm'),
+                                   artifacts['video']['etag'], url_expiries)
+        if 'video' in artifacts else None,
+    })
+    return status
+
+
+def status_cache_ttl(status, urls_expire_at=None):
+    """Return how long a status response may be served from cache
+
+    Args:
+        status: The status response
+        urls_expire_at: time.monotonic() expiry of the earliest presigned URL in it, if any
+    """
+    if status.get('status') in ('completed', 'failed'):
+        ttl = STATUS_CACHE_TTL_FINISHED
+        if urls_expire_at is not None:
+            # URLs may have been signed during earlier polls; never outlive the oldest one
+            ttl = min(ttl, urls_expire_at - time.monotonic() - PRESIGNED_URL_SAFETY_MARGIN)
+        return ttl
+    return STATUS_CACHE_TTL_IN_PROGRESS
+
+
+def is_finished(status):
+    """Return True once a submission will not change any more"""
+    return status.get('status') in ('completed', 'failed') or bool(status.get('final_video_created'))
+
+
+def get_status(submission_id):
+    """Return the (cached) status of a submission
+
+    Responses are cached per worker, briefly while the job runs and until the presigned
+    URLs near expiry once it has finished. A finished status is only served while the
+    manifest ETag it was built from is current, so re-uploaded artifacts show up.
+    """
+    entry = status_cache.get(submission_id)
+    if entry is not None:
+        status, etag, urls_expire_at, checked_at = entry
+        # Legacy submissions (no manifest) are not revalidated
+        if etag is None or time.monotonic() - checked_at < STATUS_REVALIDATE_INTERVAL:
+            return status
+        if manifest_etag(submission_id) == etag:
+            status_cache.set(submission_id, (status, etag, urls_expire_at, time.monotonic()),
+                             status_cache_ttl(status, urls_expire_at))
+            return status
+
+    status, urls_expire_at, etag = load_status(submission_id)
+    status_cache.set(submission_id, (status, etag, urls_expire_at, time.monotonic()),
+                     status_cache_ttl(status, urls_expire_at))
+    return status
+
+
+def manifest_etag(submission_id):
+    """Return the current ETag of a submission's manifest.json (None if it is missing)"""
+    s3_client = get_client('s3', AWS_REGION)
+    try:
+        head = s3_client.head_object(Bucket=S3_BUCKET, Key=artifact_key(submission_id, MANIFEST_FILENAME))
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return head.get('ETag')
+
+
 @csrf_exempt
-def check_status(request, submission_id):
-    """Check the status of a submission by looking at S3"""
+async def check_status(request, submission_id):
+    """Check the status of a submission with a single read of its manifest
+
+    Artifact bodies are not included; the status page loads them from artifact_content.
+    """
     try:
-        s3_client = boto3.client('s3', region_name=AWS_REGION)
-
-        # Define the S3 paths to check
-        submission_path = f"{S3_STAGING_PREFIX}/{submission_id}"
-        json_key = f"{submission_path}/{submission_id}.json"
-        script_key = f"{submission_path}/script.txt"
-        voice_script_key = f"{submission_path}/voice_script.ssml"
-        voice_audio_key = f"{submission_path}/voice.mp3"
-        playwright_key = f"{submission_path}/playwright.py"
-        video_key = f"{submission_path}/video.webm"
-
-        status = {
-            'submission_id': submission_id,
-            'json_created': False,
-            'script_created': False,
-            'script_content': None,
-            'voice_script_created': False,
-            'voice_script_content': None,
-            'voice_audio_created': False,
-            'voice_audio_url': None,
-            'playwright_created': False,
-            'playwright_content': None,
-            'video_created': False,
-            'video_url': None
-        }
-
-        # Check if JSON file exists
-        try:
-            s3_client.head_object(Bucket=S3_BUCKET, Key=json_key)
-            status['json_created'] = True
-        except s3_client.exceptions.NoSuchKey:
-            pass
-        except Exception as e:
-            print(f"Error checking JSON file: {e}")
+        # Not thread-sensitive, so concurrent polls do not queue behind each other under ASGI
+        status = await sync_to_async(get_status, thread_sensitive=False)(submission_id)
+        return JsonResponse(status)
 
-        # Check if script file exists and get its content
-        try:
-            response = s3_client.get_object(Bucket=S3_BUCKET, Key=script_key)
-            status['script_created'] = True
-            status['script_content'] = response['Body'].read().decode('utf-8')
-        except s3_client.exceptions.NoSuchKey:
-            pass
-        except Exception as e:
-            print(f"Error checking script file: {e}")
+    except Exception as e:
+        print(f"Error in check_status: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
 
-        # Check if voice script file exists and get its content
-        try:
-            response = s3_client.get_object(Bucket=S3_BUCKET, Key=voice_script_key)
-            status['voice_script_created'] = True
-            status['voice_script_content'] = response['Body'].read().decode('utf-8')
-        except s3_client.exceptions.NoSuchKey:
-            pass
-        except Exception as e:
-            print(f"Error checking voice script file: {e}")
 
-        # Check if voice audio file exists and generate presigned URL
-        try:
-            s3_client.head_object(Bucket=S3_BUCKET, Key=voice_audio_key)
-            status['voice_audio_created'] = True
-            # Generate presigned URL valid for 1 hour
-            status['voice_audio_url'] = s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': S3_BUCKET, 'Key': voice_audio_key},
-                ExpiresIn=3600
-            )
-        except s3_client.exceptions.NoSuchKey:
-            pass
-        except Exception as e:
-            print(f"Error checking voice audio file: {e}")
+async def status_event_stream(submission_id):
+    """Yield Server-Sent Events whenever the submission status changes
 
-        # Check if Playwright file exists and get its content
-        try:
-            response = s3_client.get_object(Bucket=S3_BUCKET, Key=playwright_key)
-            status['playwright_created'] = True
-            status['playwright_content'] = response['Body'].read().decode('utf-8')
-        except s3_client.exceptions.NoSuchKey:
-            pass
-        except Exception as e:
-            print(f"Error checking Playwright file: {e}")
+    The stream ends once the submission has finished, or after STATUS_STREAM_TIMEOUT
+    seconds, in which case the browser reconnects on its own.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STATUS_STREAM_TIMEOUT
+    last_fingerprint = None
+    last_sent = loop.time()
 
-        # Check if video file exists and generate presigned URL
+    yield f"retry: {STATUS_STREAM_RETRY_MS}\n\n"
+    while True:
         try:
-            s3_client.head_object(Bucket=S3_BUCKET, Key=video_key)
-            status['video_created'] = True
-            # Generate presigned URL valid for 1 hour
-            status['video_url'] = s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': S3_BUCKET, 'Key': video_key},
-                ExpiresIn=3600
-            )
-        except s3_client.exceptions.NoSuchKey:
-            pass
+            status = await sync_to_async(get_status, thread_sensitive=False)(submission_id)
         except Exception as e:
-            print(f"Error checking video file: {e}")
-
-        return JsonResponse(status)
+            print(f"Error in status stream for {submission_id}: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+
+        # The manifest revision changes with every stage transition and upload
+        fingerprint = status.get('revision') or json.dumps(status.get('artifacts'), sort_keys=True)
+        if fingerprint != last_fingerprint:
+            last_fingerprint = fingerprint
+            last_sent = loop.time()
+            yield f"event: status\ndata: {json.dumps(status)}\n\n"
+
+        if is_finished(status):
+            yield "event: done\ndata: {}\n\n"
+            return
+        if loop.time() >= deadline:
+            return
+        if loop.time() - last_sent >= STATUS_STREAM_HEARTBEAT:
+            # Comment line keeps proxies from closing an idle connection
+            last_sent = loop.time()
+            yield ": keep-alive\n\n"
+
+        await asyncio.sleep(STATUS_STREAM_POLL_INTERVAL)
+
+
+async def status_stream(request, submission_id):
+    """Push status changes of a submission to the browser as Server-Sent Events
+
+    Runs under the ASGI application so an open stream holds no worker thread.
+    """
+    response = StreamingHttpResponse(status_event_stream(submission_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+def load_status(submission_id):
+    """Build the status of a submission from S3 (manifest, or legacy probing)
+
+    Returns:
+        Tuple (status, time.monotonic() expiry of its earliest presigned URL or None,
+        ETag of the manifest it was built from or None for legacy submissions)
+    """
+    s3_client = get_client('s3', AWS_REGION)
+    url_expiries = []
+    etag = None
+    try:
+        response = s3_client.get_object(
+            Bucket=S3_BUCKET,
+            Key=artifact_key(submission_id, MANIFEST_FILENAME)
+        )
+        manifest = json.loads(response['Body'].read())
+        etag = response.get('ETag')
+    except s3_client.exceptions.NoSuchKey:
+        status = legacy_status(s3_client, submission_id, url_expiries)
+    else:
+        status = status_from_manifest(s3_client, submission_id, manifest, url_expiries)
+    return status, min(url_expiries, default=None), etag
+
+
+def cache_stats(request):
+    """Expose hit/miss statistics of this worker's status caches (settings.EXPOSE_CACHE_STATS)"""
+    if not settings.EXPOSE_CACHE_STATS:
+        raise Http404
+    return JsonResponse({
+        'status': status_cache.stats(),
+        'presigned_urls': presigned_url_cache.stats(),
+    })
+
+
+def artifact_content(request, submission_id, name):
+    """Return the body of a text artifact (script, voice script, Playwright code, execution log)"""
+    if name not in TEXT_ARTIFACTS:
+        return JsonResponse({'error': f'Unknown artifact: {name}'}, status=404)
+
+    filename, content_type = TEXT_ARTIFACTS[name]
+    s3_client = get_client('s3', AWS_REGION)
+    params = {'Bucket': S3_BUCKET, 'Key': artifact_key(submission_id, filename)}
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        params['IfNoneMatch'] = if_none_match
 
-    except Exception as e:
-        print(f"Error in check_status: {e}")
+    try:
+        response = s3_client.get_object(**params)
+    except s3_client.exceptions.NoSuchKey:
+        return JsonResponse({'error': 'Artifact not found'}, status=404)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == '304':
+            return HttpResponse(status=304)
+        print(f"Error reading artifact {name}: {e}")
         return JsonResponse({'error': str(e)}, status=500)
+
+    http_response = HttpResponse(response['Body'].read(), content_type=content_type)
+    http_response['ETag'] = response.get('ETag', '')
+    http_response['Cache-Control'] = 'private, no-cache'
+    return http_response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 import sentry_sdk
 
@@ -36,6 +37,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['*']
 
+# Per-worker cache internals at /api/cache/stats; off unless explicitly enabled (no auth)
+EXPOSE_CACHE_STATS = os.getenv("KIRBUK_EXPOSE_CACHE_STATS", "false").lower() == "true"
+
 
 # Application definition
 
@@ -76,6 +80,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Several gunicorn workers write the job queue concurrently
+        'OPTIONS': {'timeout': 20},
     }
 }
 
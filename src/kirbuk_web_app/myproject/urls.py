@@ -17,7 +17,10 @@ Including another URLconf
 from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
-from kirbuk.views import hello_world, submit_form, submission_status, submission_video, check_status
+from kirbuk.views import (
+    hello_world, submit_form, submission_status, submission_video, check_status, artifact_content,
+    cache_stats, status_stream
+)
 
 def trigger_error(request):
     division_by_zero = 1 / 0
@@ -28,6 +31,9 @@ urlpatterns = [
     path('submission/<str:submission_id>', submission_status, name='submission_status'),
     path('video/<str:submission_id>', submission_video, name='submission_video'),
     path('api/status/<str:submission_id>', check_status, name='check_status'),
+    path('api/status/<str:submission_id>/stream', status_stream, name='status_stream'),
+    path('api/status/<str:submission_id>/artifact/<str:name>', artifact_content, name='artifact_content'),
+    path('api/cache/stats', cache_stats, name='cache_stats'),
     path('sentry-debug/', trigger_error),
 ]
 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 
 application = get_wsgi_application()
+
+# Start this process's agent job dispatcher (see kirbuk.jobs)
+from kirbuk.jobs import start_dispatcher  # noqa: E402
+
+start_dispatcher()